@@ -2,12 +2,28 @@
 AI语录生成服务
 """
 import os
+import time
 import random
 import asyncio
 from datetime import date
-from typing import Optional, Dict, Any
+import hashlib
+from typing import Optional, Dict, Any, List, Tuple
 from openai import AsyncOpenAI
 from sqlalchemy.orm import Session
+from app.channels import channel_registry, ChannelConfig, pick_fallback
+from app.rate_limit import llm_budget, llm_circuit, LLMBudgetExceededError
+from app.validation import StreamingQuoteValidator, InvalidCompletionError, quote_validator
+from app.candidate_cache import candidate_cache
+from app.quote_store import quote_store
+from app.rollover import rollover
+from app.cache_events import cache_events
+from app.cards import card_renderer
+from app.roles import runs_generation
+from app.prompt_selection import prompt_selector, template_id
+from app.authors import author_index
+from app.llm_http import llm_http
+from app.usage import usage_ledger
+from app.models import DailyQuote, DEFAULT_CHANNEL_ID, DEFAULT_CHANNEL_SLUG
 import logging
 
 # 配置日志
@@ -15,75 +31,216 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# 默认频道的系统提示词
+DEFAULT_SYSTEM_PROMPT = "你是一个哲学名言专家，专门从你的知识库中提取真实哲学家说过的经典名言。你只提供真实存在的、有历史记录的哲学家名言，绝不编造或创作新的内容。请优先选择较长的、具有深刻哲学思辨的语录，避免简短的格言式表达。"
+
+# 自定义频道未配置模板时使用的通用模板
+CHANNEL_PROMPT_TEMPLATE = (
+    "请提供一句真实存在、有出处的名言。要求：1）主题：{theme}；2）面向的读者：{audience}；"
+    "3）使用语言：{language}，如原文为其他语言请提供准确翻译；4）长度必须在30字以上，有完整的思想表达；"
+    "5）不要编造内容，不要添加任何解释；6）返回格式：名言内容|作者姓名。"
+)
+
+# 自定义频道未配置系统提示词时使用的通用系统提示词
+CHANNEL_SYSTEM_PROMPT = "你是一个名言专家，只提供真实存在、有历史记录的名言，绝不编造或创作新的内容。"
+
+
 class AIQuoteService:
     """AI语录生成服务类"""
     
     def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-        )
+        # 首次调用模型时才创建客户端，只读的 api 进程不会创建
+        self._client: Optional[AsyncOpenAI] = None
         self.model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
         self.max_retries = 3
+        # 流式模式下边生成边校验，输出明显无效时立即中止并重试
+        self.stream = os.getenv("OPENAI_STREAM", "False").lower() == "true"
+        # 通过任务队列生成时最长等待秒数
+        self.job_wait_timeout = float(os.getenv("JOB_WAIT_TIMEOUT", "60"))
+        # 每次调用请求的候选数，多余的合格候选存入候选缓存（流式模式下固定为1）
+        self.candidates_per_call = max(int(os.getenv("LLM_CANDIDATES_PER_CALL", "1")), 1)
         
-    async def generate_quote_content(self, target_date: str) -> str:
+    @property
+    def client(self) -> AsyncOpenAI:
+        """OpenAI客户端（延迟创建）"""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+                http_client=llm_http.client
+            )
+        return self._client
+
+    async def generate_quote_content(self, target_date: str, channel: Optional[ChannelConfig] = None) -> str:
         """
         使用AI生成语录内容
         
         Args:
             target_date: 目标日期 (YYYY-MM-DD)
+            channel: 所属频道，默认为默认频道
             
         Returns:
             生成的语录内容
         """
-        # 构建提示词
-        prompt = self._build_prompt(target_date)
+        candidates = await self.generate_quote_candidates(target_date, channel)
+        return candidates[0]
+
+    async def generate_quote_candidates(self, target_date: str, channel: Optional[ChannelConfig] = None) -> List[str]:
+        """
+        使用AI生成一组候选语录
+
+        非流式模式下一次请求 candidates_per_call 个 choices，只消耗一次调用预算。
+
+        Returns:
+            清理后的候选内容列表（至少一条）
+        """
+        if channel is None:
+            channel = await channel_registry.resolve(DEFAULT_CHANNEL_SLUG)
+        _, prompt = self._choose_prompt(channel)
+        contents, _ = await self._generate_candidates(channel, prompt, target_date)
+        return contents
+
+    async def _generate_candidates(
+        self, channel: ChannelConfig, prompt: str, target_date: Optional[str] = None
+    ) -> Tuple[List[str], int]:
+        """
+        使用指定提示词生成一组候选语录，每次调用的用量记入用量账本
+
+        Returns:
+            (候选内容列表, 模型调用耗时毫秒)
+        """
+        # 频道级限速
+        await channel_registry.throttle(channel).wait()
         
+        messages = [
+            {
+                "role": "system",
+                "content": self._build_system_prompt(channel)
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
+        started = None
+        latency_ms = None
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个哲学名言专家，专门从你的知识库中提取真实哲学家说过的经典名言。你只提供真实存在的、有历史记录的哲学家名言，绝不编造或创作新的内容。请优先选择较长的、具有深刻哲学思辨的语录，避免简短的格言式表达。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.8
-            )
+            # 全局LLM调用预算和并发上限
+            async with llm_budget.slot():
+                started = time.perf_counter()
+                if self.stream:
+                    content, usage = await self._complete_streaming(messages)
+                    contents = [content]
+                else:
+                    # 只在需要多个候选时传n，兼容不支持该参数的服务商
+                    extra = {"n": self.candidates_per_call} if self.candidates_per_call > 1 else {}
+                    response = await self.client.chat.completions.create(
+                        model=self.model,
+                        messages=messages,
+                        max_tokens=200,
+                        temperature=0.8,
+                        **extra
+                    )
+                    usage = response.usage
+                    contents = [choice.message.content for choice in response.choices if choice.message.content]
+                latency_ms = int((time.perf_counter() - started) * 1000)
+            llm_circuit.record_success()
+            usage_ledger.record(channel.id, target_date, self.model, usage, latency_ms, True)
             
-            content = response.choices[0].message.content.strip()
-            # 清理内容，移除引号等
-            content = content.strip('"').strip("'").strip()
-            # 移除转义的引号
-            content = content.replace('\\"', '"').replace("\\'", "'")
-
-            return content
+            if not contents:
+                raise InvalidCompletionError("empty", "模型没有返回内容")
+            return [self._clean_completion(content) for content in contents], latency_ms
             
         except Exception as e:
             logger.error(f"AI生成语录失败: {e}")
+            if isinstance(e, InvalidCompletionError):
+                # 流式输出被提前中止，服务本身可用
+                llm_circuit.record_success()
+            elif not isinstance(e, LLMBudgetExceededError):
+                llm_circuit.record_failure()
+            if started is not None and latency_ms is None:
+                # 调用未正常返回（出错或流式输出被中止）
+                usage_ledger.record(
+                    channel.id, target_date, self.model, None,
+                    int((time.perf_counter() - started) * 1000), False
+                )
             raise e
-    
-    def _build_prompt(self, target_date: str) -> str:
-        """构建AI提示词"""
-
-        prompts = [
-            "请从你的知识库中提取一句真实哲学家说过的名言。要求：1）必须是历史上真实存在的哲学家说过的话，有历史记录或文献记载；2）内容富有深刻哲理，具有思辨性；3）中文表达，如果原文是外文请提供准确的中文翻译；4）长度必须在30字以上，优先选择50字以上的完整思想表达；5）选择能引发深度思考的完整语录，而非简短格言；6）可以是任何时代、任何文化背景的哲学家；7）返回格式：名言内容|作者姓名。",
 
-            "请提供一句真实哲学家的深刻名言。要求：1）必须是历史上真实存在的哲学家说过或写过的话；2）内容深刻有启发性，具有哲学思辨色彩；3）用中文表达；4）长度必须在30字以上，要有完整的思想表达；5）选择较长的、具有深度思考价值的语录；6）不限制哲学家的时代、国籍或哲学流派；7）返回格式：名言内容|作者姓名。",
+    @staticmethod
+    def _clean_completion(content: str) -> str:
+        """清理模型输出"""
+        content = content.strip()
+        # 清理内容，移除引号等
+        content = content.strip('"').strip("'").strip()
+        # 移除转义的引号
+        return content.replace('\\"', '"').replace("\\'", "'")
 
-            "从世界哲学史上任意一位真实哲学家的言论中选择一句富有哲思的名言。要求：1）必须是有历史记录的真实名言；2）内容具有普世价值和深刻启发意义；3）中文表达；4）长度必须在30字以上，体现完整的哲学思辨；5）优先选择较长的、思想深刻的语录；6）可以是古代、近代或现代的任何哲学家；7）返回格式：名言内容|作者姓名。",
+    async def _complete_streaming(self, messages) -> Tuple[str, Any]:
+        """
+        流式获取模型输出并增量校验
 
-            "请提供一句来自真实哲学家的智慧名言。要求：1）必须是该哲学家真实的言论，有文献记录；2）内容富有智慧，具有深刻的人生哲理或思想洞察；3）使用现代中文表达；4）长度必须在30字以上，要有完整的思想表达；5）选择较长的、适合深度思考的语录；6）不限制哲学家的文化背景或哲学传统；7）返回格式：名言内容|作者姓名。",
+        输出被判定为无效时关闭连接并抛出 InvalidCompletionError；
+        拿到完整的“内容|作者”后不再等待剩余输出。
 
-            "从人类哲学思想宝库中选择一句真实哲学家的深刻名言。要求：1）必须是该哲学家真实写过或说过的话；2）内容深刻，具有强烈的哲学思辨色彩；3）中文表达；4）长度必须在30字以上，体现完整的思想深度；5）选择能引发关于人生、存在、道德、真理等深层思考的较长语录；6）可以来自任何哲学传统或思想流派；7）返回格式：名言内容|作者姓名。"
-        ]
+        Returns:
+            (模型输出, 用量)，服务商未在流中返回用量时用量为 None
+        """
+        validator = StreamingQuoteValidator()
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=200,
+            temperature=0.8,
+            stream=True
+        )
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta and validator.feed(delta):
+                    break
+        finally:
+            await stream.close()
+
+        return validator.finish(), usage
+    
+    def _build_system_prompt(self, channel: ChannelConfig) -> str:
+        """构建频道的系统提示词"""
+        if channel.system_prompt:
+            return channel.system_prompt
+        if channel.id == DEFAULT_CHANNEL_ID:
+            return DEFAULT_SYSTEM_PROMPT
+        return CHANNEL_SYSTEM_PROMPT
+
+    def _build_prompt(self, target_date: str, channel: Optional[ChannelConfig] = None) -> str:
+        """构建AI提示词"""
+        return self._choose_prompt(channel)[1]
+
+    def _channel_templates(self, channel: Optional[ChannelConfig]) -> List[Tuple[str, str]]:
+        """频道可用的提示词模板 [(模板ID, 模板内容)]"""
+        if channel is not None and channel.prompt_templates:
+            return [(template_id(text), text) for text in channel.prompt_templates]
+
+        if channel is None or channel.id == DEFAULT_CHANNEL_ID:
+            templates = prompt_selector.templates()
+            if templates:
+                return templates
+
+        prompt = CHANNEL_PROMPT_TEMPLATE.format(
+            theme=(channel.theme if channel else None) or "人生智慧",
+            audience=(channel.audience if channel else None) or "普通读者",
+            language=(channel.language if channel else None) or "zh-CN"
+        )
+        return [("channel_default", prompt)]
 
-        return random.choice(prompts)
+    def _choose_prompt(self, channel: Optional[ChannelConfig] = None) -> Tuple[str, str]:
+        """按各模板的历史成功率选择提示词，返回 (模板ID, 提示词)"""
+        channel_id = channel.id if channel is not None else DEFAULT_CHANNEL_ID
+        return prompt_selector.choose(channel_id, self._channel_templates(channel))
 
     def _extract_author_from_content(self, content: str) -> str:
         """从AI返回的内容中提取作者信息"""
@@ -146,24 +303,29 @@ class AIQuoteService:
         except Exception:
             return content.strip()
 
-    async def generate_daily_quote(self, target_date: str) -> Dict[str, Any]:
+    async def generate_daily_quote(self, target_date: str, channel: str = DEFAULT_CHANNEL_SLUG) -> Dict[str, Any]:
         """
         生成每日语录（包含重试机制）
 
         Args:
             target_date: 目标日期 (YYYY-MM-DD)
+            channel: 频道标识
 
         Returns:
             生成结果字典
         """
-        from app.models import DailyQuote
+        from app.models import DailyQuote, parse_date
         from app.database import AsyncSessionLocal
 
+        channel_config = await channel_registry.resolve(channel)
+        await quote_validator.ensure_loaded()
+        await prompt_selector.ensure_loaded()
+
         async with AsyncSessionLocal() as db:
             # 检查是否已存在该日期的语录
-            existing_quote = await self._get_quote_by_date(db, target_date)
+            existing_quote = await self._get_quote_by_date(db, target_date, channel_config.id)
             if existing_quote:
-                logger.info(f"日期 {target_date} 的语录已存在")
+                logger.info(f"频道 {channel} 日期 {target_date} 的语录已存在")
                 return {
                     "success": True,
                     "quote": existing_quote.to_dict(),
@@ -172,21 +334,38 @@ class AIQuoteService:
             
             # 尝试生成语录
             for attempt in range(1, self.max_retries + 1):
+                raw_content = None
+                prompt_template = None
+                latency_ms = None
                 try:
-                    logger.info(f"开始第 {attempt} 次尝试生成 {target_date} 的语录")
+                    logger.info(f"开始第 {attempt} 次尝试生成频道 {channel} {target_date} 的语录")
                     
-                    # 生成语录内容
-                    raw_content = await self.generate_quote_content(target_date)
-
-                    # 提取作者信息和清理语录内容
-                    author = self._extract_author_from_content(raw_content)
-                    content = self._clean_quote_content(raw_content)
-
-                    # 保存语录到数据库
+                    # 优先使用候选缓存，缓存为空时请求模型
+                    prompt_key = self._prompt_key(channel_config)
+                    cached = await candidate_cache.take(
+                        channel_config.id, prompt_key,
+                        lambda c, a: self._is_valid_candidate(c, a, channel_config.id)
+                    )
+                    surplus: List[Tuple[str, str]] = []
+                    if cached is not None:
+                        content, author = cached
+                        raw_content = f"{content}|{author}"
+                        logger.info(f"使用候选缓存中的语录，频道 {channel} {target_date}")
+                    else:
+                        prompt_template, prompt = self._choose_prompt(channel_config)
+                        raw_contents, latency_ms = await self._generate_candidates(channel_config, prompt, target_date)
+                        raw_content = raw_contents[0]
+                        raw_content, content, author, surplus = self._select_candidate(raw_contents, channel_config.id)
+                        prompt_selector.record(channel_config.id, prompt_template, True, len(content), latency_ms)
+
+                    # 保存语录到数据库（作者归一化为规范名称）
+                    author_id, author = await author_index.resolve(author)
                     quote = DailyQuote(
+                        channel_id=channel_config.id,
                         content=content,
                         author=author,
-                        date=target_date,
+                        author_id=author_id,
+                        date=parse_date(target_date),
                         is_ai_generated=True,
                         generation_attempts=attempt,
                         is_fallback=False
@@ -195,13 +374,18 @@ class AIQuoteService:
                     db.add(quote)
                     await db.commit()
                     await db.refresh(quote)
+                    quote_validator.remember(channel_config.id, content)
+                    await self._quote_committed(quote)
+                    # 多余的合格候选留给以后使用
+                    await candidate_cache.put(channel_config.id, prompt_key, surplus)
                     
                     # 记录成功日志
                     await self._log_generation_attempt(
-                        db, target_date, attempt, True, None, content
+                        db, target_date, attempt, True, None, content, channel_config.id,
+                        prompt_template=prompt_template, latency_ms=latency_ms
                     )
                     
-                    logger.info(f"成功生成 {target_date} 的语录")
+                    logger.info(f"成功生成频道 {channel} {target_date} 的语录")
                     return {
                         "success": True,
                         "quote": quote.to_dict(),
@@ -211,19 +395,33 @@ class AIQuoteService:
                 except Exception as e:
                     error_msg = str(e)
                     logger.error(f"第 {attempt} 次尝试失败: {error_msg}")
+                    await db.rollback()
+                    if isinstance(e, InvalidCompletionError) and prompt_template is not None:
+                        # 只有输出不合格计入模板统计，网络错误等与提示词无关
+                        prompt_selector.record(channel_config.id, prompt_template, False, latency_ms=latency_ms)
                     
                     # 记录失败日志
                     await self._log_generation_attempt(
-                        db, target_date, attempt, False, error_msg, None
+                        db, target_date, attempt, False, error_msg,
+                        raw_content if isinstance(e, InvalidCompletionError) else None,
+                        channel_config.id, self._failure_reason(e),
+                        prompt_template=prompt_template, latency_ms=latency_ms
                     )
                     
+                    if isinstance(e, LLMBudgetExceededError):
+                        # 预算用尽时重试没有意义，直接使用兜底机制
+                        logger.warning(f"LLM调用预算已用尽，使用兜底机制为 {target_date} 生成语录")
+                        return await self._use_fallback_quote(db, target_date, channel_config)
+
                     if attempt < self.max_retries:
-                        # 等待一段时间后重试
-                        await asyncio.sleep(2 ** attempt)  # 指数退避
+                        # 输出格式无效不是服务端故障，无需退避，立即重试
+                        if not isinstance(e, InvalidCompletionError):
+                            # 等待一段时间后重试
+                            await asyncio.sleep(2 ** attempt)  # 指数退避
                     else:
                         # 所有尝试都失败，使用兜底机制
                         logger.warning(f"所有尝试都失败，使用兜底机制为 {target_date} 生成语录")
-                        return await self._use_fallback_quote(db, target_date)
+                        return await self._use_fallback_quote(db, target_date, channel_config)
             
             # 理论上不会到达这里
             return {
@@ -231,16 +429,89 @@ class AIQuoteService:
                 "message": "未知错误"
             }
 
-    async def _get_quote_by_date(self, db: Session, target_date: str):
-        """根据日期获取语录"""
+    async def _get_quote_by_date(self, db: Session, target_date: str, channel_id: int = DEFAULT_CHANNEL_ID):
+        """根据频道和日期获取语录"""
         from sqlalchemy import select
-        from app.models import DailyQuote
+        from app.models import DailyQuote, parse_date
 
         result = await db.execute(
-            select(DailyQuote).where(DailyQuote.date == target_date)
+            select(DailyQuote).where(
+                DailyQuote.channel_id == channel_id,
+                DailyQuote.date == parse_date(target_date)
+            )
         )
         return result.scalar_one_or_none()
 
+    def _prompt_key(self, channel: ChannelConfig) -> str:
+        """频道提示词指纹，提示词或模型变化后缓存的候选不再使用"""
+        templates = [text for _, text in self._channel_templates(channel)]
+        source = "\n".join([self.model, self._build_system_prompt(channel), *templates,
+                             channel.theme or "", channel.audience or "", channel.language or ""])
+        return hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _is_valid_candidate(self, content: str, author: str, channel_id: int) -> bool:
+        """缓存中的候选在取用时重新校验（期间可能已有重复语录入库）"""
+        try:
+            quote_validator.validate(f"{content}|{author}", content, author, channel_id)
+        except InvalidCompletionError:
+            return False
+        return True
+
+    def _select_candidate(self, raw_contents: List[str], channel_id: int) -> Tuple[str, str, str, List[Tuple[str, str]]]:
+        """
+        从一组候选中选出第一条合格的语录
+
+        Returns:
+            (原始输出, 内容, 作者, 其余合格候选列表)
+
+        Raises:
+            InvalidCompletionError: 没有合格的候选，使用第一条候选的拒绝原因
+        """
+        selected = None
+        surplus: List[Tuple[str, str]] = []
+        seen = set()
+        first_error = None
+        for raw_content in raw_contents:
+            author = self._extract_author_from_content(raw_content)
+            content = self._clean_quote_content(raw_content)
+            try:
+                # 入库前校验，不通过时按失败处理并重试
+                quote_validator.validate(raw_content, content, author, channel_id)
+            except InvalidCompletionError as e:
+                first_error = first_error or e
+                continue
+
+            fingerprint = candidate_cache.fingerprint(content)
+            if fingerprint in seen:
+                continue
+            seen.add(fingerprint)
+            if selected is None:
+                selected = (raw_content, content, author)
+            else:
+                surplus.append((content, author))
+
+        if selected is None:
+            raise first_error
+        return (*selected, surplus)
+
+    @staticmethod
+    def _failure_reason(error: Exception) -> str:
+        """失败原因代码"""
+        if isinstance(error, InvalidCompletionError):
+            return error.reason
+        if isinstance(error, LLMBudgetExceededError):
+            return "budget_exhausted"
+        return "llm_error"
+
+    async def _quote_committed(self, quote: DailyQuote):
+        """
+        语录写入后的公共处理：刷新各进程缓存，并在后台预先绘制分享卡片
+
+        定时和手动生成任务、兜底语录写入以及兜底修复都经过这里，卡片不必等到零点首次请求时才绘制
+        """
+        await cache_events.quote_written(quote)
+        card_renderer.prerender(quote.to_dict())
+
     async def _log_generation_attempt(
         self,
         db: Session,
@@ -248,47 +519,62 @@ class AIQuoteService:
         attempt: int,
         success: bool,
         error_msg: Optional[str],
-        content: Optional[str]
+        content: Optional[str],
+        channel_id: int = DEFAULT_CHANNEL_ID,
+        reason_code: Optional[str] = None,
+        prompt_template: Optional[str] = None,
+        latency_ms: Optional[int] = None
     ):
         """记录生成尝试日志"""
-        from app.models import QuoteGenerationLog
+        from app.models import QuoteGenerationLog, parse_date
 
         log = QuoteGenerationLog(
-            date=target_date,
+            channel_id=channel_id,
+            date=parse_date(target_date),
             attempt_number=attempt,
             success=success,
             error_message=error_msg,
+            reason_code=reason_code,
+            prompt_template=prompt_template,
+            latency_ms=latency_ms,
             generated_content=content
         )
         db.add(log)
         await db.commit()
 
-    async def _use_fallback_quote(self, db: Session, target_date: str) -> Dict[str, Any]:
-        """使用兜底机制：从历史语录中随机选择一条"""
+    async def _use_fallback_quote(self, db: Session, target_date: str, channel: ChannelConfig) -> Dict[str, Any]:
+        """使用兜底机制：从本频道历史语录中随机选择一条"""
         try:
-            from sqlalchemy import select
-            from app.models import DailyQuote
+            from sqlalchemy import select, func
+            from app.models import DailyQuote, parse_date
 
-            # 获取所有历史语录
+            # 在数据库中随机取一条本频道的历史语录
             result = await db.execute(
-                select(DailyQuote).where(DailyQuote.date != target_date)
+                select(DailyQuote.content, DailyQuote.author)
+                .where(
+                    DailyQuote.channel_id == channel.id,
+                    DailyQuote.date != parse_date(target_date)
+                )
+                .order_by(func.random())
+                .limit(1)
             )
-            historical_quotes = result.scalars().all()
+            selected_quote = result.first()
 
-            if not historical_quotes:
-                # 如果没有历史语录，使用预设的兜底语录
-                fallback_content, fallback_author = self._get_default_fallback_quote()
-            else:
+            if selected_quote:
                 # 随机选择一条历史语录
-                selected_quote = random.choice(historical_quotes)
-                fallback_content = selected_quote.content
-                fallback_author = selected_quote.author
+                fallback_content, fallback_author = selected_quote
+            else:
+                # 如果没有历史语录，使用频道兜底语录池或预设的兜底语录
+                fallback_content, fallback_author = pick_fallback(channel) or self._get_default_fallback_quote()
 
             # 创建兜底语录
+            author_id, fallback_author = await author_index.resolve(fallback_author)
             quote = DailyQuote(
+                channel_id=channel.id,
                 content=fallback_content,
                 author=fallback_author,
-                date=target_date,
+                author_id=author_id,
+                date=parse_date(target_date),
                 is_ai_generated=False,
                 generation_attempts=self.max_retries,
                 is_fallback=True
@@ -297,8 +583,10 @@ class AIQuoteService:
             db.add(quote)
             await db.commit()
             await db.refresh(quote)
+            quote_validator.remember(channel.id, fallback_content)
+            await self._quote_committed(quote)
 
-            logger.info(f"为 {target_date} 使用兜底语录")
+            logger.info(f"为频道 {channel.slug} {target_date} 使用兜底语录")
             return {
                 "success": True,
                 "quote": quote.to_dict(),
@@ -312,6 +600,97 @@ class AIQuoteService:
                 "message": f"兜底机制失败: {e}"
             }
 
+    async def replace_fallback_quote(self, quote_id: int) -> Dict[str, Any]:
+        """
+        为一条尚未发布的兜底语录重新生成内容并原子替换（只尝试一次，失败时保持原样）
+
+        Returns:
+            生成结果字典，success 为 True 时 quote 为替换后的语录
+        """
+        from sqlalchemy import update, func
+        from app.models import DailyQuote
+        from app.database import AsyncSessionLocal
+
+        await channel_registry.ensure_loaded()
+        await quote_validator.ensure_loaded()
+        await prompt_selector.ensure_loaded()
+
+        async with AsyncSessionLocal() as db:
+            quote = await db.get(DailyQuote, quote_id)
+            if quote is None or not quote.is_fallback or quote.date <= date.today():
+                return {"success": False, "message": "语录已发布或不是兜底语录，无需替换"}
+            channel_config = channel_registry.get_by_id(quote.channel_id)
+            if channel_config is None:
+                return {"success": False, "message": f"频道 {quote.channel_id} 不存在或未启用"}
+            target_date = quote.date.isoformat()
+
+            prompt_template = None
+            latency_ms = None
+            prompt_key = self._prompt_key(channel_config)
+            cached = await candidate_cache.take(
+                channel_config.id, prompt_key,
+                lambda c, a: self._is_valid_candidate(c, a, channel_config.id)
+            )
+            surplus: List[Tuple[str, str]] = []
+            try:
+                if cached is not None:
+                    content, author = cached
+                else:
+                    prompt_template, prompt = self._choose_prompt(channel_config)
+                    raw_contents, latency_ms = await self._generate_candidates(channel_config, prompt, target_date)
+                    _, content, author, surplus = self._select_candidate(raw_contents, channel_config.id)
+                    prompt_selector.record(channel_config.id, prompt_template, True, len(content), latency_ms)
+            except Exception as e:
+                if isinstance(e, InvalidCompletionError) and prompt_template is not None:
+                    prompt_selector.record(channel_config.id, prompt_template, False, latency_ms=latency_ms)
+                await self._log_generation_attempt(
+                    db, target_date, quote.generation_attempts + 1, False, str(e), None,
+                    channel_config.id, self._failure_reason(e),
+                    prompt_template=prompt_template, latency_ms=latency_ms
+                )
+                return {"success": False, "message": f"重新生成失败: {e}"}
+
+            # 条件更新：期间已被替换或日期已到时不覆盖
+            author_id, author = await author_index.resolve(author)
+            result = await db.execute(
+                update(DailyQuote)
+                .where(
+                    DailyQuote.id == quote_id,
+                    DailyQuote.is_fallback.is_(True),
+                    DailyQuote.date > date.today()
+                )
+                .values(
+                    content=content,
+                    author=author,
+                    author_id=author_id,
+                    is_fallback=False,
+                    is_ai_generated=True,
+                    generation_attempts=DailyQuote.generation_attempts + 1,
+                    updated_at=func.now()
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                await candidate_cache.put(channel_config.id, prompt_key, [(content, author), *surplus])
+                return {"success": False, "message": "语录已被修改，放弃替换"}
+
+            await db.refresh(quote)
+            quote_validator.remember(channel_config.id, content)
+            await self._quote_committed(quote)
+            await candidate_cache.put(channel_config.id, prompt_key, surplus)
+            await self._log_generation_attempt(
+                db, target_date, quote.generation_attempts, True, None, content, channel_config.id,
+                prompt_template=prompt_template, latency_ms=latency_ms
+            )
+
+            logger.info(f"已用新生成的语录替换频道 {channel_config.slug} {target_date} 的兜底语录")
+            return {
+                "success": True,
+                "quote": quote.to_dict(),
+                "message": "兜底语录已替换"
+            }
+
     def _get_default_fallback_quote(self) -> tuple:
         """获取默认兜底语录，返回(内容, 作者)"""
         default_quotes = [
@@ -333,22 +712,62 @@ class AIQuoteService:
         ]
         return random.choice(default_quotes)
 
-    async def get_today_quote(self) -> Optional[Dict[str, Any]]:
+    async def get_today_quote(self, channel: str = DEFAULT_CHANNEL_SLUG) -> Optional[Dict[str, Any]]:
         """获取今日语录"""
-        from app.database import AsyncSessionLocal
+        from app.database import AsyncReadSessionLocal
 
         today = date.today().strftime("%Y-%m-%d")
+        channel_config = await channel_registry.resolve(channel)
+
+        # 零点前预热的语录
+        quote_data = rollover.get(channel_config.id, date.today())
+        if quote_data:
+            return quote_data
+
+        if quote_store.ready:
+            quote_data = quote_store.get(channel_config.id, date.today())
+            if quote_data:
+                return quote_data
+        else:
+            async with AsyncReadSessionLocal() as db:
+                quote = await self._get_quote_by_date(db, today, channel_config.id)
+                if quote:
+                    return quote.to_dict()
+
+        # 如果今日语录不存在，立即生成一条
+        result = await self.generate_via_queue(today, channel)
+        if result["success"]:
+            return result["quote"]
+        return None
+
+    async def generate_via_queue(
+        self,
+        target_date: str,
+        channel: str = DEFAULT_CHANNEL_SLUG,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        通过任务队列生成语录并等待结果
 
-        async with AsyncSessionLocal() as db:
-            quote = await self._get_quote_by_date(db, today)
-            if quote:
-                return quote.to_dict()
-            else:
-                # 如果今日语录不存在，立即生成一条
-                result = await self.generate_daily_quote(today)
-                if result["success"]:
-                    return result["quote"]
-                return None
+        任务队列未启动时（例如脚本中直接调用）退化为直接生成；
+        api 进程只提交任务，由 worker 进程执行。
+        并发的相同请求会合并到同一个任务上。
+        """
+        from app.job_queue import job_queue, JOB_SUCCEEDED
+
+        if not job_queue.is_running and runs_generation():
+            return await self.generate_daily_quote(target_date, channel)
+
+        job = await job_queue.enqueue_and_wait(
+            target_date, channel, self.job_wait_timeout if timeout is None else timeout
+        )
+        if job and job["status"] == JOB_SUCCEEDED:
+            return job["result"]
+        return {
+            "success": False,
+            "job": job,
+            "message": (job or {}).get("error") or "生成任务尚未完成"
+        }
 
 
 # 创建全局AI服务实例
@@ -1,14 +1,29 @@
 """
 FastAPI路由和API接口
 """
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Header
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select, desc
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Optional, Dict, Any
-from app.database import get_async_db, AsyncSessionLocal
-from app.models import DailyQuote
+from app.database import get_async_db, AsyncSessionLocal, AsyncReadSessionLocal
+from app.models import DailyQuote, parse_date, DEFAULT_CHANNEL_SLUG
 from app.ai_service import ai_service
+from app.channels import channel_registry, ChannelNotFoundError
+from app.rate_limit import limit_reads, limit_generation, llm_budget
+from app.job_queue import job_queue, JOB_SUCCEEDED, JOB_FAILED, FINISHED_STATUSES
+from app.quote_store import quote_store
+from app.rollover import rollover
+from app.quote_range import load_range, iter_range_body, MAX_RANGE_DAYS, RANGE_STREAM_THRESHOLD_DAYS
+from app.authors import author_index
+from app.related import related_index
+from app.usage import usage_ledger
+from app.cards import card_renderer, CardUnavailableError, DEFAULT_THEME
+from app.card_render import THEMES
+import os
+import math
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,17 +31,51 @@ logger = logging.getLogger(__name__)
 # 创建API路由器
 router = APIRouter()
 
+# 接口等待任务完成的最长秒数
+MAX_JOB_WAIT_SECONDS = 30
 
-@router.get("/quote", summary="获取每日语录", description="获取当天的每日语录")
-async def get_daily_quote():
-    """
-    获取每日语录
-    
-    Returns:
-        Dict: 包含语录信息的字典
-    """
+
+def _parse_date_or_400(target_date: str) -> date:
+    """解析日期参数，格式错误时返回400"""
     try:
-        quote_data = await ai_service.get_today_quote()
+        return parse_date(target_date)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="日期格式错误，请使用 YYYY-MM-DD 格式"
+        )
+
+
+async def _resolve_channel_or_404(channel: str):
+    """解析频道参数，频道不存在时返回404"""
+    try:
+        return await channel_registry.resolve(channel)
+    except ChannelNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+def _quote_etag(quote_data: Dict[str, Any]) -> str:
+    """语录的ETag（日期、正文、作者不变时不变，各进程计算结果一致）"""
+    source = "\x1f".join([quote_data["date"], quote_data["author"] or "", quote_data["content"]])
+    return f'"{hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]}"'
+
+
+async def _daily_quote_etag_response(channel: str, if_none_match: Optional[str]):
+    """获取频道今日语录，内容未变化时返回304（客户端用 If-None-Match 重新验证）"""
+    result = await _daily_quote_response(channel)
+    etag = _quote_etag(result["data"])
+    # 零点后同一地址返回新的语录，客户端每次都需要重新验证
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=result, headers=headers)
+
+
+async def _daily_quote_response(channel: str) -> Dict[str, Any]:
+    """获取频道今日语录"""
+    try:
+        await _resolve_channel_or_404(channel)
+        quote_data = await ai_service.get_today_quote(channel)
         
         if not quote_data:
             raise HTTPException(
@@ -40,6 +89,8 @@ async def get_daily_quote():
             "message": "获取成功"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取每日语录失败: {e}")
         raise HTTPException(
@@ -48,44 +99,38 @@ async def get_daily_quote():
         )
 
 
-@router.get("/quote/{target_date}", summary="获取指定日期语录", description="获取指定日期的语录")
-async def get_quote_by_date(target_date: str):
-    """
-    获取指定日期的语录
-    
-    Args:
-        target_date: 日期字符串 (YYYY-MM-DD)
-        
-    Returns:
-        Dict: 包含语录信息的字典
-    """
+async def _quote_by_date_response(target_date: str, channel: str) -> Dict[str, Any]:
+    """获取频道指定日期的语录"""
     try:
         # 验证日期格式
-        try:
-            datetime.strptime(target_date, "%Y-%m-%d")
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="日期格式错误，请使用 YYYY-MM-DD 格式"
-            )
+        parsed_date = _parse_date_or_400(target_date)
+        channel_config = await _resolve_channel_or_404(channel)
         
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(
-                select(DailyQuote).where(DailyQuote.date == target_date)
-            )
-            quote = result.scalar_one_or_none()
-            
-            if not quote:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"未找到日期 {target_date} 的语录"
+        if quote_store.ready:
+            # 内存存储模式下不访问数据库
+            quote_data = quote_store.get(channel_config.id, parsed_date)
+        else:
+            async with AsyncReadSessionLocal() as db:
+                result = await db.execute(
+                    select(DailyQuote).where(
+                        DailyQuote.channel_id == channel_config.id,
+                        DailyQuote.date == parsed_date
+                    )
                 )
+                quote = result.scalar_one_or_none()
+                quote_data = quote.to_dict() if quote else None
             
-            return {
-                "success": True,
-                "data": quote.to_dict(),
-                "message": "获取成功"
-            }
+        if not quote_data:
+            raise HTTPException(
+                status_code=404,
+                detail=f"未找到日期 {target_date} 的语录"
+            )
+        
+        return {
+            "success": True,
+            "data": quote_data,
+            "message": "获取成功"
+        }
             
     except HTTPException:
         raise
@@ -97,41 +142,53 @@ async def get_quote_by_date(target_date: str):
         )
 
 
-@router.get("/quotes/recent", summary="获取最近的语录", description="获取最近N条语录")
-async def get_recent_quotes(limit: int = 10):
-    """
-    获取最近的语录列表
-    
-    Args:
-        limit: 返回的语录数量，默认10条，最大50条
-        
-    Returns:
-        Dict: 包含语录列表的字典
-    """
+async def _recent_quotes_response(
+    limit: int, channel: str, author: Optional[str] = None, since: Optional[str] = None
+) -> Dict[str, Any]:
+    """获取频道最近的语录列表，可按作者（名称或任一别名）筛选，since 只返回该日期之后的语录"""
+    since_date = _parse_date_or_400(since) if since else None
     try:
         # 限制查询数量
         if limit > 50:
             limit = 50
         elif limit < 1:
             limit = 1
+
+        channel_config = await _resolve_channel_or_404(channel)
         
-        async with AsyncSessionLocal() as db:
-            result = await db.execute(
-                select(DailyQuote)
-                .order_by(desc(DailyQuote.date))
-                .limit(limit)
-            )
-            quotes = result.scalars().all()
-            
-            quotes_data = [quote.to_dict() for quote in quotes]
+        if author:
+            author_id = await author_index.find(author)
+            quotes_data = []
+            if author_id is not None:
+                async with AsyncReadSessionLocal() as db:
+                    query = select(DailyQuote).where(
+                        DailyQuote.channel_id == channel_config.id, DailyQuote.author_id == author_id
+                    )
+                    if since_date:
+                        query = query.where(DailyQuote.date > since_date)
+                    result = await db.execute(query.order_by(desc(DailyQuote.date)).limit(limit))
+                    quotes_data = [quote.to_dict() for quote in result.scalars().all()]
+        elif quote_store.ready:
+            quotes_data = quote_store.recent(channel_config.id, limit, since_date)
+        else:
+            async with AsyncReadSessionLocal() as db:
+                query = select(DailyQuote).where(DailyQuote.channel_id == channel_config.id)
+                if since_date:
+                    query = query.where(DailyQuote.date > since_date)
+                result = await db.execute(query.order_by(desc(DailyQuote.date)).limit(limit))
+                quotes = result.scalars().all()
+                
+                quotes_data = [quote.to_dict() for quote in quotes]
             
-            return {
-                "success": True,
-                "data": quotes_data,
-                "count": len(quotes_data),
-                "message": "获取成功"
-            }
+        return {
+            "success": True,
+            "data": quotes_data,
+            "count": len(quotes_data),
+            "message": "获取成功"
+        }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取最近语录失败: {e}")
         raise HTTPException(
@@ -140,31 +197,313 @@ async def get_recent_quotes(limit: int = 10):
         )
 
 
-@router.post("/quote/generate", summary="手动生成语录", description="手动为指定日期生成语录")
-async def generate_quote_manually(target_date: str):
+async def _authors_response(limit: int, channel: str) -> Dict[str, Any]:
+    """获取频道各作者的语录数量"""
+    limit = min(max(limit, 1), 200)
+    channel_config = await _resolve_channel_or_404(channel)
+    try:
+        authors = await author_index.stats(channel_config.id, limit)
+    except Exception as e:
+        logger.error(f"获取作者统计失败: {e}")
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+    return {
+        "success": True,
+        "data": authors,
+        "count": len(authors),
+        "message": "获取成功"
+    }
+
+
+async def _range_response(start: str, end: str, channel: str):
+    """获取频道日期范围内的语录（按天排列，缺失日期为null）"""
+    start_date = _parse_date_or_400(start)
+    end_date = _parse_date_or_400(end)
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="结束日期不能早于开始日期")
+    days = (end_date - start_date).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"日期范围不能超过 {MAX_RANGE_DAYS} 天")
+
+    channel_config = await _resolve_channel_or_404(channel)
+    try:
+        months = await load_range(channel_config.id, start_date, end_date)
+    except Exception as e:
+        logger.error(f"获取日期范围语录失败: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"服务器内部错误: {str(e)}"
+        )
+
+    body = iter_range_body(start_date, end_date, months)
+    if days > RANGE_STREAM_THRESHOLD_DAYS:
+        return StreamingResponse(body, media_type="application/json")
+    return Response(content=b"".join(body), media_type="application/json")
+
+
+async def _card_response(target_date: str, theme: str, channel: str, if_none_match: Optional[str]):
+    """获取语录卡片图片"""
+    if theme not in THEMES:
+        raise HTTPException(status_code=400, detail=f"不支持的主题 {theme}，可选: {', '.join(THEMES)}")
+
+    quote_data = (await _quote_by_date_response(target_date, channel))["data"]
+    etag = f'"{card_renderer.cache_key(quote_data["content"], quote_data["author"], quote_data["date"], theme)}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+
+    try:
+        image = await card_renderer.get_card(quote_data, theme)
+    except CardUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"绘制语录卡片失败: {e}")
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+    return Response(content=image, media_type="image/png", headers=headers)
+
+
+async def _related_response(target_date: str, channel: str, limit: int) -> Dict[str, Any]:
+    """获取与指定语录最相似的历史语录"""
+    limit = min(max(limit, 1), 20)
+    quote_data = (await _quote_by_date_response(target_date, channel))["data"]
+    if not related_index.ready:
+        raise HTTPException(status_code=503, detail="相似语录索引尚未建立，请稍后重试")
+
+    try:
+        matches = related_index.query(
+            quote_data["channel_id"], quote_data["content"],
+            exclude_id=quote_data["id"], until=date.today(), limit=limit
+        )
+        scores = {quote_id: score for quote_id, _, score in matches}
+        if quote_store.ready:
+            quotes = [quote_store.get(quote_data["channel_id"], quote_date) for _, quote_date, _ in matches]
+        else:
+            async with AsyncReadSessionLocal() as db:
+                result = await db.execute(select(DailyQuote).where(DailyQuote.id.in_(list(scores))))
+                by_id = {quote.id: quote.to_dict() for quote in result.scalars().all()}
+            quotes = [by_id.get(quote_id) for quote_id, _, _ in matches]
+    except Exception as e:
+        logger.error(f"获取相似语录失败: {e}")
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+    related = [{**quote, "score": scores[quote["id"]]} for quote in quotes if quote]
+    return {
+        "success": True,
+        "data": related,
+        "count": len(related),
+        "message": "获取成功"
+    }
+
+
+async def _next_quote_response(after: Optional[str], timeout: float, channel: str):
+    """长轮询等待下一天的语录，超时返回204；目标日期还没到时在 Retry-After 中给出距离零点的秒数"""
+    after_date = _parse_date_or_400(after) if after else date.today()
+    channel_config = await _resolve_channel_or_404(channel)
+
+    target_date = after_date + timedelta(days=1)
+    quote_data = await rollover.wait_for(channel_config.id, target_date, timeout)
+    if quote_data is None:
+        seconds_to_day = rollover.seconds_until(target_date)
+        if seconds_to_day > 0:
+            return Response(status_code=204, headers={"Retry-After": str(math.ceil(seconds_to_day))})
+        return Response(status_code=204)
+
+    return {
+        "success": True,
+        "data": quote_data,
+        "message": "获取成功"
+    }
+
+
+@router.get("/quote", summary="获取每日语录", description="获取当天的每日语录", dependencies=[Depends(limit_reads)])
+async def get_daily_quote(if_none_match: Optional[str] = Header(None)):
+    """
+    获取每日语录
+    
+    Returns:
+        Dict: 包含语录信息的字典，带ETag；If-None-Match 匹配时返回304
+    """
+    return await _daily_quote_etag_response(DEFAULT_CHANNEL_SLUG, if_none_match)
+
+
+@router.get(
+    "/quote/next",
+    summary="等待下一天的语录",
+    description="长轮询：挂起请求直到after之后一天的语录就绪（默认为明天），就绪后随机延迟返回以分散零点流量；超时返回204，目标日期还没到时带 Retry-After",
+    dependencies=[Depends(limit_reads)]
+)
+async def get_next_quote(after: Optional[str] = None, timeout: float = 60):
+    """
+    等待下一天的语录
+    
+    Args:
+        after: 客户端当前持有语录的日期 (YYYY-MM-DD)，默认为今天
+        timeout: 最长等待秒数，超过 ROLLOVER_MAX_WAIT_SECONDS 时按该值截断
+        
+    Returns:
+        Dict: 包含语录信息的字典；超时返回204，客户端可重新发起请求（带 Retry-After 时等待该秒数后再请求）
+    """
+    return await _next_quote_response(after, timeout, DEFAULT_CHANNEL_SLUG)
+
+
+@router.get("/quote/{target_date}", summary="获取指定日期语录", description="获取指定日期的语录", dependencies=[Depends(limit_reads)])
+async def get_quote_by_date(target_date: str):
+    """
+    获取指定日期的语录
+    
+    Args:
+        target_date: 日期字符串 (YYYY-MM-DD)
+        
+    Returns:
+        Dict: 包含语录信息的字典
+    """
+    return await _quote_by_date_response(target_date, DEFAULT_CHANNEL_SLUG)
+
+
+@router.get(
+    "/quote/{target_date}/card.png",
+    summary="获取语录卡片图片",
+    description="返回服务端绘制的日签分享图片（PNG），theme 可选 light/dark",
+    dependencies=[Depends(limit_reads)],
+    response_class=Response
+)
+async def get_quote_card(target_date: str, theme: str = DEFAULT_THEME, if_none_match: Optional[str] = Header(None)):
+    """获取语录卡片图片"""
+    return await _card_response(target_date, theme, DEFAULT_CHANNEL_SLUG, if_none_match)
+
+
+@router.get(
+    "/quote/{target_date}/related",
+    summary="获取相似语录",
+    description="返回与指定日期语录最相似的历史语录（本地字符n-gram向量，按余弦相似度降序）",
+    dependencies=[Depends(limit_reads)]
+)
+async def get_related_quotes(target_date: str, limit: int = 5):
+    """
+    获取相似语录
+    
+    Args:
+        target_date: 日期字符串 (YYYY-MM-DD)
+        limit: 返回数量，默认5条，最大20条
+    """
+    return await _related_response(target_date, DEFAULT_CHANNEL_SLUG, limit)
+
+
+@router.get("/quotes/recent", summary="获取最近的语录", description="获取最近N条语录，可按作者筛选，since 只返回该日期之后的语录", dependencies=[Depends(limit_reads)])
+async def get_recent_quotes(limit: int = 10, author: Optional[str] = None, since: Optional[str] = None):
+    """
+    获取最近的语录列表
+    
+    Args:
+        limit: 返回的语录数量，默认10条，最大50条
+        author: 作者名称或别名，如“康德”“Kant”
+        since: 只返回该日期 (YYYY-MM-DD) 之后的语录，客户端增量更新本地缓存时使用
+        
+    Returns:
+        Dict: 包含语录列表的字典
+    """
+    return await _recent_quotes_response(limit, DEFAULT_CHANNEL_SLUG, author, since)
+
+
+@router.get("/authors", summary="作者统计", description="按语录数量列出作者", dependencies=[Depends(limit_reads)])
+async def get_authors(limit: int = 50):
+    """
+    作者统计
+    
+    Args:
+        limit: 返回的作者数量，默认50，最大200
+    """
+    return await _authors_response(limit, DEFAULT_CHANNEL_SLUG)
+
+
+@router.get(
+    "/quotes/range",
+    summary="按日期范围获取语录",
+    description="获取start到end（含）之间每天的语录，按天排列，没有语录的日期为null，适合日历视图",
+    dependencies=[Depends(limit_reads)]
+)
+async def get_quotes_range(start: str, end: str):
+    """
+    按日期范围获取语录
+    
+    Args:
+        start: 开始日期 (YYYY-MM-DD)
+        end: 结束日期 (YYYY-MM-DD)，包含在内
+        
+    Returns:
+        quotes 数组的第 i 个元素为 start 之后第 i 天的 [内容, 作者]，缺失为 null
+    """
+    return await _range_response(start, end, DEFAULT_CHANNEL_SLUG)
+
+
+def _job_response(job: Dict[str, Any]):
+    """任务结果响应：已完成返回200，未完成返回202"""
+    if job["status"] == JOB_SUCCEEDED:
+        return {
+            "success": True,
+            "data": job,
+            "message": f"成功生成 {job['target_date']} 的语录"
+        }
+    if job["status"] == JOB_FAILED:
+        return {
+            "success": False,
+            "data": job,
+            "message": f"生成语录失败: {job.get('error') or '未知错误'}"
+        }
+    return JSONResponse(
+        status_code=202,
+        content={
+            "success": True,
+            "data": job,
+            "message": "生成任务已提交，可通过 GET /api/jobs/{job_id} 查询结果"
+        }
+    )
+
+
+@router.post(
+    "/quote/generate",
+    summary="手动生成语录",
+    description="提交指定日期的语录生成任务并立即返回任务ID。注意：此接口可通过环境变量ENABLE_MANUAL_GENERATION控制是否启用。",
+    dependencies=[Depends(limit_generation)]
+)
+async def generate_quote_manually(
+    target_date: str,
+    channel: str = DEFAULT_CHANNEL_SLUG,
+    wait: float = 0,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     手动生成指定日期的语录
     
     Args:
         target_date: 目标日期 (YYYY-MM-DD)
+        channel: 频道标识，默认为默认频道
+        wait: 等待任务完成的秒数，默认不等待，最长30秒
+        idempotency_key: 幂等键（请求头 Idempotency-Key），默认按频道和日期生成
         
     Returns:
-        Dict: 生成结果
+        Dict: 已存在的语录，或生成任务信息
     """
+    # 检查是否启用手动生成功能
+    enable_manual_generation = os.getenv("ENABLE_MANUAL_GENERATION", "False").lower() == "true"
+    if not enable_manual_generation:
+        raise HTTPException(
+            status_code=403,
+            detail="手动生成功能已被禁用。如需启用，请在.env文件中设置ENABLE_MANUAL_GENERATION=True"
+        )
+
     try:
         # 验证日期格式
-        try:
-            datetime.strptime(target_date, "%Y-%m-%d")
-        except ValueError:
-            raise HTTPException(
-                status_code=400,
-                detail="日期格式错误，请使用 YYYY-MM-DD 格式"
-            )
+        parsed_date = _parse_date_or_400(target_date)
+        channel_config = await _resolve_channel_or_404(channel)
         
         # 检查是否已存在
         async with AsyncSessionLocal() as db:
             result = await db.execute(
-                select(DailyQuote).where(DailyQuote.date == target_date)
+                select(DailyQuote).where(
+                    DailyQuote.channel_id == channel_config.id,
+                    DailyQuote.date == parsed_date
+                )
             )
             existing_quote = result.scalar_one_or_none()
             
@@ -175,20 +514,20 @@ async def generate_quote_manually(target_date: str):
                     "message": "该日期的语录已存在"
                 }
         
-        # 生成新语录
-        result = await ai_service.generate_daily_quote(target_date)
-        
-        if result["success"]:
-            return {
-                "success": True,
-                "data": result["quote"],
-                "message": f"成功生成 {target_date} 的语录"
-            }
-        else:
+        # LLM调用预算不足时拒绝，避免为任意日期写入兜底语录
+        if not llm_budget.has_capacity():
             raise HTTPException(
-                status_code=500,
-                detail=f"生成语录失败: {result.get('message', '未知错误')}"
+                status_code=429,
+                detail="LLM调用预算已用尽，请稍后重试",
+                headers={"Retry-After": "60"}
             )
+
+        # 提交生成任务，由后台工作协程执行
+        job = await job_queue.enqueue(target_date, channel, idempotency_key)
+        if wait > 0 and job["status"] not in FINISHED_STATUSES:
+            job = await job_queue.wait(job["id"], min(wait, MAX_JOB_WAIT_SECONDS)) or job
+
+        return _job_response(job)
             
     except HTTPException:
         raise
@@ -200,6 +539,73 @@ async def generate_quote_manually(target_date: str):
         )
 
 
+@router.get("/jobs/{job_id}", summary="查询生成任务", description="查询生成任务状态，可通过wait参数等待任务完成", dependencies=[Depends(limit_reads)])
+async def get_generation_job(job_id: int, wait: float = 0):
+    """
+    查询生成任务
+    
+    Args:
+        job_id: 任务ID
+        wait: 等待任务完成的秒数，默认不等待，最长30秒
+        
+    Returns:
+        Dict: 任务信息
+    """
+    if wait > 0:
+        job = await job_queue.wait(job_id, min(wait, MAX_JOB_WAIT_SECONDS))
+    else:
+        job = await job_queue.get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"未找到任务 {job_id}")
+
+    return _job_response(job)
+
+
+@router.get("/channels", summary="获取频道列表", description="获取所有启用的语录频道", dependencies=[Depends(limit_reads)])
+async def list_channels():
+    """获取频道列表"""
+    channels = await channel_registry.all()
+    return {
+        "success": True,
+        "data": [
+            {
+                "slug": c.slug,
+                "name": c.name,
+                "language": c.language,
+                "theme": c.theme,
+                "audience": c.audience
+            }
+            for c in channels
+        ],
+        "count": len(channels),
+        "message": "获取成功"
+    }
+
+
+@router.get("/stats/usage", summary="LLM用量统计", description="按调用日期和按语录汇总最近N天的LLM调用次数、token用量、耗时和费用", dependencies=[Depends(limit_reads)])
+async def get_usage_stats(days: int = 7, channel: Optional[str] = None):
+    """获取LLM用量统计，channel 只筛选按语录的汇总"""
+    days = min(max(days, 1), usage_ledger.rollup_days)
+    channel_config = await _resolve_channel_or_404(channel) if channel else None
+    try:
+        summary = await usage_ledger.summary(days, channel_config.id if channel_config else None)
+    except Exception as e:
+        logger.error(f"获取LLM用量统计失败: {e}")
+        raise HTTPException(status_code=500, detail=f"服务器内部错误: {str(e)}")
+
+    for row in summary["quotes"]:
+        quote_channel = channel_config or channel_registry.get_by_id(row["channel_id"])
+        row["channel"] = quote_channel.slug if quote_channel else None
+    summary["budget"] = llm_budget.get_status()
+    return {
+        "success": True,
+        "data": summary,
+        "count": len(summary["quotes"]),
+        "message": "获取成功"
+    }
+
+
 @router.get("/health", summary="健康检查", description="检查服务状态")
 async def health_check():
     """健康检查接口"""
@@ -208,3 +614,62 @@ async def health_check():
         "timestamp": datetime.now().isoformat(),
         "service": "每日一言系统"
     }
+
+
+@router.get("/{channel}/quote", summary="获取频道每日语录", description="获取指定频道当天的语录", dependencies=[Depends(limit_reads)])
+async def get_channel_daily_quote(channel: str, if_none_match: Optional[str] = Header(None)):
+    """获取频道每日语录"""
+    return await _daily_quote_etag_response(channel, if_none_match)
+
+
+@router.get("/{channel}/quote/next", summary="等待频道下一天的语录", description="长轮询等待指定频道after之后一天的语录，超时返回204", dependencies=[Depends(limit_reads)])
+async def get_channel_next_quote(channel: str, after: Optional[str] = None, timeout: float = 60):
+    """等待频道下一天的语录"""
+    return await _next_quote_response(after, timeout, channel)
+
+
+@router.get("/{channel}/quote/{target_date}", summary="获取频道指定日期语录", description="获取指定频道指定日期的语录", dependencies=[Depends(limit_reads)])
+async def get_channel_quote_by_date(channel: str, target_date: str):
+    """获取频道指定日期的语录"""
+    return await _quote_by_date_response(target_date, channel)
+
+
+@router.get(
+    "/{channel}/quote/{target_date}/card.png",
+    summary="获取频道语录卡片图片",
+    description="返回指定频道服务端绘制的日签分享图片（PNG），theme 可选 light/dark",
+    dependencies=[Depends(limit_reads)],
+    response_class=Response
+)
+async def get_channel_quote_card(channel: str, target_date: str, theme: str = DEFAULT_THEME, if_none_match: Optional[str] = Header(None)):
+    """获取频道语录卡片图片"""
+    return await _card_response(target_date, theme, channel, if_none_match)
+
+
+@router.get(
+    "/{channel}/quote/{target_date}/related",
+    summary="获取频道相似语录",
+    description="返回与指定频道指定日期语录最相似的历史语录",
+    dependencies=[Depends(limit_reads)]
+)
+async def get_channel_related_quotes(channel: str, target_date: str, limit: int = 5):
+    """获取频道相似语录"""
+    return await _related_response(target_date, channel, limit)
+
+
+@router.get("/{channel}/quotes/recent", summary="获取频道最近的语录", description="获取指定频道最近N条语录，since 只返回该日期之后的语录", dependencies=[Depends(limit_reads)])
+async def get_channel_recent_quotes(channel: str, limit: int = 10, author: Optional[str] = None, since: Optional[str] = None):
+    """获取频道最近的语录列表"""
+    return await _recent_quotes_response(limit, channel, author, since)
+
+
+@router.get("/{channel}/authors", summary="频道作者统计", description="按语录数量列出指定频道的作者", dependencies=[Depends(limit_reads)])
+async def get_channel_authors(channel: str, limit: int = 50):
+    """频道作者统计"""
+    return await _authors_response(limit, channel)
+
+
+@router.get("/{channel}/quotes/range", summary="按日期范围获取频道语录", description="获取指定频道start到end（含）之间每天的语录", dependencies=[Depends(limit_reads)])
+async def get_channel_quotes_range(channel: str, start: str, end: str):
+    """按日期范围获取频道语录"""
+    return await _range_response(start, end, channel)
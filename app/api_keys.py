@@ -0,0 +1,338 @@
+"""
+合作方API密钥认证
+
+设置 API_KEY_AUTH=True 后，/api 下的接口需要在请求头中携带密钥：
+
+    X-API-Key: dq_xxxxxxxx
+    或 Authorization: Bearer dq_xxxxxxxx
+
+- 数据库只保存密钥的SHA-256哈希（配置 API_KEY_PEPPER 时为HMAC-SHA256）
+- 验证结果按哈希缓存在内存中：有效密钥缓存 API_KEY_CACHE_TTL 秒，无效密钥缓存
+  API_KEY_NEGATIVE_TTL 秒，命中时每次请求只需一次哈希计算和一次字典查找；
+  同一密钥并发未命中时只查询一次数据库
+- 每个密钥的请求次数先在内存中累加，每 API_KEY_USAGE_FLUSH_SECONDS 秒批量写入数据库
+- 吊销的密钥在其他进程中最多还会被接受 API_KEY_CACHE_TTL 秒
+"""
+import os
+import hmac
+import json
+import time
+import asyncio
+import hashlib
+import secrets
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Tuple
+from pydantic import BaseModel, Field
+from sqlalchemy import select, update, bindparam
+from app.database import AsyncSessionLocal, AsyncReadSessionLocal
+from app.models import ApiKey
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "dq_"
+# 超过该长度的密钥直接拒绝，不计算哈希
+MAX_KEY_LENGTH = 128
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class ApiKeyInfo:
+    """缓存中的有效密钥"""
+
+    __slots__ = ("id", "tenant")
+
+    def __init__(self, key_id: int, tenant: str):
+        self.id = key_id
+        self.tenant = tenant
+
+
+class ApiKeyAuth:
+    """API密钥验证与用量统计"""
+
+    def __init__(self):
+        self.enabled = os.getenv("API_KEY_AUTH", "False").lower() == "true"
+        self.protected_prefixes = tuple(
+            prefix.strip() for prefix in os.getenv("API_KEY_PROTECTED_PATHS", "/api").split(",") if prefix.strip()
+        )
+        self.cache_ttl = float(os.getenv("API_KEY_CACHE_TTL", "60"))
+        self.negative_ttl = float(os.getenv("API_KEY_NEGATIVE_TTL", "30"))
+        self.cache_size = int(os.getenv("API_KEY_CACHE_SIZE", "10000"))
+        self.flush_interval = float(os.getenv("API_KEY_USAGE_FLUSH_SECONDS", "30"))
+        pepper = os.getenv("API_KEY_PEPPER", "")
+        self._pepper = pepper.encode("utf-8") if pepper else None
+
+        # 密钥哈希 -> (有效密钥或None, 过期时间)
+        self._cache: Dict[str, Tuple[Optional[ApiKeyInfo], float]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        # 密钥ID -> 尚未写入数据库的请求次数
+        self._usage: Dict[int, int] = {}
+        # 租户 -> 本进程启动以来的请求次数
+        self._tenant_requests: Dict[str, int] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.flushed = 0
+
+    def hash_key(self, raw_key: str) -> str:
+        """计算密钥哈希"""
+        data = raw_key.encode("utf-8")
+        if self._pepper is not None:
+            return hmac.new(self._pepper, data, hashlib.sha256).hexdigest()
+        return hashlib.sha256(data).hexdigest()
+
+    def is_protected(self, path: str) -> bool:
+        return path.startswith(self.protected_prefixes)
+
+    async def verify(self, raw_key: Optional[str]) -> Optional[ApiKeyInfo]:
+        """
+        验证密钥
+
+        Returns:
+            有效时返回密钥信息，否则返回None
+        """
+        if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+            self.rejected += 1
+            return None
+
+        key_hash = self.hash_key(raw_key)
+        entry = self._cache.get(key_hash)
+        if entry is not None and entry[1] > time.monotonic():
+            self.hits += 1
+            info = entry[0]
+        else:
+            self.misses += 1
+            task = self._pending.get(key_hash)
+            if task is None:
+                task = self._pending[key_hash] = asyncio.ensure_future(self._lookup(key_hash))
+                task.add_done_callback(lambda _: self._pending.pop(key_hash, None))
+            info = await asyncio.shield(task)
+
+        if info is None:
+            self.rejected += 1
+        return info
+
+    async def _lookup(self, key_hash: str) -> Optional[ApiKeyInfo]:
+        """从数据库查询密钥并写入缓存"""
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                select(ApiKey.id, ApiKey.tenant).where(
+                    ApiKey.key_hash == key_hash,
+                    ApiKey.is_active.is_(True)
+                )
+            )
+            row = result.first()
+
+        info = ApiKeyInfo(row.id, row.tenant) if row else None
+        if len(self._cache) >= self.cache_size:
+            self._evict()
+        ttl = self.cache_ttl if info is not None else self.negative_ttl
+        self._cache[key_hash] = (info, time.monotonic() + ttl)
+        return info
+
+    def _evict(self):
+        """清理过期的缓存项，仍然超限时清空（例如被随机密钥刷接口）"""
+        now = time.monotonic()
+        for key in [key for key, (_, expires_at) in self._cache.items() if expires_at <= now]:
+            del self._cache[key]
+        if len(self._cache) >= self.cache_size:
+            self._cache.clear()
+
+    def invalidate(self, key_hash: str):
+        """使本进程中某个密钥的缓存失效"""
+        self._cache.pop(key_hash, None)
+
+    def record(self, info: ApiKeyInfo):
+        """记录一次请求（只更新内存计数）"""
+        self._usage[info.id] = self._usage.get(info.id, 0) + 1
+        self._tenant_requests[info.tenant] = self._tenant_requests.get(info.tenant, 0) + 1
+
+    async def flush(self) -> int:
+        """把累计的请求次数批量写入数据库"""
+        if not self._usage:
+            return 0
+        usage, self._usage = self._usage, {}
+        table = ApiKey.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                request_count=table.c.request_count + bindparam("b_count"),
+                last_used_at=bindparam("b_now")
+            )
+        )
+        now = _utcnow()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(stmt, [
+                    {"b_id": key_id, "b_count": count, "b_now": now}
+                    for key_id, count in usage.items()
+                ])
+                await db.commit()
+        except Exception:
+            # 写入失败时把计数放回，下次再写
+            for key_id, count in usage.items():
+                self._usage[key_id] = self._usage.get(key_id, 0) + count
+            raise
+        self.flushed += len(usage)
+        return len(usage)
+
+    async def start(self):
+        """启动用量定期写入"""
+        if not self.enabled or self._flush_task is not None:
+            return
+        self._flush_task = asyncio.create_task(self._flush_loop(), name="api-key-usage-flush")
+
+    async def stop(self):
+        """停止定期写入并写入剩余的用量"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"写入API密钥用量失败: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"写入API密钥用量失败: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取认证状态"""
+        return {
+            "enabled": self.enabled,
+            "protected_paths": list(self.protected_prefixes),
+            "cached_keys": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "rejected": self.rejected,
+            "pending_usage": sum(self._usage.values()),
+            "tenant_requests": dict(self._tenant_requests)
+        }
+
+
+def _extract_key(headers: List[Tuple[bytes, bytes]]) -> Optional[str]:
+    """从 X-API-Key 或 Authorization: Bearer 请求头中取出密钥"""
+    for name, value in headers:
+        if name == b"x-api-key":
+            return value.decode("latin-1").strip()
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                return token.strip()
+    return None
+
+
+class ApiKeyMiddleware:
+    """API密钥认证中间件（ASGI），验证通过后在 request.state.api_tenant 中记录租户"""
+
+    def __init__(self, app, auth: Optional[ApiKeyAuth] = None):
+        self.app = app
+        self.auth = auth or api_key_auth
+
+    async def __call__(self, scope, receive, send):
+        auth = self.auth
+        if (
+            scope["type"] != "http"
+            or not auth.enabled
+            or scope["method"] == "OPTIONS"
+            or not auth.is_protected(scope["path"])
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            info = await auth.verify(_extract_key(scope["headers"]))
+        except Exception as e:
+            logger.error(f"验证API密钥失败: {e}")
+            await self._reject(send, 503, "认证服务暂不可用，请稍后重试")
+            return
+
+        if info is None:
+            await self._reject(send, 401, "缺少或无效的API密钥")
+            return
+
+        auth.record(info)
+        scope.setdefault("state", {})["api_tenant"] = info.tenant
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _reject(send, status_code: int, detail: str):
+        body = json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode())
+        ]
+        if status_code == 401:
+            headers.append((b"www-authenticate", b"Bearer"))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+class ApiKeyCreate(BaseModel):
+    """创建API密钥请求体"""
+    tenant: str = Field(..., pattern=r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,99}$", description="租户标识")
+    name: Optional[str] = Field(None, max_length=100, description="密钥用途说明")
+
+
+async def create_api_key(data: ApiKeyCreate) -> Dict[str, Any]:
+    """
+    创建API密钥
+
+    Returns:
+        密钥信息，其中 key 为明文密钥，只在创建时返回一次
+    """
+    raw_key = KEY_PREFIX + secrets.token_urlsafe(32)
+    api_key = ApiKey(
+        tenant=data.tenant,
+        name=data.name,
+        key_prefix=raw_key[:len(KEY_PREFIX) + 6],
+        key_hash=api_key_auth.hash_key(raw_key),
+        is_active=True,
+        request_count=0
+    )
+    async with AsyncSessionLocal() as db:
+        db.add(api_key)
+        await db.commit()
+        await db.refresh(api_key)
+
+    # 之前被当作无效密钥缓存过的情况几乎不可能出现，这里仍然清除一次
+    api_key_auth.invalidate(api_key.key_hash)
+    return {**api_key.to_dict(), "key": raw_key}
+
+
+async def revoke_api_key(key_id: int) -> Optional[Dict[str, Any]]:
+    """吊销API密钥，密钥不存在时返回None"""
+    async with AsyncSessionLocal() as db:
+        api_key = await db.get(ApiKey, key_id)
+        if api_key is None:
+            return None
+        api_key.is_active = False
+        await db.commit()
+        await db.refresh(api_key)
+
+    api_key_auth.invalidate(api_key.key_hash)
+    return api_key.to_dict()
+
+
+async def list_api_keys() -> List[Dict[str, Any]]:
+    """列出所有API密钥（不含明文和哈希）"""
+    async with AsyncReadSessionLocal() as db:
+        result = await db.execute(select(ApiKey).order_by(ApiKey.tenant, ApiKey.id))
+        return [api_key.to_dict() for api_key in result.scalars().all()]
+
+
+# 创建全局API密钥认证
+api_key_auth = ApiKeyAuth()
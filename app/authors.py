@@ -0,0 +1,238 @@
+"""
+作者归一化
+
+模型输出的作者写法不固定，同一位哲学家可能是“康德”“伊曼努尔·康德”或“Kant”。
+authors 表保存规范名称，author_aliases 表保存归一化后的别名（normalize_author）
+到作者的映射，daily_quotes.author_id 指向作者：
+
+- 已知作者来自 app/data/known_authors.txt（每行第一个名称为规范名称），每次启动时
+  把文件中新增的作者和别名同步到数据库，并回填尚未关联作者的语录
+- 别名表整体加载到内存字典中，语录入库时一次字典查找即可得到作者ID和规范名称，
+  语录的 author 字段写入规范名称
+- 未知作者第一次出现时自动创建；占位作者（“哲学家”“佚名”等）不关联作者
+- 按作者筛选和统计走 (channel_id, author_id, date) 索引，不再扫描作者字符串
+"""
+import os
+import time
+import asyncio
+from typing import Optional, Dict, Any, List, Tuple
+from sqlalchemy import select, insert, update, func, bindparam
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal, AsyncReadSessionLocal
+from app.models import Author, AuthorAlias, DailyQuote
+from app.validation import (
+    load_known_authors, normalize_author, match_author, PLACEHOLDER_AUTHORS
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def is_placeholder(name: str) -> bool:
+    """是否为占位作者"""
+    return not name or name in PLACEHOLDER_AUTHORS or name.lower() in PLACEHOLDER_AUTHORS
+
+
+def sync_authors(conn: Connection) -> int:
+    """
+    同步已知作者列表并回填语录的 author_id
+
+    在启动时执行（与数据库迁移在同一事务内），只写入有变化的部分。
+
+    Returns:
+        本次归一化的作者写法数
+    """
+    authors: Dict[int, str] = dict(conn.execute(select(Author.id, Author.name)).all())
+    aliases: Dict[str, int] = dict(conn.execute(select(AuthorAlias.alias, AuthorAlias.author_id)).all())
+    renamed: List[int] = []
+
+    def add_author(name: str) -> int:
+        author_id = conn.execute(insert(Author).values(name=name)).inserted_primary_key[0]
+        authors[author_id] = name
+        return author_id
+
+    def add_alias(alias: str, author_id: int):
+        if alias and alias not in aliases:
+            conn.execute(insert(AuthorAlias).values(alias=alias, author_id=author_id))
+            aliases[alias] = author_id
+
+    # 已知作者：任一别名已存在时沿用该作者，并把名称改为文件中的规范名称
+    for names in load_known_authors():
+        normalized = [normalize_author(name) for name in names]
+        author_id = next((aliases[alias] for alias in normalized if alias in aliases), None)
+        if author_id is None:
+            author_id = add_author(names[0])
+        elif authors[author_id] != names[0] and names[0] not in authors.values():
+            conn.execute(update(Author).where(Author.id == author_id).values(name=names[0]))
+            authors[author_id] = names[0]
+            renamed.append(author_id)
+        for alias in normalized:
+            add_alias(alias, author_id)
+
+    # 回填：按不同的作者字符串批量更新，而不是逐行处理
+    raw_names = conn.execute(
+        select(DailyQuote.author).where(DailyQuote.author_id.is_(None)).distinct()
+    ).scalars().all()
+    params = []
+    for raw in raw_names:
+        name = (raw or "").strip()
+        if is_placeholder(name):
+            continue
+        author_id = match_author(aliases, name)
+        if author_id is None:
+            author_id = add_author(name)
+            add_alias(normalize_author(name), author_id)
+        params.append({"b_raw": raw, "b_id": author_id, "b_name": authors[author_id]})
+
+    table = DailyQuote.__table__
+    if params:
+        conn.execute(
+            update(table)
+            .where(table.c.author_id.is_(None), table.c.author == bindparam("b_raw"))
+            .values(author_id=bindparam("b_id"), author=bindparam("b_name")),
+            params
+        )
+        logger.info(f"已将 {len(params)} 种作者写法归一化到作者表")
+    if renamed:
+        conn.execute(
+            update(table)
+            .where(table.c.author_id == bindparam("b_id"))
+            .values(author=bindparam("b_name")),
+            [{"b_id": author_id, "b_name": authors[author_id]} for author_id in renamed]
+        )
+    return len(params)
+
+
+class AuthorIndex:
+    """内存中的作者别名索引"""
+
+    def __init__(self):
+        self.reload_interval = float(os.getenv("AUTHOR_INDEX_RELOAD_SECONDS", "60"))
+        # 归一化别名 -> 作者ID
+        self._aliases: Dict[str, int] = {}
+        # 作者ID -> 规范名称
+        self._names: Dict[int, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._load_lock = asyncio.Lock()
+        self._create_lock = asyncio.Lock()
+        self.created = 0
+
+    async def ensure_loaded(self):
+        if self._loaded_at is None:
+            await self.reload()
+
+    async def reload(self):
+        """从数据库加载全部作者和别名"""
+        async with self._load_lock:
+            async with AsyncReadSessionLocal() as db:
+                names = dict((await db.execute(select(Author.id, Author.name))).all())
+                aliases = dict((await db.execute(select(AuthorAlias.alias, AuthorAlias.author_id))).all())
+            self._names = names
+            self._aliases = aliases
+            self._loaded_at = time.monotonic()
+
+    def lookup(self, name: str) -> Optional[int]:
+        """按名称或别名查找作者ID"""
+        return match_author(self._aliases, name)
+
+    def name_of(self, author_id: int) -> Optional[str]:
+        return self._names.get(author_id)
+
+    async def find(self, name: str) -> Optional[int]:
+        """
+        查找作者ID（用于查询接口）
+
+        未命中时若距上次加载超过 AUTHOR_INDEX_RELOAD_SECONDS 秒则重新加载一次，
+        以便看到其他进程新建的作者。
+        """
+        await self.ensure_loaded()
+        author_id = self.lookup(name)
+        if author_id is None and time.monotonic() - self._loaded_at >= self.reload_interval:
+            await self.reload()
+            author_id = self.lookup(name)
+        return author_id
+
+    async def names(self, author_ids: List[int]) -> Dict[int, str]:
+        """批量获取规范名称，有未知ID时重新加载一次"""
+        await self.ensure_loaded()
+        if any(author_id not in self._names for author_id in author_ids):
+            await self.reload()
+        return {author_id: self._names.get(author_id) for author_id in author_ids}
+
+    async def resolve(self, name: str) -> Tuple[Optional[int], str]:
+        """
+        语录入库前归一化作者
+
+        Returns:
+            (作者ID, 规范名称)，占位作者返回 (None, 原名称)
+        """
+        await self.ensure_loaded()
+        name = (name or "").strip()
+        if is_placeholder(name):
+            return None, name
+        author_id = self.lookup(name)
+        if author_id is None:
+            author_id = await self._create(name)
+        return author_id, self._names.get(author_id, name)
+
+    async def _create(self, name: str) -> int:
+        """新建作者，其他进程已经创建同名作者时沿用已有的记录"""
+        alias = normalize_author(name)
+        async with self._create_lock:
+            author_id = self._aliases.get(alias)
+            if author_id is not None:
+                return author_id
+            async with AsyncSessionLocal() as db:
+                try:
+                    author = Author(name=name)
+                    db.add(author)
+                    await db.flush()
+                    db.add(AuthorAlias(alias=alias, author_id=author.id))
+                    await db.commit()
+                    author_id = author.id
+                    self.created += 1
+                except IntegrityError:
+                    await db.rollback()
+                    author_id = await db.scalar(select(AuthorAlias.author_id).where(AuthorAlias.alias == alias))
+                    if author_id is None:
+                        author_id = await db.scalar(select(Author.id).where(Author.name == name))
+                    name = await db.scalar(select(Author.name).where(Author.id == author_id))
+            self._aliases[alias] = author_id
+            self._names[author_id] = name
+            logger.info(f"新增作者: {name}")
+            return author_id
+
+    async def stats(self, channel_id: int, limit: int) -> List[Dict[str, Any]]:
+        """频道内各作者的语录数量，按数量降序"""
+        count = func.count().label("count")
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                select(DailyQuote.author_id, count, func.max(DailyQuote.date))
+                .where(DailyQuote.channel_id == channel_id, DailyQuote.author_id.isnot(None))
+                .group_by(DailyQuote.author_id)
+                .order_by(count.desc(), DailyQuote.author_id)
+                .limit(limit)
+            )
+            rows = result.all()
+        names = await self.names([row[0] for row in rows])
+        return [
+            {
+                "id": author_id,
+                "name": names[author_id],
+                "count": quote_count,
+                "latest_date": latest.isoformat() if latest else None
+            }
+            for author_id, quote_count, latest in rows
+        ]
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "authors": len(self._names),
+            "aliases": len(self._aliases),
+            "created": self.created
+        }
+
+
+# 创建全局作者索引
+author_index = AuthorIndex()
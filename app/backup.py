@@ -0,0 +1,191 @@
+"""
+SQLite在线备份
+
+服务运行时直接复制 daily_quotes.db 可能得到写了一半的文件。备份任务使用SQLite的
+在线备份接口（sqlite3.Connection.backup）：
+
+- 每步只复制 BACKUP_PAGES_PER_STEP 页，步与步之间休眠 BACKUP_STEP_SLEEP_MS 毫秒，
+  不会长时间持有锁阻塞接口的读写；备份期间源库被修改时SQLite会自动重新复制
+- 复制得到的快照先执行 PRAGMA integrity_check，通过后压缩为 .db.gz，写临时文件再改名
+- BACKUP_DIR 中只保留最近 BACKUP_KEEP 份快照
+- 每日 BACKUP_HOUR:BACKUP_MINUTE 由定时任务执行（只在 worker/all 进程），
+  耗时和大小显示在 /admin/scheduler 中
+
+PostgreSQL部署请使用 pg_dump 等数据库自身的备份工具，此任务不会启用。
+"""
+import os
+import gzip
+import shutil
+import sqlite3
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from app.database import storage_backend
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKUP_SUFFIX = ".db.gz"
+
+
+class BackupError(RuntimeError):
+    """备份失败（快照完整性检查未通过等）"""
+
+
+class DatabaseBackup:
+    """SQLite数据库在线备份"""
+
+    def __init__(self):
+        self.backup_dir = Path(os.getenv("BACKUP_DIR", "./backups"))
+        self.hour = int(os.getenv("BACKUP_HOUR", "4"))
+        self.minute = int(os.getenv("BACKUP_MINUTE", "0"))
+        self.keep = max(int(os.getenv("BACKUP_KEEP", "7")), 1)
+        self.pages_per_step = max(int(os.getenv("BACKUP_PAGES_PER_STEP", "256")), 1)
+        self.step_sleep = float(os.getenv("BACKUP_STEP_SLEEP_MS", "10")) / 1000
+        self.busy_timeout = float(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")) / 1000
+
+        database = storage_backend.url.database if storage_backend.name == "sqlite" else None
+        self.source: Optional[Path] = Path(database) if database and database != ":memory:" else None
+        self._enabled = os.getenv("BACKUP_ENABLED", "True").lower() == "true"
+
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.failures = 0
+        self.last_run: Optional[str] = None
+        self.last_file: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_size_bytes: Optional[int] = None
+        self.last_compressed_bytes: Optional[int] = None
+        self.last_pages: Optional[int] = None
+        self.last_steps: Optional[int] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled and self.source is not None
+
+    def snapshots(self) -> List[Path]:
+        """已有的快照，按时间从旧到新排序（文件名中的时间戳可直接排序）"""
+        if not self.backup_dir.is_dir():
+            return []
+        return sorted(self.backup_dir.glob(f"{self.source.stem}-*{BACKUP_SUFFIX}"))
+
+    async def run(self) -> Optional[Dict[str, Any]]:
+        """
+        执行一次备份
+
+        Returns:
+            快照信息，未启用或已有备份在执行时返回 None
+        """
+        if not self.enabled or self._lock.locked():
+            return None
+        async with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+            try:
+                result = await asyncio.to_thread(self._backup)
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"数据库备份失败: {e}")
+                return None
+
+            self.last_error = None
+            self.last_file = result["file"]
+            self.last_duration_ms = result["duration_ms"]
+            self.last_size_bytes = result["size_bytes"]
+            self.last_compressed_bytes = result["compressed_bytes"]
+            self.last_pages = result["pages"]
+            self.last_steps = result["steps"]
+            logger.info(
+                f"数据库备份完成: {result['file']}，{result['size_bytes']} 字节 -> "
+                f"{result['compressed_bytes']} 字节，耗时 {result['duration_ms']} ms"
+            )
+            return result
+
+    def _backup(self) -> Dict[str, Any]:
+        """复制、校验、压缩并轮换快照（在线程中执行）"""
+        started = time.perf_counter()
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{self.source.stem}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        snapshot = self.backup_dir / f".{name}.db.tmp"
+        compressed = self.backup_dir / f".{name}{BACKUP_SUFFIX}.tmp"
+        steps = 0
+
+        def progress(status, remaining, total):
+            # 两步之间源库不持有锁；backup() 的 sleep 参数只在遇到忙锁时生效，所以在这里让出
+            nonlocal steps
+            steps += 1
+            if remaining and self.step_sleep > 0:
+                time.sleep(self.step_sleep)
+
+        try:
+            source = sqlite3.connect(str(self.source), timeout=self.busy_timeout)
+            target = sqlite3.connect(str(snapshot))
+            try:
+                source.backup(target, pages=self.pages_per_step, progress=progress, sleep=self.busy_timeout / 50)
+                pages = target.execute("PRAGMA page_count").fetchone()[0]
+                check = target.execute("PRAGMA integrity_check").fetchall()
+            finally:
+                target.close()
+                source.close()
+            if check != [("ok",)]:
+                raise BackupError(f"快照完整性检查未通过: {'; '.join(row[0] for row in check[:5])}")
+
+            with open(snapshot, "rb") as src, gzip.open(compressed, "wb", compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            size = snapshot.stat().st_size
+            path = self.backup_dir / f"{name}{BACKUP_SUFFIX}"
+            os.replace(compressed, path)
+        finally:
+            for temp in (snapshot, compressed):
+                try:
+                    temp.unlink()
+                except FileNotFoundError:
+                    pass
+
+        self._rotate()
+        return {
+            "file": str(path),
+            "size_bytes": size,
+            "compressed_bytes": path.stat().st_size,
+            "pages": pages,
+            "steps": steps,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+
+    def _rotate(self):
+        """删除超出保留份数的旧快照"""
+        for path in self.snapshots()[:-self.keep]:
+            try:
+                path.unlink()
+                logger.info(f"已删除旧备份: {path}")
+            except OSError as e:
+                logger.error(f"删除旧备份失败 {path}: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
+            "enabled": self.enabled,
+            "schedule": f"{self.hour:02d}:{self.minute:02d}",
+            "directory": str(self.backup_dir),
+            "keep": self.keep,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run": self.last_run,
+            "last_file": self.last_file,
+            "last_error": self.last_error,
+            "last_duration_ms": self.last_duration_ms,
+            "last_size_bytes": self.last_size_bytes,
+            "last_compressed_bytes": self.last_compressed_bytes,
+            "last_pages": self.last_pages,
+            "last_steps": self.last_steps
+        }
+        if self.enabled:
+            status["snapshots"] = len(self.snapshots())
+        return status
+
+
+# 创建全局数据库备份器
+database_backup = DatabaseBackup()
@@ -0,0 +1,165 @@
+"""
+跨进程缓存失效
+
+语录写入（新生成、兜底、修复）后需要刷新各进程内存中的数据：月份缓存、内存语录存储、
+零点预热的语录、相似语录索引。本进程直接刷新；同时向 cache_events 表写入一条事件，其他进程
+（例如只读的 api 进程）每 CACHE_EVENTS_POLL_SECONDS 秒拉取新事件，重新读取对应语录并刷新自己的缓存。
+
+单进程部署时事件只会被自己写入、自己跳过，额外开销只是每条语录一次插入。
+
+事件ID在插入时分配、在提交时才可见：并发写入时较小的ID可能晚于较大的ID提交（PostgreSQL序列）。
+因此每次拉取都重新读取最大已读ID之前 CACHE_EVENTS_LOOKBACK_IDS 个ID的窗口，并跳过已处理的ID，
+晚提交的事件不会被漏掉。
+"""
+import os
+import socket
+import asyncio
+import uuid
+from datetime import datetime, date, timedelta, timezone
+from typing import Optional, Dict, Any, Set, Tuple
+from sqlalchemy import select, delete, func
+from app.database import AsyncSessionLocal
+from app.models import CacheEvent, DailyQuote
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CacheEventBus:
+    """基于数据库表的缓存失效事件"""
+
+    def __init__(self):
+        self.poll_interval = float(os.getenv("CACHE_EVENTS_POLL_SECONDS", "5"))
+        self.retention = timedelta(hours=float(os.getenv("CACHE_EVENTS_RETENTION_HOURS", "24")))
+        self.lookback = max(int(os.getenv("CACHE_EVENTS_LOOKBACK_IDS", "500")), 0)
+        self.origin = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._last_id = 0
+        # 回看窗口内已处理的事件ID
+        self._seen: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._purged_at: Optional[datetime] = None
+        self.published = 0
+        self.applied = 0
+        self.late = 0
+
+    def apply_local(self, quote: DailyQuote):
+        """刷新本进程的缓存"""
+        from app.quote_range import month_cache
+        from app.quote_store import quote_store
+        from app.rollover import rollover
+        from app.related import related_index
+
+        month_cache.invalidate(quote.channel_id, quote.date)
+        quote_store.add(quote)
+        rollover.publish(quote.to_dict())
+        related_index.update(quote)
+
+    async def quote_written(self, quote: DailyQuote):
+        """语录提交后调用：刷新本进程缓存并通知其他进程"""
+        self.apply_local(quote)
+        try:
+            async with AsyncSessionLocal() as db:
+                db.add(CacheEvent(
+                    channel_id=quote.channel_id,
+                    date=quote.date,
+                    origin=self.origin,
+                    created_at=_utcnow()
+                ))
+                await db.commit()
+            self.published += 1
+        except Exception as e:
+            # 其他进程的内存存储仍会通过增量刷新拿到新语录，只是修改已有语录时会延迟到重启
+            logger.error(f"写入缓存失效事件失败: {e}")
+
+    async def poll(self) -> int:
+        """拉取其他进程产生的事件并刷新缓存"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(CacheEvent.id, CacheEvent.channel_id, CacheEvent.date, CacheEvent.origin)
+                .where(CacheEvent.id > self._last_id - self.lookback)
+                .order_by(CacheEvent.id)
+            )
+            events = [event for event in result.all() if event.id not in self._seen]
+            if not events:
+                return 0
+            self.late += sum(1 for event in events if event.id <= self._last_id)
+            self._remember(event.id for event in events)
+
+            keys: Set[Tuple[int, date]] = {
+                (event.channel_id, event.date) for event in events if event.origin != self.origin
+            }
+            for channel_id, day in keys:
+                quote = await db.scalar(
+                    select(DailyQuote).where(DailyQuote.channel_id == channel_id, DailyQuote.date == day)
+                )
+                if quote is not None:
+                    self.apply_local(quote)
+                    self.applied += 1
+        return len(keys)
+
+    def _remember(self, event_ids):
+        """记录已处理的事件ID，丢弃回看窗口之外的ID"""
+        self._seen.update(event_ids)
+        if self._seen:
+            self._last_id = max(self._last_id, max(self._seen))
+        floor = self._last_id - self.lookback
+        self._seen = {event_id for event_id in self._seen if event_id > floor}
+
+    async def purge(self):
+        """清理过期事件（由负责生成的进程执行）"""
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(CacheEvent).where(CacheEvent.created_at < _utcnow() - self.retention))
+            await db.commit()
+
+    async def start(self, purge: bool = False):
+        """从当前最新事件之后开始监听"""
+        if self._task is not None or self.poll_interval <= 0:
+            return
+        async with AsyncSessionLocal() as db:
+            self._last_id = await db.scalar(select(func.max(CacheEvent.id))) or 0
+            # 启动前已提交的事件不再处理，窗口内之后才提交的事件仍会被拉取
+            result = await db.execute(
+                select(CacheEvent.id).where(CacheEvent.id > self._last_id - self.lookback)
+            )
+            self._remember(result.scalars().all())
+        self._task = asyncio.create_task(self._poll_loop(purge), name="cache-events")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _poll_loop(self, purge: bool):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                applied = await self.poll()
+                if applied:
+                    logger.info(f"已根据其他进程的事件刷新 {applied} 条语录缓存")
+                if purge and (self._purged_at is None or _utcnow() - self._purged_at > timedelta(hours=1)):
+                    await self.purge()
+                    self._purged_at = _utcnow()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"拉取缓存失效事件失败: {e}")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "origin": self.origin,
+            "listening": self._task is not None,
+            "last_event_id": self._last_id,
+            "late_events": self.late,
+            "published": self.published,
+            "applied": self.applied
+        }
+
+
+# 创建全局缓存失效事件总线
+cache_events = CacheEventBus()
@@ -0,0 +1,188 @@
+"""
+LLM候选语录缓存
+
+一次LLM调用可以返回多条候选（n 个 choices，LLM_CANDIDATES_PER_CALL 大于1时），发布其中一条后，
+其余通过校验的候选保存在数据库的 quote_candidates 表中，下次生成时优先从这里取用，不必再请求模型。
+LLM_CANDIDATES_PER_CALL 为默认值1时不会产生多余候选，缓存始终为空。
+
+- 键：频道 + 提示词指纹，频道提示词修改后旧候选自动失效
+- TTL：超过 CANDIDATE_CACHE_TTL_DAYS 的候选不再使用并会被清理
+- 容量：每个频道最多保留 CANDIDATE_CACHE_SIZE 条，超出时淘汰最早写入的候选
+
+取用、过期和淘汰都按写入时间 created_at 先进先出。候选取出即删除；再次生成已缓存的相同语录时
+只更新 touched_at（最近一次生成的时间，仅供排查），不会延长其寿命或改变顺序。
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple, Callable
+from sqlalchemy import select, delete, update, func
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal
+from app.models import CachedCandidate
+from app.validation import DuplicateCheck, normalize_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class CandidateCache:
+    """持久化的候选语录池"""
+
+    def __init__(self):
+        # 每个频道最多保留的候选数，0 表示关闭缓存
+        self.max_size = int(os.getenv("CANDIDATE_CACHE_SIZE", "50"))
+        self.ttl = timedelta(days=float(os.getenv("CANDIDATE_CACHE_TTL_DAYS", "30")))
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def fingerprint(content: str) -> str:
+        return f"{DuplicateCheck.fingerprint(normalize_text(content)):016x}"
+
+    async def take(
+        self,
+        channel_id: int,
+        prompt_key: str,
+        accept: Callable[[str, str], bool]
+    ) -> Optional[Tuple[str, str]]:
+        """
+        取出一条可用的候选
+
+        候选按写入顺序取用，取出即删除（条件删除保证并发时每条只会被取用一次）；
+        accept 返回False的候选（例如已与新发布的语录重复）直接丢弃。
+
+        Returns:
+            (内容, 作者)，没有可用候选时返回None
+        """
+        if not self.enabled:
+            return None
+
+        async with AsyncSessionLocal() as db:
+            while True:
+                result = await db.execute(
+                    select(CachedCandidate.id, CachedCandidate.content, CachedCandidate.author)
+                    .where(
+                        CachedCandidate.channel_id == channel_id,
+                        CachedCandidate.prompt_key == prompt_key,
+                        CachedCandidate.created_at >= _utcnow() - self.ttl
+                    )
+                    .order_by(CachedCandidate.created_at, CachedCandidate.id)
+                    .limit(1)
+                )
+                row = result.first()
+                if row is None:
+                    self.misses += 1
+                    return None
+
+                candidate_id, content, author = row
+                deleted = await db.execute(delete(CachedCandidate).where(CachedCandidate.id == candidate_id))
+                await db.commit()
+                if deleted.rowcount != 1:
+                    # 被其他工作协程取走了
+                    continue
+                if accept(content, author):
+                    self.hits += 1
+                    return content, author
+                logger.info(f"丢弃失效的候选语录 {candidate_id}")
+
+    async def put(self, channel_id: int, prompt_key: str, items: List[Tuple[str, str]]) -> int:
+        """
+        保存多余的候选
+
+        已存在的相同语录只更新 touched_at，写入时间不变；写入后清理过期候选并按容量淘汰。
+
+        Returns:
+            新写入的候选数
+        """
+        if not self.enabled or not items:
+            return 0
+
+        now = _utcnow()
+        added = 0
+        async with AsyncSessionLocal() as db:
+            for content, author in items:
+                fingerprint = self.fingerprint(content)
+                result = await db.execute(
+                    update(CachedCandidate)
+                    .where(CachedCandidate.channel_id == channel_id, CachedCandidate.fingerprint == fingerprint)
+                    .values(touched_at=now)
+                )
+                if result.rowcount:
+                    continue
+
+                db.add(CachedCandidate(
+                    channel_id=channel_id,
+                    prompt_key=prompt_key,
+                    fingerprint=fingerprint,
+                    content=content,
+                    author=author,
+                    created_at=now,
+                    touched_at=now
+                ))
+                try:
+                    await db.commit()
+                    added += 1
+                except IntegrityError:
+                    # 并发写入了相同的候选
+                    await db.rollback()
+            await db.commit()
+
+            await self._evict(db, channel_id, now)
+
+        self.stored += added
+        return added
+
+    async def _evict(self, db, channel_id: int, now: datetime):
+        """清理过期候选，超出容量时淘汰最早写入的候选"""
+        expired = await db.execute(
+            delete(CachedCandidate).where(CachedCandidate.created_at < now - self.ttl)
+        )
+        evicted = expired.rowcount or 0
+
+        count = (await db.execute(
+            select(func.count()).select_from(CachedCandidate).where(CachedCandidate.channel_id == channel_id)
+        )).scalar_one()
+        if count > self.max_size:
+            oldest = select(CachedCandidate.id).where(
+                CachedCandidate.channel_id == channel_id
+            ).order_by(CachedCandidate.created_at, CachedCandidate.id).limit(count - self.max_size)
+            result = await db.execute(delete(CachedCandidate).where(CachedCandidate.id.in_(oldest)))
+            evicted += result.rowcount or 0
+
+        await db.commit()
+        self.evicted += evicted
+
+    async def size(self) -> Dict[int, int]:
+        """各频道当前缓存的候选数"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(CachedCandidate.channel_id, func.count()).group_by(CachedCandidate.channel_id)
+            )
+            return {channel_id: count for channel_id, count in result.all()}
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取缓存统计"""
+        return {
+            "enabled": self.enabled,
+            "max_size_per_channel": self.max_size,
+            "ttl_days": self.ttl.total_seconds() / 86400,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "evicted": self.evicted
+        }
+
+
+# 创建全局候选缓存实例
+candidate_cache = CandidateCache()
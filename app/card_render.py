@@ -0,0 +1,153 @@
+"""
+日签卡片绘制
+
+只依赖 Pillow，在渲染进程池的子进程中执行（不导入数据库等模块，子进程启动更快）。
+版式与前端 frontend/index.html 的卡片一致：日期、引号包围的正文、“—— 作者”。
+"""
+import io
+from datetime import date
+from functools import lru_cache
+from typing import List, Tuple, Dict
+from PIL import Image, ImageDraw, ImageFont
+
+# 版式变化时修改版本号，旧的缓存图片自动失效
+RENDER_VERSION = "1"
+
+CARD_WIDTH = 1080
+CARD_HEIGHT = 1440
+PADDING = 120
+
+THEMES: Dict[str, Dict[str, Tuple[int, int, int]]] = {
+    "light": {
+        "background_top": (248, 250, 252),
+        "background_bottom": (226, 232, 240),
+        "card": (254, 254, 254),
+        "text": (44, 62, 80),
+        "author": (52, 73, 94),
+        "muted": (127, 140, 141),
+        "accent": (231, 76, 60),
+        "accent_mid": (243, 156, 18),
+    },
+    "dark": {
+        "background_top": (30, 36, 48),
+        "background_bottom": (15, 18, 26),
+        "card": (36, 42, 56),
+        "text": (236, 240, 241),
+        "author": (189, 195, 199),
+        "muted": (127, 140, 141),
+        "accent": (231, 76, 60),
+        "accent_mid": (243, 156, 18),
+    },
+}
+
+# 不能出现在行首的标点
+_NO_LINE_START = set("，。、；：？！）》」』】”’,.;:?!)")
+_WEEKDAYS = "一二三四五六日"
+
+
+@lru_cache(maxsize=32)
+def _font(path: str, size: int) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+def format_date(value: str) -> str:
+    """2025-07-03 -> 2025年7月3日 星期四"""
+    day = date.fromisoformat(value)
+    return f"{day.year}年{day.month}月{day.day}日 星期{_WEEKDAYS[day.weekday()]}"
+
+
+def wrap_text(text: str, font: ImageFont.FreeTypeFont, max_width: int) -> List[str]:
+    """按字符宽度折行（中文逐字折行，标点不放在行首）"""
+    lines: List[str] = []
+    current = ""
+    for char in text:
+        if char == "\n":
+            lines.append(current)
+            current = ""
+            continue
+        if current and font.getlength(current + char) > max_width and char not in _NO_LINE_START:
+            lines.append(current)
+            current = char.lstrip()
+        else:
+            current += char
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _fit_quote(text: str, font_path: str, max_width: int, max_height: int) -> Tuple[ImageFont.FreeTypeFont, List[str], int]:
+    """从大到小尝试字号，直到正文能放进可用区域"""
+    for size in range(64, 27, -4):
+        font = _font(font_path, size)
+        lines = wrap_text(text, font, max_width)
+        line_height = int(size * 1.8)
+        if len(lines) * line_height <= max_height:
+            return font, lines, line_height
+    return font, lines, line_height
+
+
+def _gradient(size: Tuple[int, int], start: Tuple[int, int, int], end: Tuple[int, int, int], horizontal: bool = False) -> Image.Image:
+    """线性渐变（先画一行或一列再拉伸）"""
+    width, height = size
+    steps = width if horizontal else height
+    strip = Image.new("RGB", (steps, 1) if horizontal else (1, steps))
+    for i in range(steps):
+        ratio = i / max(steps - 1, 1)
+        color = tuple(int(start[c] + (end[c] - start[c]) * ratio) for c in range(3))
+        strip.putpixel((i, 0) if horizontal else (0, i), color)
+    return strip.resize((width, height))
+
+
+def render_card(content: str, author: str, date_str: str, theme: str, font_path: str) -> bytes:
+    """
+    绘制日签卡片
+
+    Returns:
+        PNG图片字节
+    """
+    colors = THEMES[theme]
+    image = _gradient((CARD_WIDTH, CARD_HEIGHT), colors["background_top"], colors["background_bottom"])
+    draw = ImageDraw.Draw(image)
+
+    # 卡片和顶部装饰条
+    margin = 60
+    card_box = (margin, margin, CARD_WIDTH - margin, CARD_HEIGHT - margin)
+    draw.rounded_rectangle(card_box, radius=40, fill=colors["card"])
+    bar = _gradient((CARD_WIDTH - 2 * margin - 80, 6), colors["accent"], colors["accent_mid"], horizontal=True)
+    image.paste(bar, (margin + 40, margin))
+
+    # 日期
+    date_font = _font(font_path, 36)
+    date_text = format_date(date_str)
+    date_width = draw.textlength(date_text, font=date_font)
+    draw.text(((CARD_WIDTH - date_width) / 2, margin + 100), date_text, font=date_font, fill=colors["muted"])
+
+    # 正文（垂直居中）
+    text_top = margin + 220
+    text_bottom = CARD_HEIGHT - margin - 260
+    text_width = CARD_WIDTH - 2 * PADDING
+    font, lines, line_height = _fit_quote(content, font_path, text_width, text_bottom - text_top)
+    y = text_top + (text_bottom - text_top - len(lines) * line_height) / 2
+    quote_font = _font(font_path, int(font.size * 1.6))
+    draw.text((PADDING - quote_font.size * 0.6, y - quote_font.size * 0.4), "“", font=quote_font, fill=colors["accent"])
+    for line in lines:
+        draw.text((PADDING, y), line, font=font, fill=colors["text"])
+        y += line_height
+    draw.text((CARD_WIDTH - PADDING, y - line_height * 0.3), "”", font=quote_font, fill=colors["accent"])
+
+    # 作者（右对齐）
+    author_font = _font(font_path, 40)
+    author_text = f"—— {author}"
+    author_width = draw.textlength(author_text, font=author_font)
+    draw.text((CARD_WIDTH - PADDING - author_width, CARD_HEIGHT - margin - 200), author_text,
+              font=author_font, fill=colors["author"])
+
+    # 页脚
+    footer_font = _font(font_path, 28)
+    footer = "每日一言"
+    footer_width = draw.textlength(footer, font=footer_font)
+    draw.text(((CARD_WIDTH - footer_width) / 2, CARD_HEIGHT - margin - 90), footer, font=footer_font, fill=colors["muted"])
+
+    output = io.BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
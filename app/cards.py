@@ -0,0 +1,289 @@
+"""
+日签卡片图片
+
+GET /api/quote/{date}/card.png 返回服务端绘制的分享图片：
+- 绘制在进程池中执行（CARD_RENDER_WORKERS），不阻塞事件循环
+- 缓存键为 (正文, 作者, 日期, 主题, 版式版本) 的哈希，内容不变就不会重复绘制
+- 两级缓存：内存LRU（CARD_MEMORY_CACHE_MB）和磁盘目录（CARD_CACHE_DIR，CARD_DISK_CACHE_MB），
+  超出容量时淘汰最久未使用的图片
+- 同一张图片并发请求时只绘制一次
+- 每条语录写入后（见 AIService._quote_committed）预先绘制 CARD_PRERENDER_THEMES 中的主题
+
+字体按顺序查找：CARD_FONT_PATH、app/data/fonts/ 下的字体文件、系统安装的 Noto CJK 字体
+（Docker镜像中通过 fonts-noto-cjk 安装）。仓库不附带字体文件；找不到字体时启动日志给出警告，
+卡片接口返回503并说明原因，预绘制跳过，其他接口不受影响。
+"""
+import os
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+from app.card_render import render_card, RENDER_VERSION, THEMES
+from app.validation import DATA_DIR
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THEME = "light"
+
+# 系统字体候选（Debian fonts-noto-cjk）
+SYSTEM_FONTS = [
+    "/usr/share/fonts/opentype/noto/NotoSerifCJK-Regular.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+]
+
+
+def find_font() -> Optional[str]:
+    """查找可用的中文字体"""
+    configured = os.getenv("CARD_FONT_PATH")
+    if configured:
+        return configured if Path(configured).is_file() else None
+    font_dir = DATA_DIR / "fonts"
+    if font_dir.is_dir():
+        for pattern in ("*.otf", "*.ttf", "*.ttc"):
+            for path in sorted(font_dir.glob(pattern)):
+                return str(path)
+    for path in SYSTEM_FONTS:
+        if Path(path).is_file():
+            return path
+    return None
+
+
+def missing_font_message() -> str:
+    """找不到字体时的说明"""
+    configured = os.getenv("CARD_FONT_PATH")
+    if configured:
+        return "CARD_FONT_PATH 指定的字体文件不存在，卡片图片不可用"
+    return "未找到可用的中文字体，卡片图片不可用：请安装 fonts-noto-cjk、把字体文件放到 app/data/fonts/ 或设置 CARD_FONT_PATH"
+
+
+class CardUnavailableError(RuntimeError):
+    """无法绘制卡片（未找到字体）"""
+
+
+class CardRenderer:
+    """卡片绘制与缓存"""
+
+    def __init__(self):
+        self.workers = max(int(os.getenv("CARD_RENDER_WORKERS", "2")), 1)
+        self.memory_limit = int(float(os.getenv("CARD_MEMORY_CACHE_MB", "32")) * 1024 * 1024)
+        self.disk_limit = int(float(os.getenv("CARD_DISK_CACHE_MB", "256")) * 1024 * 1024)
+        self.cache_dir = Path(os.getenv("CARD_CACHE_DIR", "./card_cache"))
+        self.prerender_themes = [
+            theme.strip() for theme in os.getenv("CARD_PRERENDER_THEMES", DEFAULT_THEME).split(",")
+            if theme.strip() in THEMES
+        ]
+
+        self.font_path = find_font()
+        if self.font_path is None:
+            logger.warning(f"{missing_font_message()}（CARD_FONT_PATH={os.getenv('CARD_FONT_PATH', '')}）")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        # 磁盘缓存索引：文件名 -> 大小，按最近使用排序
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._disk_scanned = False
+        # 磁盘读写在线程中执行，索引修改需要加锁
+        self._disk_lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._prerender_tasks: set = set()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.font_path is not None
+
+    @staticmethod
+    def cache_key(content: str, author: str, date_str: str, theme: str) -> str:
+        source = "\x1f".join([RENDER_VERSION, theme, date_str, author or "", content])
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn 避免在已有事件循环和线程的进程中 fork
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def get_card(self, quote: Dict[str, Any], theme: str = DEFAULT_THEME) -> bytes:
+        """
+        获取语录卡片PNG
+
+        Raises:
+            CardUnavailableError: 未找到字体
+        """
+        if not self.available:
+            raise CardUnavailableError(missing_font_message())
+
+        key = self.cache_key(quote["content"], quote["author"], quote["date"], theme)
+        image = self._memory.get(key)
+        if image is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return image
+
+        future = self._pending.get(key)
+        if future is None:
+            future = self._pending[key] = asyncio.ensure_future(self._load_or_render(key, quote, theme))
+            future.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _load_or_render(self, key: str, quote: Dict[str, Any], theme: str) -> bytes:
+        image = await asyncio.to_thread(self._read_disk, key)
+        if image is not None:
+            self.disk_hits += 1
+        else:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            pool = self._get_pool()
+            try:
+                image = await loop.run_in_executor(
+                    pool, render_card,
+                    quote["content"], quote["author"], quote["date"], theme, self.font_path
+                )
+            except BrokenProcessPool:
+                # 子进程异常退出后进程池不可再用，下次请求重新创建
+                if self._pool is pool:
+                    self._pool = None
+                raise
+            self.renders += 1
+            self.render_seconds += loop.time() - started
+            await asyncio.to_thread(self._write_disk, key, image)
+        self._remember(key, image)
+        return image
+
+    def _remember(self, key: str, image: bytes):
+        """写入内存缓存，超出容量时淘汰最久未使用的图片"""
+        if len(image) > self.memory_limit:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = image
+        self._memory_bytes += len(image)
+        while self._memory_bytes > self.memory_limit:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _scan_disk(self):
+        """首次访问时建立磁盘缓存索引（按修改时间排序）"""
+        self._disk_scanned = True
+        if not self.cache_dir.is_dir():
+            return
+        entries = []
+        for path in self.cache_dir.glob("*.png"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self._disk[name] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        if self.disk_limit <= 0:
+            return None
+        with self._disk_lock:
+            return self._read_disk_locked(key)
+
+    def _read_disk_locked(self, key: str) -> Optional[bytes]:
+        if not self._disk_scanned:
+            self._scan_disk()
+        name = f"{key}.png"
+        if name not in self._disk:
+            return None
+        path = self.cache_dir / name
+        try:
+            image = path.read_bytes()
+            os.utime(path)
+        except OSError:
+            self._disk_bytes -= self._disk.pop(name, 0)
+            return None
+        self._disk.move_to_end(name)
+        return image
+
+    def _write_disk(self, key: str, image: bytes):
+        """写入磁盘缓存（先写临时文件再改名），超出容量时删除最久未使用的文件"""
+        if self.disk_limit <= 0 or len(image) > self.disk_limit:
+            return
+        with self._disk_lock:
+            self._write_disk_locked(key, image)
+
+    def _write_disk_locked(self, key: str, image: bytes):
+        if not self._disk_scanned:
+            self._scan_disk()
+        name = f"{key}.png"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp = self.cache_dir / f".{name}.{os.getpid()}.tmp"
+            temp.write_bytes(image)
+            os.replace(temp, self.cache_dir / name)
+        except OSError as e:
+            logger.error(f"写入卡片缓存失败: {e}")
+            return
+        self._disk_bytes += len(image) - self._disk.pop(name, 0)
+        self._disk[name] = len(image)
+        while self._disk_bytes > self.disk_limit and len(self._disk) > 1:
+            evicted, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                (self.cache_dir / evicted).unlink()
+            except OSError:
+                pass
+
+    def prerender(self, quote: Dict[str, Any]):
+        """后台预先绘制新语录的卡片（不等待结果）"""
+        if not self.available:
+            return
+        for theme in self.prerender_themes:
+            task = asyncio.create_task(self._prerender(quote, theme))
+            self._prerender_tasks.add(task)
+            task.add_done_callback(self._prerender_tasks.discard)
+
+    async def _prerender(self, quote: Dict[str, Any], theme: str):
+        try:
+            await self.get_card(quote, theme)
+        except Exception as e:
+            logger.error(f"预先绘制卡片失败 {quote.get('date')} {theme}: {e}")
+
+    async def stop(self):
+        """等待预绘制任务结束并关闭进程池"""
+        if self._prerender_tasks:
+            await asyncio.gather(*self._prerender_tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "available": self.available,
+            "font": self.font_path,
+            "workers": self.workers,
+            "themes": list(THEMES),
+            "memory_items": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_items": len(self._disk),
+            "disk_bytes": self._disk_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "renders": self.renders,
+            "avg_render_ms": round(self.render_seconds / self.renders * 1000, 1) if self.renders else 0
+        }
+
+
+# 创建全局卡片绘制器
+card_renderer = CardRenderer()
@@ -0,0 +1,194 @@
+"""
+语录频道管理
+"""
+import json
+import random
+import asyncio
+import time
+from typing import Optional, Dict, List, Tuple
+from pydantic import BaseModel, Field, field_validator
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# /api 下固定路由的第一段路径，频道使用这些标识会与 /api/{channel}/... 路由冲突
+RESERVED_SLUGS = frozenset({"quote", "quotes", "jobs", "channels", "stats", "authors", "health"})
+
+
+class ChannelNotFoundError(LookupError):
+    """频道不存在或未启用"""
+
+
+class ChannelConfig:
+    """频道运行时配置（从数据库加载后常驻内存）"""
+
+    def __init__(self, channel):
+        self.id = channel.id
+        self.slug = channel.slug
+        self.name = channel.name
+        self.language = channel.language
+        self.theme = channel.theme
+        self.audience = channel.audience
+        self.system_prompt = channel.system_prompt
+        self.prompt_templates: List[str] = (
+            json.loads(channel.prompt_templates) if channel.prompt_templates else []
+        )
+        self.fallback_quotes: List[Tuple[str, str]] = [
+            tuple(item) for item in json.loads(channel.fallback_quotes)
+        ] if channel.fallback_quotes else []
+        self.requests_per_minute = channel.requests_per_minute or 0
+        self.is_active = channel.is_active
+
+    def __repr__(self):
+        return f"<ChannelConfig(id={self.id}, slug={self.slug})>"
+
+
+class ChannelThrottle:
+    """单个频道的LLM调用节流器，保证相邻两次调用间隔不小于 60/RPM 秒"""
+
+    def __init__(self, requests_per_minute: int):
+        self.interval = self.interval_for(requests_per_minute)
+        self._lock = asyncio.Lock()
+        self._next_allowed = 0.0
+
+    @staticmethod
+    def interval_for(requests_per_minute: int) -> float:
+        """根据每分钟调用次数计算最小间隔"""
+        return 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+
+    async def wait(self):
+        """等待直到允许下一次调用"""
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_allowed - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+                now = time.monotonic()
+            self._next_allowed = now + self.interval
+
+
+class ChannelRegistry:
+    """频道注册表：按标识和ID在内存中 O(1) 查找频道"""
+
+    def __init__(self):
+        self._by_slug: Dict[str, ChannelConfig] = {}
+        self._by_id: Dict[int, ChannelConfig] = {}
+        self._throttles: Dict[int, ChannelThrottle] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    async def load(self):
+        """从数据库加载所有启用的频道"""
+        from sqlalchemy import select
+        from app.models import Channel
+        from app.database import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(select(Channel).where(Channel.is_active.is_(True)))
+            channels = [ChannelConfig(row) for row in result.scalars().all()]
+
+        self._by_slug = {c.slug: c for c in channels}
+        self._by_id = {c.id: c for c in channels}
+        # 保留已有节流器的状态，仅在限速配置变化时重建
+        throttles = {}
+        for channel in channels:
+            throttle = self._throttles.get(channel.id)
+            if throttle is None or throttle.interval != ChannelThrottle.interval_for(channel.requests_per_minute):
+                throttle = ChannelThrottle(channel.requests_per_minute)
+            throttles[channel.id] = throttle
+        self._throttles = throttles
+        self._loaded = True
+        logger.info(f"已加载 {len(channels)} 个频道: {list(self._by_slug)}")
+
+    async def ensure_loaded(self):
+        """首次使用时加载频道"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if not self._loaded:
+                await self.load()
+
+    async def resolve(self, slug: str) -> ChannelConfig:
+        """根据标识获取频道，不存在时抛出 ChannelNotFoundError"""
+        await self.ensure_loaded()
+        channel = self._by_slug.get(slug)
+        if channel is None:
+            raise ChannelNotFoundError(f"频道 {slug} 不存在或未启用")
+        return channel
+
+    def get_by_id(self, channel_id: int) -> Optional[ChannelConfig]:
+        """根据ID获取频道"""
+        return self._by_id.get(channel_id)
+
+    def throttle(self, channel: ChannelConfig) -> ChannelThrottle:
+        """获取频道的节流器"""
+        throttle = self._throttles.get(channel.id)
+        if throttle is None:
+            throttle = self._throttles[channel.id] = ChannelThrottle(channel.requests_per_minute)
+        return throttle
+
+    async def all(self) -> List[ChannelConfig]:
+        """获取所有启用的频道"""
+        await self.ensure_loaded()
+        return list(self._by_slug.values())
+
+
+class ChannelCreate(BaseModel):
+    """创建频道请求体"""
+    slug: str = Field(..., pattern=r"^[a-z0-9][a-z0-9_-]{0,49}$", description="频道标识")
+    name: str = Field(..., max_length=100, description="频道名称")
+    language: str = Field("zh-CN", max_length=20, description="语言")
+    theme: Optional[str] = Field(None, max_length=100, description="主题")
+    audience: Optional[str] = Field(None, max_length=100, description="受众")
+    system_prompt: Optional[str] = Field(None, description="系统提示词")
+    prompt_templates: Optional[List[str]] = Field(None, description="提示词模板，要求返回“内容|作者”格式")
+    fallback_quotes: Optional[List[Tuple[str, str]]] = Field(None, description="兜底语录池，元素为[内容, 作者]")
+    requests_per_minute: int = Field(20, ge=0, description="每分钟最多调用LLM次数，0为不限制")
+
+    @field_validator("slug")
+    @classmethod
+    def _slug_not_reserved(cls, slug: str) -> str:
+        if slug in RESERVED_SLUGS:
+            raise ValueError(f"频道标识 {slug} 与系统路由冲突，请换一个")
+        return slug
+
+
+async def create_channel(data: ChannelCreate) -> Dict:
+    """创建频道并刷新注册表"""
+    from app.models import Channel
+    from app.database import AsyncSessionLocal
+
+    channel = Channel(
+        slug=data.slug,
+        name=data.name,
+        language=data.language,
+        theme=data.theme,
+        audience=data.audience,
+        system_prompt=data.system_prompt,
+        prompt_templates=json.dumps(data.prompt_templates, ensure_ascii=False) if data.prompt_templates else None,
+        fallback_quotes=json.dumps(data.fallback_quotes, ensure_ascii=False) if data.fallback_quotes else None,
+        requests_per_minute=data.requests_per_minute,
+        is_active=True
+    )
+
+    async with AsyncSessionLocal() as db:
+        db.add(channel)
+        await db.commit()
+        await db.refresh(channel)
+
+    await channel_registry.load()
+    return channel.to_dict()
+
+
+def pick_fallback(channel: ChannelConfig) -> Optional[Tuple[str, str]]:
+    """从频道兜底语录池中随机选择一条"""
+    if not channel.fallback_quotes:
+        return None
+    return random.choice(channel.fallback_quotes)
+
+
+# 创建全局频道注册表
+channel_registry = ChannelRegistry()
@@ -5,25 +5,36 @@ import os
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
+from app.storage import get_backend, create_backend_async_engine, ReadSessionFactory
 
 # 加载环境变量
 load_dotenv()
 
-# 数据库URL
+# 数据库URL，支持 sqlite:/// 和 postgresql:// 两种形式
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./daily_quotes.db")
-ASYNC_DATABASE_URL = DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://")
+# 只读副本，多个地址用逗号分隔（可选）
+DATABASE_READ_URLS = [
+    url.strip() for url in os.getenv("DATABASE_READ_URLS", "").split(",") if url.strip()
+]
+
+# 根据URL选择存储后端
+storage_backend = get_backend(DATABASE_URL)
+ASYNC_DATABASE_URL = storage_backend.async_url()
 
 # 创建数据库引擎
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False)
+engine = create_engine(storage_backend.sync_url(), **storage_backend.sync_engine_options())
+storage_backend.configure_engine(engine)
+async_engine = create_backend_async_engine(storage_backend)
 
 # 创建会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 AsyncSessionLocal = sessionmaker(
     async_engine, class_=AsyncSession, expire_on_commit=False
 )
+# 只读会话（GET接口使用），未配置副本时等同于 AsyncSessionLocal
+AsyncReadSessionLocal = ReadSessionFactory(AsyncSessionLocal, DATABASE_READ_URLS)
 
 # 创建基础模型类
 Base = declarative_base()
@@ -44,12 +55,44 @@ async def get_async_db():
         yield session
 
 
+async def get_async_read_db():
+    """获取异步只读数据库会话"""
+    async with AsyncReadSessionLocal() as session:
+        yield session
+
+
+def get_storage_status():
+    """获取存储后端状态"""
+    status = storage_backend.describe()
+    status["read_replicas"] = AsyncReadSessionLocal.describe()
+    return status
+
+
 def create_tables():
-    """创建数据库表"""
-    Base.metadata.create_all(bind=engine)
+    """创建数据库表并执行结构迁移"""
+    from app.migrations import lock_schema, run_migrations
+
+    with engine.begin() as conn:
+        lock_schema(conn)
+        Base.metadata.create_all(bind=conn)
+        run_migrations(conn)
 
 
 async def create_tables_async():
-    """异步创建数据库表"""
+    """异步创建数据库表并执行结构迁移"""
+    from app.migrations import lock_schema, run_migrations
+    from app.authors import sync_authors
+
     async with async_engine.begin() as conn:
+        await conn.run_sync(lock_schema)
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(run_migrations)
+        await conn.run_sync(sync_authors)
+
+
+async def dispose_engines():
+    """关闭所有连接池"""
+    await async_engine.dispose()
+    for read_engine in AsyncReadSessionLocal.engines:
+        await read_engine.dispose()
+    engine.dispose()
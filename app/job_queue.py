@@ -0,0 +1,385 @@
+"""
+持久化的语录生成任务队列
+
+任务保存在数据库的 generation_jobs 表中，由独立于HTTP请求的工作协程池执行：
+- 幂等键：同一频道同一日期的生成任务只会存在一个
+- 租约：工作协程领取任务时写入租约，进程崩溃后租约过期，任务会被其他工作协程重新领取；
+  续约和写入结果都以租约为条件，租约被重新领取后原执行者的结果不会覆盖新的执行
+- 重试：失败后按指数退避并加入随机抖动重新排队，超过最大次数后标记为失败
+"""
+import os
+import json
+import random
+import socket
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.exc import IntegrityError
+from app.database import AsyncSessionLocal
+from app.models import GenerationJob, parse_date
+from app.channels import channel_registry
+import logging
+
+logger = logging.getLogger(__name__)
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobQueue:
+    """数据库任务队列和工作协程池"""
+
+    def __init__(self):
+        self.worker_count = int(os.getenv("JOB_WORKERS", "2"))
+        self.lease_seconds = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+        self.poll_interval = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+        self.max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+        self.retry_base_seconds = float(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+        self.is_running = False
+        self._workers: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._waiters: Dict[int, List[asyncio.Future]] = {}
+        self.processed = 0
+        self.failed = 0
+
+    @staticmethod
+    def default_key(channel: str, target_date: str) -> str:
+        """默认幂等键：同一频道同一日期只生成一次"""
+        return f"generate:{channel}:{target_date}"
+
+    async def enqueue(
+        self,
+        target_date: str,
+        channel: str,
+        idempotency_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        提交生成任务
+
+        Args:
+            target_date: 目标日期 (YYYY-MM-DD)
+            channel: 频道标识
+            idempotency_key: 幂等键，默认按频道和日期生成
+
+        Returns:
+            任务信息字典；相同幂等键的任务已存在时返回已有任务
+        """
+        channel_config = await channel_registry.resolve(channel)
+        key = idempotency_key or self.default_key(channel, target_date)
+        now = _utcnow()
+
+        async with AsyncSessionLocal() as db:
+            job = await self._get_by_key(db, key)
+            if job is None:
+                job = GenerationJob(
+                    idempotency_key=key,
+                    channel_id=channel_config.id,
+                    target_date=parse_date(target_date),
+                    status=JOB_PENDING,
+                    attempts=0,
+                    max_attempts=self.max_attempts,
+                    run_after=now
+                )
+                db.add(job)
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # 并发提交了相同幂等键的任务
+                    await db.rollback()
+                    job = await self._get_by_key(db, key)
+                else:
+                    logger.info(f"提交生成任务 {job.id}: {key}")
+            elif job.status == JOB_FAILED:
+                # 已失败的任务重新排队
+                job.status = JOB_PENDING
+                job.attempts = 0
+                job.run_after = now
+                job.error = None
+                job.finished_at = None
+                await db.commit()
+                logger.info(f"重新提交失败的生成任务 {job.id}: {key}")
+
+            job_data = job.to_dict()
+
+        self._notify_workers()
+        return job_data
+
+    async def _get_by_key(self, db, key: str) -> Optional[GenerationJob]:
+        result = await db.execute(
+            select(GenerationJob).where(GenerationJob.idempotency_key == key)
+        )
+        return result.scalar_one_or_none()
+
+    async def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """获取任务信息"""
+        async with AsyncSessionLocal() as db:
+            job = await db.get(GenerationJob, job_id)
+            return job.to_dict() if job else None
+
+    async def wait(self, job_id: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待任务完成
+
+        同进程内完成的任务会立即唤醒等待者，其他进程执行的任务按轮询间隔检查数据库。
+
+        Returns:
+            任务信息字典（超时后返回当前状态），任务不存在时返回None
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + max(timeout, 0)
+
+        while True:
+            job = await self.get(job_id)
+            remaining = deadline - loop.time()
+            if job is None or job["status"] in FINISHED_STATUSES or remaining <= 0:
+                return job
+
+            future = loop.create_future()
+            self._waiters.setdefault(job_id, []).append(future)
+            try:
+                await asyncio.wait_for(asyncio.shield(future), timeout=min(self.poll_interval, remaining))
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                waiters = self._waiters.get(job_id, [])
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    self._waiters.pop(job_id, None)
+
+    async def enqueue_and_wait(self, target_date: str, channel: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """提交任务并等待完成"""
+        job = await self.enqueue(target_date, channel)
+        if job["status"] in FINISHED_STATUSES:
+            return job
+        return await self.wait(job["id"], timeout)
+
+    async def start(self):
+        """启动工作协程池"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._worker_loop(i), name=f"generation-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"任务队列已启动，工作协程数: {self.worker_count}，工作进程: {self.worker_id}")
+
+    async def stop(self):
+        """停止工作协程池，未完成的任务会在租约过期后被重新领取"""
+        if not self.is_running:
+            return
+        self.is_running = False
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("任务队列已停止")
+
+    def _notify_workers(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker_loop(self, index: int):
+        """工作协程：循环领取并执行任务"""
+        while self.is_running:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"领取生成任务失败: {e}")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _claim(self) -> Optional[GenerationJob]:
+        """领取一个可执行的任务（待执行，或租约已过期的执行中任务）"""
+        now = _utcnow()
+        claimable = or_(
+            and_(GenerationJob.status == JOB_PENDING, GenerationJob.run_after <= now),
+            and_(GenerationJob.status == JOB_RUNNING, GenerationJob.lease_expires_at < now),
+        )
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(GenerationJob.id).where(claimable).order_by(GenerationJob.run_after).limit(1)
+            )
+            job_id = result.scalar_one_or_none()
+            if job_id is None:
+                return None
+
+            # 条件更新保证只有一个工作协程能领取成功
+            result = await db.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, claimable)
+                .values(
+                    status=JOB_RUNNING,
+                    lease_owner=self.worker_id,
+                    lease_expires_at=now + timedelta(seconds=self.lease_seconds),
+                    attempts=GenerationJob.attempts + 1
+                )
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                return None
+
+            return await db.get(GenerationJob, job_id)
+
+    @staticmethod
+    def _lease(job: GenerationJob):
+        """当前执行持有的租约：领取者和领取时的执行次数都一致（每次领取都会增加执行次数）"""
+        return and_(
+            GenerationJob.id == job.id,
+            GenerationJob.lease_owner == job.lease_owner,
+            GenerationJob.attempts == job.attempts
+        )
+
+    async def _heartbeat(self, job: GenerationJob):
+        """定期续约，防止长时间运行的任务被其他工作协程抢走"""
+        interval = max(self.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        update(GenerationJob)
+                        .where(self._lease(job))
+                        .values(lease_expires_at=_utcnow() + timedelta(seconds=self.lease_seconds))
+                    )
+                    await db.commit()
+                if result.rowcount != 1:
+                    logger.warning(f"生成任务 {job.id} 的租约已被重新领取，停止续约")
+                    return
+            except Exception as e:
+                logger.error(f"生成任务 {job.id} 续约失败: {e}")
+
+    async def _run(self, job: GenerationJob):
+        """执行任务并记录结果"""
+        from app.ai_service import ai_service
+
+        if job.attempts > job.max_attempts:
+            await self._finish(job, JOB_FAILED, error=job.error or "超过最大执行次数")
+            return
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await channel_registry.ensure_loaded()
+            channel = channel_registry.get_by_id(job.channel_id)
+            if channel is None:
+                raise RuntimeError(f"频道 {job.channel_id} 不存在或未启用")
+
+            target_date = job.target_date.isoformat()
+            logger.info(f"执行生成任务 {job.id}（第 {job.attempts} 次）: {channel.slug} {target_date}")
+            result = await ai_service.generate_daily_quote(target_date, channel.slug)
+            if not result.get("success"):
+                raise RuntimeError(result.get("message", "未知错误"))
+
+            if await self._finish(job, JOB_SUCCEEDED, result=result):
+                self.processed += 1
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error_msg = str(e)
+            if job.attempts < job.max_attempts:
+                # 指数退避 + 随机抖动，避免多个任务同时重试
+                delay = self.retry_base_seconds * (2 ** (job.attempts - 1)) * random.uniform(0.5, 1.5)
+                if await self._retry_later(job, delay, error_msg):
+                    logger.warning(f"生成任务 {job.id} 失败，{delay:.0f} 秒后重试: {error_msg}")
+            elif await self._finish(job, JOB_FAILED, error=error_msg):
+                self.failed += 1
+                logger.error(f"生成任务 {job.id} 最终失败: {error_msg}")
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+
+    async def _retry_later(self, job: GenerationJob, delay: float, error_msg: str) -> bool:
+        """任务重新排队，租约已被重新领取时不做修改并返回False"""
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(
+                update(GenerationJob)
+                .where(self._lease(job))
+                .values(
+                    status=JOB_PENDING,
+                    run_after=_utcnow() + timedelta(seconds=delay),
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    error=error_msg
+                )
+            )
+            await db.commit()
+
+        if updated.rowcount != 1:
+            logger.warning(f"生成任务 {job.id} 的租约已被重新领取，不再重新排队")
+            return False
+        return True
+
+    async def _finish(
+        self,
+        job: GenerationJob,
+        status: str,
+        result: Optional[Dict] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """记录任务结果，租约已被重新领取时不做修改并返回False"""
+        async with AsyncSessionLocal() as db:
+            updated = await db.execute(
+                update(GenerationJob)
+                .where(self._lease(job))
+                .values(
+                    status=status,
+                    result=json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error=error,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    finished_at=_utcnow()
+                )
+            )
+            await db.commit()
+
+        if updated.rowcount != 1:
+            logger.warning(f"生成任务 {job.id} 的租约已被重新领取，丢弃本次结果")
+            return False
+
+        # 唤醒同进程内的等待者
+        for future in self._waiters.pop(job.id, []):
+            if not future.done():
+                future.set_result(status)
+        return True
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取任务队列状态"""
+        return {
+            "is_running": self.is_running,
+            "worker_id": self.worker_id,
+            "workers": self.worker_count,
+            "processed": self.processed,
+            "failed": self.failed,
+            "waiting_clients": sum(len(w) for w in self._waiters.values())
+        }
+
+
+# 创建全局任务队列实例
+job_queue = JobQueue()
@@ -0,0 +1,175 @@
+"""
+LLM接口的HTTP连接池
+
+OpenAI客户端共用一个 httpx.AsyncClient，传输层参数可配置：
+
+- 连接池上限（OPENAI_MAX_CONNECTIONS / OPENAI_MAX_KEEPALIVE_CONNECTIONS）和空闲连接保留时间
+  （OPENAI_KEEPALIVE_EXPIRY），默认比 httpx 的5秒长，两次调用之间连接不会被丢弃
+- OPENAI_HTTP2=True 时通过ALPN协商HTTP/2（需要安装 h2），服务端不支持时自动使用HTTP/1.1
+- 套接字开启TCP keepalive，避免空闲连接被中间网络设备静默断开
+- 定时任务在每日生成前 OPENAI_PREWARM_MINUTES 分钟预先建立连接（prewarm），
+  生成时不再承担DNS、TCP和TLS握手的耗时
+
+每个请求通过 httpcore 的 trace 扩展记录是否新建连接以及TCP（含DNS解析）和TLS握手耗时，
+统计结果见 /admin/rate-limits 中的 llm_http。
+"""
+import os
+import time
+import socket
+from datetime import datetime
+from typing import Optional, Dict, Any
+import httpx
+from openai import DefaultAsyncHttpxClient
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _RequestTrace:
+    """单个请求的连接事件（httpcore trace 扩展回调）"""
+
+    def __init__(self, pool: "LLMConnectionPool"):
+        self.pool = pool
+        self.connected = False
+        self._started: Dict[str, float] = {}
+
+    async def __call__(self, event: str, info: Dict[str, Any]):
+        name, _, stage = event.rpartition(".")
+        if name not in ("connection.connect_tcp", "connection.start_tls"):
+            return
+        if stage == "started":
+            self._started[name] = time.perf_counter()
+            return
+        elapsed_ms = (time.perf_counter() - self._started.pop(name, time.perf_counter())) * 1000
+        if stage == "failed":
+            self.pool.connect_failures += 1
+        elif name == "connection.connect_tcp":
+            self.connected = True
+            self.pool.new_connections += 1
+            self.pool.connect_ms_total += elapsed_ms
+            self.pool.last_connect_ms = round(elapsed_ms, 1)
+        else:
+            self.pool.tls_handshakes += 1
+            self.pool.tls_ms_total += elapsed_ms
+            self.pool.last_tls_ms = round(elapsed_ms, 1)
+
+
+class LLMConnectionPool:
+    """OpenAI客户端共用的HTTP连接池"""
+
+    def __init__(self):
+        self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+        self.max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.keepalive_expiry = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "300"))
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "600"))
+        self.connect_timeout = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+        self.prewarm_minutes = int(os.getenv("OPENAI_PREWARM_MINUTES", "2"))
+        self.http2_requested = os.getenv("OPENAI_HTTP2", "True").lower() == "true"
+        if self.http2_requested and not HTTP2_AVAILABLE:
+            logger.warning("OPENAI_HTTP2=True 但未安装 h2，LLM接口使用HTTP/1.1")
+        self.http2 = self.http2_requested and HTTP2_AVAILABLE
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.requests = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.tls_handshakes = 0
+        self.connect_failures = 0
+        self.connect_ms_total = 0.0
+        self.tls_ms_total = 0.0
+        self.last_connect_ms: Optional[float] = None
+        self.last_tls_ms: Optional[float] = None
+        self.http_versions: Dict[str, int] = {}
+        self.prewarms = 0
+        self.last_prewarm: Optional[str] = None
+        self.last_prewarm_ms: Optional[float] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """共用的HTTP客户端（延迟创建）"""
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            )
+            transport = httpx.AsyncHTTPTransport(
+                http2=self.http2,
+                limits=limits,
+                socket_options=[(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            )
+            self._client = DefaultAsyncHttpxClient(
+                transport=transport,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                event_hooks={"request": [self._on_request], "response": [self._on_response]}
+            )
+        return self._client
+
+    async def _on_request(self, request: httpx.Request):
+        request.extensions["trace"] = _RequestTrace(self)
+
+    async def _on_response(self, response: httpx.Response):
+        self.requests += 1
+        trace = response.request.extensions.get("trace")
+        if isinstance(trace, _RequestTrace) and not trace.connected:
+            self.reused_connections += 1
+        self.http_versions[response.http_version] = self.http_versions.get(response.http_version, 0) + 1
+
+    async def prewarm(self):
+        """预先建立到LLM接口的连接（请求模型列表，响应状态不影响连接复用）"""
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key or api_key == "your_openai_api_key_here":
+            return
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(
+                f"{self.base_url}/models",
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=self.connect_timeout * 2
+            )
+            await response.aclose()
+        except httpx.HTTPError as e:
+            logger.warning(f"预热LLM连接失败: {e}")
+            return
+        self.prewarms += 1
+        self.last_prewarm = datetime.now().isoformat()
+        self.last_prewarm_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"LLM连接已预热（{response.http_version}，{self.last_prewarm_ms} ms）")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": self.reused_connections,
+            "connect_failures": self.connect_failures,
+            "avg_connect_ms": round(self.connect_ms_total / self.new_connections, 1) if self.new_connections else None,
+            "avg_tls_ms": round(self.tls_ms_total / self.tls_handshakes, 1) if self.tls_handshakes else None,
+            "last_connect_ms": self.last_connect_ms,
+            "last_tls_ms": self.last_tls_ms,
+            "http_versions": self.http_versions,
+            "prewarms": self.prewarms,
+            "last_prewarm": self.last_prewarm,
+            "last_prewarm_ms": self.last_prewarm_ms
+        }
+
+
+# 创建全局LLM连接池
+llm_http = LLMConnectionPool()
@@ -0,0 +1,272 @@
+"""
+数据库结构迁移
+
+启动时先由 create_all 创建缺失的表，再按版本号顺序执行尚未记录在
+schema_migrations 中的迁移。每个迁移都会先检查当前结构，因此对新建的
+数据库和旧版数据库文件都可以安全执行。
+"""
+import logging
+from typing import Callable, List, NamedTuple
+from sqlalchemy import MetaData, Table, inspect, insert, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.sql import sqltypes
+
+logger = logging.getLogger(__name__)
+
+
+class Migration(NamedTuple):
+    """单个迁移定义"""
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, name: str):
+    """注册迁移的装饰器"""
+    def decorator(func: Callable[[Connection], None]):
+        MIGRATIONS.append(Migration(version, name, func))
+        return func
+    return decorator
+
+
+def _has_column(conn: Connection, table_name: str, column_name: str) -> bool:
+    """检查表中是否存在指定列"""
+    return any(c["name"] == column_name for c in inspect(conn).get_columns(table_name))
+
+
+def _create_existing_indexes(conn: Connection, table: Table):
+    """创建模型中声明的索引，跳过引用了尚未添加的列的索引（由后续迁移创建）"""
+    existing_columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    for index in table.indexes:
+        if all(column.name in existing_columns for column in index.columns):
+            index.create(conn, checkfirst=True)
+
+
+def _column_is_date(conn: Connection, table_name: str, column_name: str) -> bool:
+    """检查列是否已经是原生日期类型"""
+    for column in inspect(conn).get_columns(table_name):
+        if column["name"] == column_name:
+            return isinstance(column["type"], sqltypes.Date)
+    return False
+
+
+def _rebuild_sqlite_table(conn: Connection, table: Table):
+    """
+    按模型定义重建SQLite表
+
+    SQLite不支持修改列类型，这里按官方推荐的方式在同一事务内
+    新建表、复制数据、删除旧表并重命名，最后重建模型中声明的索引。
+    """
+    tmp_name = f"_migrate_{table.name}"
+    tmp_metadata = MetaData()
+    # 外键引用的表也要复制到临时元数据中，才能生成建表语句
+    for foreign_key in table.foreign_keys:
+        foreign_key.column.table.to_metadata(tmp_metadata)
+    tmp_table = table.to_metadata(tmp_metadata, name=tmp_name)
+
+    existing_columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+    columns = ", ".join(f'"{c.name}"' for c in table.columns if c.name in existing_columns)
+
+    conn.execute(text(f'DROP TABLE IF EXISTS "{tmp_name}"'))
+    conn.execute(CreateTable(tmp_table))
+    conn.execute(text(
+        f'INSERT INTO "{tmp_name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+    ))
+    conn.execute(text(f'DROP TABLE "{table.name}"'))
+    conn.execute(text(f'ALTER TABLE "{tmp_name}" RENAME TO "{table.name}"'))
+
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+
+@migration(1, "native_date_columns")
+def _native_date_columns(conn: Connection):
+    """将 daily_quotes.date 和 quote_generation_logs.date 从字符串改为日期类型"""
+    from app.models import DailyQuote, QuoteGenerationLog
+
+    for model in (DailyQuote, QuoteGenerationLog):
+        table = model.__table__
+        if _column_is_date(conn, table.name, "date"):
+            continue
+
+        logger.info(f"迁移 {table.name}.date 为日期类型")
+        if conn.dialect.name == "sqlite":
+            _rebuild_sqlite_table(conn, table)
+        else:
+            conn.execute(text(
+                f'ALTER TABLE {table.name} ALTER COLUMN date TYPE DATE USING date::date'
+            ))
+
+
+@migration(2, "covering_indexes")
+def _covering_indexes(conn: Connection):
+    """为按日期读取和日志查询添加覆盖索引"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_daily_quotes_date_cover "
+            "ON daily_quotes (date) INCLUDE (content, author)"
+        ))
+    else:
+        # SQLite不支持INCLUDE，把内容列放进索引键中以获得覆盖索引
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_daily_quotes_date_cover "
+            "ON daily_quotes (date, content, author)"
+        ))
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_quote_generation_logs_date_attempt "
+        "ON quote_generation_logs (date, attempt_number)"
+    ))
+    # (date, attempt_number) 已覆盖单列date索引
+    conn.execute(text("DROP INDEX IF EXISTS ix_quote_generation_logs_date"))
+
+    # 更新统计信息，让查询规划器使用新索引
+    conn.execute(text("ANALYZE"))
+
+
+@migration(3, "channels")
+def _channels(conn: Connection):
+    """引入频道：创建默认频道，唯一约束改为 (channel_id, date)"""
+    from app.models import (
+        Channel, DailyQuote, QuoteGenerationLog, DEFAULT_CHANNEL_ID, DEFAULT_CHANNEL_SLUG
+    )
+
+    exists = conn.execute(
+        select(Channel.id).where(Channel.id == DEFAULT_CHANNEL_ID)
+    ).first()
+    if not exists:
+        conn.execute(insert(Channel).values(
+            id=DEFAULT_CHANNEL_ID,
+            slug=DEFAULT_CHANNEL_SLUG,
+            name="哲学家名言",
+            language="zh-CN",
+            theme="哲学",
+            audience="通用",
+            requests_per_minute=20,
+            is_active=True,
+        ))
+
+    quotes_table = DailyQuote.__table__
+    if not _has_column(conn, quotes_table.name, "channel_id"):
+        logger.info("为 daily_quotes 添加 channel_id 列")
+        if conn.dialect.name == "sqlite":
+            # 需要去掉旧的 date 唯一索引，只能重建表
+            _rebuild_sqlite_table(conn, quotes_table)
+        else:
+            conn.execute(text(
+                f"ALTER TABLE daily_quotes ADD COLUMN channel_id INTEGER NOT NULL "
+                f"DEFAULT {DEFAULT_CHANNEL_ID} REFERENCES channels(id)"
+            ))
+    conn.execute(text("DROP INDEX IF EXISTS ix_daily_quotes_date"))
+    _create_existing_indexes(conn, quotes_table)
+
+    if not _has_column(conn, QuoteGenerationLog.__tablename__, "channel_id"):
+        conn.execute(text(
+            f"ALTER TABLE quote_generation_logs ADD COLUMN channel_id INTEGER NOT NULL "
+            f"DEFAULT {DEFAULT_CHANNEL_ID}"
+        ))
+
+    # 覆盖索引改为以频道开头
+    conn.execute(text("DROP INDEX IF EXISTS ix_daily_quotes_date_cover"))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_daily_quotes_channel_date_cover "
+            "ON daily_quotes (channel_id, date) INCLUDE (content, author)"
+        ))
+    else:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_daily_quotes_channel_date_cover "
+            "ON daily_quotes (channel_id, date, content, author)"
+        ))
+
+    if conn.dialect.name == "postgresql":
+        # 显式插入了id，需要同步序列
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('channels', 'id'), "
+            "(SELECT MAX(id) FROM channels))"
+        ))
+    conn.execute(text("ANALYZE"))
+
+
+@migration(4, "generation_log_reason_code")
+def _generation_log_reason_code(conn: Connection):
+    """生成日志增加失败原因代码"""
+    if not _has_column(conn, "quote_generation_logs", "reason_code"):
+        conn.execute(text("ALTER TABLE quote_generation_logs ADD COLUMN reason_code VARCHAR(50)"))
+
+
+
+@migration(5, "generation_log_prompt_stats")
+def _generation_log_prompt_stats(conn: Connection):
+    """生成日志记录提示词模板和模型调用耗时"""
+    if not _has_column(conn, "quote_generation_logs", "prompt_template"):
+        conn.execute(text("ALTER TABLE quote_generation_logs ADD COLUMN prompt_template VARCHAR(32)"))
+    if not _has_column(conn, "quote_generation_logs", "latency_ms"):
+        conn.execute(text("ALTER TABLE quote_generation_logs ADD COLUMN latency_ms INTEGER"))
+
+
+@migration(6, "quote_author_ids")
+def _quote_author_ids(conn: Connection):
+    """语录关联归一化的作者（作者表由 create_all 创建，数据由 sync_authors 回填）"""
+    if not _has_column(conn, "daily_quotes", "author_id"):
+        conn.execute(text("ALTER TABLE daily_quotes ADD COLUMN author_id INTEGER REFERENCES authors(id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_daily_quotes_channel_author_date "
+        "ON daily_quotes (channel_id, author_id, date)"
+    ))
+
+
+@migration(7, "fallback_date_index")
+def _fallback_date_index(conn: Connection):
+    """兜底语录修复任务按 (is_fallback, date) 查找未来日期的兜底语录"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_daily_quotes_fallback_date "
+        "ON daily_quotes (is_fallback, date)"
+    ))
+
+
+def lock_schema(conn: Connection):
+    """
+    在当前事务中获取结构变更锁，多个进程同时启动时串行执行建表和迁移
+
+    需要在 create_all 之前调用，锁在事务结束时释放；SQLite 的写事务本身是串行的，无需加锁。
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(20250704)"))
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """
+    执行所有未应用的迁移
+
+    Args:
+        conn: 处于事务中的同步数据库连接
+
+    Returns:
+        本次执行的迁移版本号列表
+    """
+    from app.models import SchemaMigration
+
+    # 同一事务中重复获取不会阻塞
+    lock_schema(conn)
+
+    SchemaMigration.__table__.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(SchemaMigration.version)).scalars())
+
+    executed = []
+    for item in sorted(MIGRATIONS, key=lambda m: m.version):
+        if item.version in applied:
+            continue
+
+        logger.info(f"执行数据库迁移 {item.version:04d}_{item.name}")
+        item.upgrade(conn)
+        conn.execute(insert(SchemaMigration).values(version=item.version, name=item.name))
+        executed.append(item.version)
+
+    if executed:
+        logger.info(f"数据库迁移完成: {executed}")
+    return executed
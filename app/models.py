@@ -1,20 +1,107 @@
 """
 数据库模型定义
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+import json
+from sqlalchemy import Column, Integer, String, DateTime, Date, Text, Boolean, Float, Index, ForeignKey, text
 from sqlalchemy.sql import func
 from datetime import datetime, date
+from typing import Union
 from app.database import Base
 
+# 默认频道（迁移时创建，兼容旧版单频道接口）
+DEFAULT_CHANNEL_ID = 1
+DEFAULT_CHANNEL_SLUG = "default"
+
+
+def parse_date(value: Union[str, date]) -> date:
+    """将 YYYY-MM-DD 字符串或日期对象统一转换为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+class Channel(Base):
+    """语录频道模型"""
+    __tablename__ = "channels"
+
+    id = Column(Integer, primary_key=True, index=True)
+    slug = Column(String(50), nullable=False, unique=True, index=True, comment="频道标识")
+    name = Column(String(100), nullable=False, comment="频道名称")
+    language = Column(String(20), default="zh-CN", comment="语言")
+    theme = Column(String(100), comment="主题")
+    audience = Column(String(100), comment="受众")
+    system_prompt = Column(Text, comment="系统提示词，为空时使用默认提示词")
+    prompt_templates = Column(Text, comment="提示词模板(JSON数组)，为空时使用默认模板")
+    fallback_quotes = Column(Text, comment="兜底语录池(JSON数组，元素为[内容, 作者])")
+    requests_per_minute = Column(Integer, default=20, comment="每分钟最多调用LLM次数")
+    is_active = Column(Boolean, default=True, comment="是否启用")
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+
+    def __repr__(self):
+        return f"<Channel(id={self.id}, slug={self.slug})>"
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "id": self.id,
+            "slug": self.slug,
+            "name": self.name,
+            "language": self.language,
+            "theme": self.theme,
+            "audience": self.audience,
+            "system_prompt": self.system_prompt,
+            "prompt_templates": json.loads(self.prompt_templates) if self.prompt_templates else None,
+            "fallback_quotes": json.loads(self.fallback_quotes) if self.fallback_quotes else None,
+            "requests_per_minute": self.requests_per_minute,
+            "is_active": self.is_active,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class Author(Base):
+    """作者（规范名称）"""
+    __tablename__ = "authors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, unique=True, comment="规范名称")
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+
+    def __repr__(self):
+        return f"<Author(id={self.id}, name={self.name})>"
+
+
+class AuthorAlias(Base):
+    """作者别名（归一化后）到作者的映射"""
+    __tablename__ = "author_aliases"
+
+    id = Column(Integer, primary_key=True, index=True)
+    alias = Column(String(100), nullable=False, unique=True, comment="归一化后的别名")
+    author_id = Column(Integer, ForeignKey("authors.id"), nullable=False, index=True, comment="所属作者")
+
+    def __repr__(self):
+        return f"<AuthorAlias(alias={self.alias}, author_id={self.author_id})>"
+
 
 class DailyQuote(Base):
     """每日语录模型"""
     __tablename__ = "daily_quotes"
+    __table_args__ = (
+        Index("ix_daily_quotes_channel_date", "channel_id", "date", unique=True),
+        Index("ix_daily_quotes_channel_author_date", "channel_id", "author_id", "date"),
+        Index("ix_daily_quotes_fallback_date", "is_fallback", "date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(
+        Integer, ForeignKey("channels.id"), nullable=False,
+        default=DEFAULT_CHANNEL_ID, server_default=text(str(DEFAULT_CHANNEL_ID)), comment="所属频道"
+    )
     content = Column(Text, nullable=False, comment="语录内容")
     author = Column(String(100), default="AI智慧", comment="作者")
-    date = Column(String(10), nullable=False, unique=True, index=True, comment="日期(YYYY-MM-DD)")
+    author_id = Column(Integer, ForeignKey("authors.id"), comment="归一化后的作者，占位作者为空")
+    date = Column(Date, nullable=False, comment="日期")
     created_at = Column(DateTime, default=func.now(), comment="创建时间")
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
     is_ai_generated = Column(Boolean, default=True, comment="是否AI生成")
@@ -28,9 +115,10 @@ class DailyQuote(Base):
         """转换为字典格式"""
         return {
             "id": self.id,
+            "channel_id": self.channel_id,
             "content": self.content,
             "author": self.author,
-            "date": self.date,
+            "date": self.date.isoformat() if self.date else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "is_ai_generated": self.is_ai_generated,
@@ -42,12 +130,22 @@ class DailyQuote(Base):
 class QuoteGenerationLog(Base):
     """语录生成日志模型"""
     __tablename__ = "quote_generation_logs"
+    __table_args__ = (
+        Index("ix_quote_generation_logs_date_attempt", "date", "attempt_number"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(String(10), nullable=False, index=True, comment="目标日期")
+    channel_id = Column(
+        Integer, nullable=False,
+        default=DEFAULT_CHANNEL_ID, server_default=text(str(DEFAULT_CHANNEL_ID)), comment="所属频道"
+    )
+    date = Column(Date, nullable=False, comment="目标日期")
     attempt_number = Column(Integer, nullable=False, comment="尝试次数")
     success = Column(Boolean, nullable=False, comment="是否成功")
     error_message = Column(Text, comment="错误信息")
+    reason_code = Column(String(50), comment="失败原因代码，如 too_short/duplicate/llm_error")
+    prompt_template = Column(String(32), comment="使用的提示词模板ID，使用候选缓存时为空")
+    latency_ms = Column(Integer, comment="模型调用耗时(毫秒)")
     generated_content = Column(Text, comment="生成的内容")
     created_at = Column(DateTime, default=func.now(), comment="创建时间")
 
@@ -58,10 +156,172 @@ class QuoteGenerationLog(Base):
         """转换为字典格式"""
         return {
             "id": self.id,
-            "date": self.date,
+            "channel_id": self.channel_id,
+            "date": self.date.isoformat() if self.date else None,
             "attempt_number": self.attempt_number,
             "success": self.success,
             "error_message": self.error_message,
+            "reason_code": self.reason_code,
+            "prompt_template": self.prompt_template,
+            "latency_ms": self.latency_ms,
             "generated_content": self.generated_content,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
+
+
+class LLMUsage(Base):
+    """LLM调用用量账本（只追加，每次调用一行）"""
+    __tablename__ = "llm_usage"
+    __table_args__ = (
+        Index("ix_llm_usage_day", "day"),
+        Index("ix_llm_usage_target_date_channel", "target_date", "channel_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, comment="调用日期")
+    created_at = Column(DateTime, nullable=False, comment="调用时间(UTC)")
+    channel_id = Column(Integer, comment="所属频道")
+    target_date = Column(Date, comment="生成的语录日期")
+    model = Column(String(100), nullable=False, comment="模型")
+    provider = Column(String(100), nullable=False, comment="服务商（接口域名）")
+    prompt_tokens = Column(Integer, nullable=False, default=0, comment="输入token数")
+    completion_tokens = Column(Integer, nullable=False, default=0, comment="输出token数")
+    total_tokens = Column(Integer, nullable=False, default=0, comment="总token数")
+    latency_ms = Column(Integer, comment="调用耗时(毫秒)")
+    success = Column(Boolean, nullable=False, comment="调用是否正常返回")
+    cost = Column(Float, nullable=False, default=0, comment="按 LLM_PRICE_* 计算的费用")
+
+    def __repr__(self):
+        return f"<LLMUsage(id={self.id}, day={self.day}, total_tokens={self.total_tokens})>"
+
+
+class SchemaMigration(Base):
+    """数据库迁移版本记录"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, comment="迁移版本号")
+    name = Column(String(100), nullable=False, comment="迁移名称")
+    applied_at = Column(DateTime, default=func.now(), comment="执行时间")
+
+    def __repr__(self):
+        return f"<SchemaMigration(version={self.version}, name={self.name})>"
+
+
+class GenerationJob(Base):
+    """语录生成任务队列"""
+    __tablename__ = "generation_jobs"
+    __table_args__ = (
+        Index("ix_generation_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    idempotency_key = Column(String(200), nullable=False, unique=True, comment="幂等键")
+    channel_id = Column(Integer, nullable=False, default=DEFAULT_CHANNEL_ID, comment="所属频道")
+    target_date = Column(Date, nullable=False, comment="目标日期")
+    status = Column(String(20), nullable=False, default="pending", comment="状态: pending/running/succeeded/failed")
+    attempts = Column(Integer, nullable=False, default=0, comment="已执行次数")
+    max_attempts = Column(Integer, nullable=False, default=3, comment="最大执行次数")
+    run_after = Column(DateTime, nullable=False, comment="最早执行时间(UTC)")
+    lease_owner = Column(String(100), comment="持有租约的工作进程")
+    lease_expires_at = Column(DateTime, comment="租约过期时间(UTC)")
+    result = Column(Text, comment="执行结果(JSON)")
+    error = Column(Text, comment="最近一次错误")
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), comment="更新时间")
+    finished_at = Column(DateTime, comment="完成时间")
+
+    def __repr__(self):
+        return f"<GenerationJob(id={self.id}, key={self.idempotency_key}, status={self.status})>"
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "id": self.id,
+            "idempotency_key": self.idempotency_key,
+            "channel_id": self.channel_id,
+            "target_date": self.target_date.isoformat() if self.target_date else None,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "result": json.loads(self.result) if self.result else None,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class CachedCandidate(Base):
+    """LLM生成的备用语录候选（已通过校验、尚未发布）"""
+    __tablename__ = "quote_candidates"
+    __table_args__ = (
+        Index("ix_quote_candidates_channel_fingerprint", "channel_id", "fingerprint", unique=True),
+        Index("ix_quote_candidates_channel_prompt_created", "channel_id", "prompt_key", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(Integer, nullable=False, default=DEFAULT_CHANNEL_ID, comment="所属频道")
+    prompt_key = Column(String(32), nullable=False, comment="提示词指纹，提示词变化后旧候选不再使用")
+    fingerprint = Column(String(16), nullable=False, comment="归一化正文指纹")
+    content = Column(Text, nullable=False, comment="语录内容")
+    author = Column(String(100), nullable=False, comment="作者")
+    created_at = Column(DateTime, nullable=False, comment="写入时间(UTC)")
+    touched_at = Column(DateTime, nullable=False, comment="最近一次被再次生成的时间(UTC)，不参与取用和淘汰顺序")
+
+    def __repr__(self):
+        return f"<CachedCandidate(id={self.id}, channel_id={self.channel_id}, author={self.author})>"
+
+    def to_dict(self):
+        """转换为字典格式"""
+        return {
+            "id": self.id,
+            "channel_id": self.channel_id,
+            "content": self.content,
+            "author": self.author,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "touched_at": self.touched_at.isoformat() if self.touched_at else None
+        }
+
+
+class ApiKey(Base):
+    """合作方API密钥（只保存哈希值）"""
+    __tablename__ = "api_keys"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tenant = Column(String(100), nullable=False, index=True, comment="租户（合作方）标识")
+    name = Column(String(100), comment="密钥用途说明")
+    key_prefix = Column(String(16), nullable=False, comment="密钥前几位，便于辨认")
+    key_hash = Column(String(64), nullable=False, unique=True, comment="密钥的SHA-256哈希")
+    is_active = Column(Boolean, nullable=False, default=True, comment="是否启用")
+    request_count = Column(Integer, nullable=False, default=0, comment="累计请求次数")
+    last_used_at = Column(DateTime, comment="最近使用时间(UTC)")
+    created_at = Column(DateTime, default=func.now(), comment="创建时间")
+
+    def __repr__(self):
+        return f"<ApiKey(id={self.id}, tenant={self.tenant}, prefix={self.key_prefix})>"
+
+    def to_dict(self):
+        """转换为字典格式（不包含哈希值）"""
+        return {
+            "id": self.id,
+            "tenant": self.tenant,
+            "name": self.name,
+            "key_prefix": self.key_prefix,
+            "is_active": self.is_active,
+            "request_count": self.request_count,
+            "last_used_at": self.last_used_at.isoformat() if self.last_used_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class CacheEvent(Base):
+    """语录变更事件，其他进程据此刷新内存缓存"""
+    __tablename__ = "cache_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    channel_id = Column(Integer, nullable=False, comment="所属频道")
+    date = Column(Date, nullable=False, comment="语录日期")
+    origin = Column(String(100), nullable=False, comment="产生事件的进程")
+    created_at = Column(DateTime, nullable=False, comment="创建时间(UTC)")
+
+    def __repr__(self):
+        return f"<CacheEvent(id={self.id}, channel_id={self.channel_id}, date={self.date})>"
@@ -0,0 +1,250 @@
+"""
+生成结果通知
+
+调度器只负责把事件放入队列，由后台协程批量投递到各个通知目标：
+- WebhookSink: 以JSON批量POST到指定地址，所有Webhook共用一个带连接池的HTTP客户端
+- FileSink: 以JSON Lines追加写入本地文件，便于其他程序读取
+
+每个目标有独立的有界队列和投递协程，某个接收方响应缓慢不会影响其他目标，
+队列满时丢弃新事件，调度任务永远不会被阻塞。投递失败按指数退避重试。
+"""
+import os
+import hmac
+import json
+import time
+import random
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationSink(ABC):
+    """通知目标基类"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queue: Optional[asyncio.Queue] = None
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error: Optional[str] = None
+
+    @abstractmethod
+    async def send(self, events: List[Dict[str, Any]]):
+        """投递一批事件，失败时抛出异常"""
+
+    def record(self, latency: float):
+        self.batches += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "queued": self.queue.qsize() if self.queue is not None else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "retries": self.retries,
+            "batches": self.batches,
+            "avg_latency_ms": round(self.total_latency / self.batches * 1000, 1) if self.batches else 0,
+            "max_latency_ms": round(self.max_latency * 1000, 1),
+            "last_error": self.last_error
+        }
+
+
+class WebhookSink(NotificationSink):
+    """Webhook通知：POST {"events": [...]}，配置密钥时附带HMAC-SHA256签名"""
+
+    def __init__(self, url: str, client_getter, secret: Optional[str] = None):
+        super().__init__(f"webhook:{url}")
+        self.url = url
+        self._client_getter = client_getter
+        self.secret = secret
+
+    async def send(self, events: List[Dict[str, Any]]):
+        body = json.dumps({"events": events}, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            signature = hmac.new(self.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-SHA256"] = signature
+
+        response = await self._client_getter().post(self.url, content=body, headers=headers)
+        response.raise_for_status()
+
+
+class FileSink(NotificationSink):
+    """本地文件通知：每个事件一行JSON"""
+
+    def __init__(self, path: str):
+        super().__init__(f"file:{path}")
+        self.path = path
+
+    def _write(self, lines: str):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    async def send(self, events: List[Dict[str, Any]]):
+        lines = "".join(json.dumps(event, ensure_ascii=False) + "\n" for event in events)
+        await asyncio.to_thread(self._write, lines)
+
+
+class NotificationDispatcher:
+    """通知分发器"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.queue_size = int(os.getenv("NOTIFY_QUEUE_SIZE", "1000"))
+        self.batch_size = int(os.getenv("NOTIFY_BATCH_SIZE", "20"))
+        self.batch_wait = float(os.getenv("NOTIFY_BATCH_WAIT_SECONDS", "1"))
+        self.max_retries = int(os.getenv("NOTIFY_MAX_RETRIES", "5"))
+        self.retry_base_seconds = float(os.getenv("NOTIFY_RETRY_BASE_SECONDS", "1"))
+        self.timeout = float(os.getenv("NOTIFY_TIMEOUT_SECONDS", "10"))
+        self.drain_seconds = float(os.getenv("NOTIFY_DRAIN_SECONDS", "5"))
+        # 可替换的HTTP传输层，便于对接本地测试服务
+        self.transport = transport
+
+        self.sinks: List[NotificationSink] = []
+        secret = os.getenv("NOTIFY_WEBHOOK_SECRET") or None
+        for url in os.getenv("NOTIFY_WEBHOOK_URLS", "").split(","):
+            if url.strip():
+                self.sinks.append(WebhookSink(url.strip(), self._get_client, secret))
+        file_path = os.getenv("NOTIFY_FILE_PATH")
+        if file_path:
+            self.sinks.append(FileSink(file_path))
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._workers: List[asyncio.Task] = []
+        self.is_running = False
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """所有Webhook共用的HTTP客户端（连接池复用）"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+                transport=self.transport
+            )
+        return self._client
+
+    def add_sink(self, sink: NotificationSink):
+        """添加通知目标（需在 start 之前调用）"""
+        self.sinks.append(sink)
+
+    async def start(self):
+        """为每个通知目标启动投递协程"""
+        if self.is_running or not self.sinks:
+            return
+        self.is_running = True
+        for sink in self.sinks:
+            sink.queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers.append(asyncio.create_task(self._worker(sink), name=f"notify-{sink.name}"))
+        logger.info(f"通知分发器已启动，通知目标: {[sink.name for sink in self.sinks]}")
+
+    async def stop(self):
+        """停止投递，最多等待 drain_seconds 把队列中剩余的事件发送出去"""
+        if not self.is_running:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(sink.queue.join() for sink in self.sinks)),
+                timeout=self.drain_seconds
+            )
+        except asyncio.TimeoutError:
+            logger.warning("通知队列未能在限定时间内发送完毕")
+        self.is_running = False
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        logger.info("通知分发器已停止")
+
+    def notify(self, event_type: str, payload: Dict[str, Any]):
+        """
+        发布事件（不阻塞）
+
+        Args:
+            event_type: 事件类型，如 generation.succeeded / generation.failed
+            payload: 事件内容
+        """
+        if not self.is_running:
+            return
+        event = {"type": event_type, "timestamp": datetime.now().isoformat(), **payload}
+        for sink in self.sinks:
+            try:
+                sink.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sink.dropped += 1
+                logger.warning(f"通知队列已满，丢弃事件: {sink.name}")
+
+    async def _next_batch(self, sink: NotificationSink) -> List[Dict[str, Any]]:
+        """取出一批事件：等到第一个事件后，在 batch_wait 内尽量凑满一批"""
+        batch = [await sink.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(sink.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self, sink: NotificationSink):
+        """单个通知目标的投递协程"""
+        while True:
+            batch = await self._next_batch(sink)
+            try:
+                await self._deliver(sink, batch)
+            finally:
+                for _ in batch:
+                    sink.queue.task_done()
+
+    async def _deliver(self, sink: NotificationSink, batch: List[Dict[str, Any]]):
+        """投递一批事件，失败后指数退避重试"""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                await sink.send(batch)
+                sink.record(time.perf_counter() - started)
+                sink.sent += len(batch)
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                sink.record(time.perf_counter() - started)
+                sink.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self.max_retries:
+                    break
+                sink.retries += 1
+                delay = self.retry_base_seconds * (2 ** attempt) * random.uniform(0.5, 1.5)
+                logger.warning(f"通知投递失败，{delay:.1f} 秒后重试 ({sink.name}): {e}")
+                await asyncio.sleep(delay)
+
+        sink.failed += len(batch)
+        logger.error(f"通知投递最终失败，丢弃 {len(batch)} 个事件 ({sink.name}): {sink.last_error}")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取各通知目标的投递统计"""
+        return {
+            "is_running": self.is_running,
+            "sinks": [sink.get_status() for sink in self.sinks]
+        }
+
+
+# 创建全局通知分发器
+notifier = NotificationDispatcher()
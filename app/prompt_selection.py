@@ -0,0 +1,248 @@
+"""
+提示词模板选择
+
+默认频道的提示词模板保存在 app/data/prompt_templates.json（可通过 PROMPT_TEMPLATES_FILE 指定），
+文件修改后最迟 PROMPT_TEMPLATES_RELOAD_SECONDS 秒自动重新加载，无需重启。
+
+每次生成时按 Thompson 采样在频道的模板中选择一个：每个模板的“单次调用成功率”
+视为 Beta(成功+1, 失败+1) 分布，采样值最高的模板被选中。成功率高的模板被选中的概率更大，
+从而减少每条语录平均需要的尝试次数，新模板和样本较少的模板仍有机会被尝试。
+
+- 启动后首次使用时从 quote_generation_logs 汇总最近 PROMPT_STATS_DAYS 天的结果
+- 之后每次尝试结束后在内存中增量更新
+- 每个模板最多保留最近约 PROMPT_STATS_WINDOW 次结果的权重，模板效果变化后能较快适应
+- 网络错误、预算用尽等与提示词无关的失败不计入统计
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
+from app.validation import DATA_DIR
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 与提示词无关的失败原因，不计入模板统计
+NEUTRAL_REASONS = ("llm_error", "budget_exhausted")
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def template_id(text: str) -> str:
+    """未指定ID的模板（频道自定义模板）使用内容指纹作为ID"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest()
+
+
+class TemplateStats:
+    """单个模板的统计"""
+
+    __slots__ = ("successes", "failures", "total_length", "length_count", "total_latency", "latency_count")
+
+    def __init__(self):
+        self.successes = 0.0
+        self.failures = 0.0
+        self.total_length = 0
+        self.length_count = 0
+        self.total_latency = 0
+        self.latency_count = 0
+
+    def record(self, success: bool, length: Optional[int], latency_ms: Optional[int], window: float):
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        # 超过窗口后等比例缩小，旧结果的权重逐渐降低
+        total = self.successes + self.failures
+        if window > 0 and total > window:
+            scale = window / total
+            self.successes *= scale
+            self.failures *= scale
+        if success and length is not None:
+            self.total_length += length
+            self.length_count += 1
+        if latency_ms is not None:
+            self.total_latency += latency_ms
+            self.latency_count += 1
+
+    def sample(self) -> float:
+        return random.betavariate(self.successes + 1, self.failures + 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        total = self.successes + self.failures
+        return {
+            "attempts": round(total, 1),
+            "success_rate": round(self.successes / total, 3) if total else None,
+            "avg_length": round(self.total_length / self.length_count, 1) if self.length_count else None,
+            "avg_latency_ms": round(self.total_latency / self.latency_count) if self.latency_count else None
+        }
+
+
+class PromptSelector:
+    """提示词模板库与自适应选择"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = Path(path or os.getenv("PROMPT_TEMPLATES_FILE") or DATA_DIR / "prompt_templates.json")
+        self.reload_interval = float(os.getenv("PROMPT_TEMPLATES_RELOAD_SECONDS", "30"))
+        self.stats_days = int(os.getenv("PROMPT_STATS_DAYS", "30"))
+        self.window = float(os.getenv("PROMPT_STATS_WINDOW", "200"))
+
+        self._templates: List[Tuple[str, str]] = []
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._stats: Dict[Tuple[int, str], TemplateStats] = {}
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self.reloads = 0
+
+    def templates(self) -> List[Tuple[str, str]]:
+        """默认频道的模板列表 [(模板ID, 模板内容)]，文件变化时重新加载"""
+        now = time.monotonic()
+        if not self._templates or now - self._checked_at >= self.reload_interval:
+            self._checked_at = now
+            self.reload()
+        return self._templates
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        重新加载模板文件
+
+        文件不存在或格式错误时保留已加载的模板。
+
+        Returns:
+            是否加载了新的模板
+        """
+        try:
+            mtime = self.path.stat().st_mtime
+            if not force and mtime == self._mtime:
+                return False
+            with open(self.path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            templates = []
+            for item in items:
+                text = item["text"].strip()
+                if text:
+                    templates.append((str(item.get("id") or template_id(text)), text))
+            if not templates:
+                raise ValueError("模板列表为空")
+        except Exception as e:
+            logger.error(f"加载提示词模板失败，继续使用已加载的模板 {self.path}: {e}")
+            return False
+
+        self._templates = templates
+        self._mtime = mtime
+        self.reloads += 1
+        logger.info(f"已加载 {len(templates)} 个提示词模板: {[tid for tid, _ in templates]}")
+        return True
+
+    def choose(self, channel_id: int, templates: List[Tuple[str, str]]) -> Tuple[str, str]:
+        """按 Thompson 采样选择模板"""
+        if len(templates) == 1:
+            return templates[0]
+        best = None
+        best_score = -1.0
+        for item in templates:
+            stats = self._stats.get((channel_id, item[0]))
+            score = stats.sample() if stats is not None else random.betavariate(1, 1)
+            if score > best_score:
+                best, best_score = item, score
+        return best
+
+    def record(
+        self,
+        channel_id: int,
+        prompt_template: str,
+        success: bool,
+        length: Optional[int] = None,
+        latency_ms: Optional[int] = None
+    ):
+        """记录一次尝试的结果"""
+        key = (channel_id, prompt_template)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = TemplateStats()
+        stats.record(success, length, latency_ms, self.window)
+
+    async def ensure_loaded(self):
+        """首次使用时从生成日志汇总统计"""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                await self._load_stats()
+            except Exception as e:
+                logger.error(f"加载提示词统计失败: {e}")
+            self._loaded = True
+
+    async def _load_stats(self):
+        from sqlalchemy import select, func, or_
+        from app.models import QuoteGenerationLog
+        from app.database import AsyncReadSessionLocal
+
+        log = QuoteGenerationLog
+        since = _utcnow() - timedelta(days=self.stats_days)
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                select(
+                    log.channel_id, log.prompt_template, log.success,
+                    func.count(), func.sum(func.length(log.generated_content)),
+                    func.count(log.latency_ms), func.sum(log.latency_ms)
+                )
+                .where(
+                    log.prompt_template.isnot(None),
+                    log.created_at >= since,
+                    or_(log.success.is_(True), log.reason_code.is_(None), log.reason_code.notin_(NEUTRAL_REASONS))
+                )
+                .group_by(log.channel_id, log.prompt_template, log.success)
+            )
+            rows = result.all()
+
+        stats: Dict[Tuple[int, str], TemplateStats] = {}
+        for channel_id, prompt_template, success, count, total_length, latency_count, total_latency in rows:
+            item = stats.get((channel_id, prompt_template))
+            if item is None:
+                item = stats[(channel_id, prompt_template)] = TemplateStats()
+            if success:
+                item.successes += count
+                item.total_length += total_length or 0
+                item.length_count += count
+            else:
+                item.failures += count
+            item.total_latency += total_latency or 0
+            item.latency_count += latency_count
+        for item in stats.values():
+            total = item.successes + item.failures
+            if self.window > 0 and total > self.window:
+                item.successes *= self.window / total
+                item.failures *= self.window / total
+
+        # 加载期间已经产生的增量统计不丢弃
+        for key, item in self._stats.items():
+            stats.setdefault(key, item)
+        self._stats = stats
+        logger.info(f"已从生成日志加载 {len(stats)} 个提示词模板的统计")
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取模板和统计"""
+        channels: Dict[str, Dict[str, Any]] = {}
+        for (channel_id, prompt_template), stats in sorted(self._stats.items()):
+            channels.setdefault(str(channel_id), {})[prompt_template] = stats.to_dict()
+        return {
+            "file": str(self.path),
+            "templates": [tid for tid, _ in self._templates],
+            "reloads": self.reloads,
+            "stats": channels
+        }
+
+
+# 创建全局提示词选择器
+prompt_selector = PromptSelector()
@@ -0,0 +1,198 @@
+"""
+按日期范围获取语录
+
+返回按天排列的紧凑数组，第 i 个元素对应 start + i 天，没有语录的日期为 null：
+
+    {"success": true, "data": {"start": "...", "end": "...", "fields": ["content", "author"],
+     "quotes": [["内容", "作者"], null, ...]}, "count": 1, "message": "获取成功"}
+
+- 整个范围只执行一次 (channel_id, date) 覆盖索引范围扫描
+- 已经过去的月份不会再变化，按月缓存编码好的字节，命中时不访问数据库
+- 范围较大时以流式响应逐月输出
+"""
+import os
+import json
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Tuple, Iterator, Optional
+from sqlalchemy import select
+from app.database import AsyncReadSessionLocal
+from app.models import DailyQuote
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 单次请求最多覆盖的天数
+MAX_RANGE_DAYS = int(os.getenv("QUOTE_RANGE_MAX_DAYS", "3660"))
+# 超过该天数时使用流式响应
+RANGE_STREAM_THRESHOLD_DAYS = int(os.getenv("QUOTE_RANGE_STREAM_DAYS", "92"))
+# 最多缓存的月份数（所有频道合计）
+RANGE_CACHE_MONTHS = int(os.getenv("QUOTE_RANGE_CACHE_MONTHS", "600"))
+
+RANGE_FIELDS = ["content", "author"]
+_NULL = b"null"
+
+# 一个月的编码结果：(每天的编码, 有语录的天数)
+MonthEntry = Tuple[Tuple[bytes, ...], int]
+
+
+def month_start(day: date) -> date:
+    """所在月份的第一天"""
+    return day.replace(day=1)
+
+
+def month_end(day: date) -> date:
+    """所在月份的最后一天"""
+    next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return next_month - timedelta(days=1)
+
+
+def iter_months(start: date, end: date) -> Iterator[date]:
+    """依次返回范围内每个月的第一天"""
+    current = month_start(start)
+    while current <= end:
+        yield current
+        current = month_end(current) + timedelta(days=1)
+
+
+def encode_quote(content: str, author: str) -> bytes:
+    """编码单天的语录"""
+    return json.dumps([content, author], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class MonthCache:
+    """已过去月份的编码缓存（LRU）"""
+
+    def __init__(self, max_months: int = RANGE_CACHE_MONTHS):
+        self.max_months = max_months
+        self._entries: "OrderedDict[Tuple[int, date], MonthEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def is_immutable(month: date, today: Optional[date] = None) -> bool:
+        """当前月份之前的月份视为不再变化"""
+        return month < month_start(today or date.today())
+
+    def get(self, channel_id: int, month: date) -> Optional[MonthEntry]:
+        entry = self._entries.get((channel_id, month))
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((channel_id, month))
+        self.hits += 1
+        return entry
+
+    def put(self, channel_id: int, month: date, entry: MonthEntry):
+        if self.max_months <= 0:
+            return
+        self._entries[(channel_id, month)] = entry
+        self._entries.move_to_end((channel_id, month))
+        while len(self._entries) > self.max_months:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, channel_id: int, day: date):
+        """语录写入后使所在月份的缓存失效（例如手动补生成过去日期的语录）"""
+        self._entries.pop((channel_id, month_start(day)), None)
+
+    def get_status(self) -> Dict:
+        return {
+            "months": len(self._entries),
+            "max_months": self.max_months,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+
+async def _fetch_days(channel_id: int, start: date, end: date) -> Dict[date, bytes]:
+    """一次范围扫描读取区间内的语录，只选取覆盖索引中的列"""
+    from app.quote_store import quote_store
+
+    if quote_store.ready:
+        return {day: encode_quote(content, author) for day, content, author in quote_store.range(channel_id, start, end)}
+
+    async with AsyncReadSessionLocal() as db:
+        result = await db.execute(
+            select(DailyQuote.date, DailyQuote.content, DailyQuote.author)
+            .where(
+                DailyQuote.channel_id == channel_id,
+                DailyQuote.date >= start,
+                DailyQuote.date <= end
+            )
+            .order_by(DailyQuote.date)
+        )
+        return {day: encode_quote(content, author) for day, content, author in result.all()}
+
+
+def _encode_month(month: date, days: Dict[date, bytes]) -> MonthEntry:
+    """按天展开一个月，缺失的日期编码为 null"""
+    last = month_end(month)
+    encoded = []
+    count = 0
+    current = month
+    while current <= last:
+        item = days.get(current)
+        if item is None:
+            encoded.append(_NULL)
+        else:
+            encoded.append(item)
+            count += 1
+        current += timedelta(days=1)
+    return tuple(encoded), count
+
+
+async def load_range(channel_id: int, start: date, end: date) -> List[Tuple[date, MonthEntry]]:
+    """
+    获取范围内每个月的编码结果
+
+    已缓存的月份直接复用；其余月份合并为一次数据库查询。
+    """
+    months = list(iter_months(start, end))
+    entries: Dict[date, MonthEntry] = {}
+    missing = []
+    for month in months:
+        entry = month_cache.get(channel_id, month) if MonthCache.is_immutable(month) else None
+        if entry is None:
+            missing.append(month)
+        else:
+            entries[month] = entry
+
+    if missing:
+        days = await _fetch_days(channel_id, missing[0], month_end(missing[-1]))
+        for month in missing:
+            entry = _encode_month(month, days)
+            entries[month] = entry
+            if MonthCache.is_immutable(month):
+                month_cache.put(channel_id, month, entry)
+
+    return [(month, entries[month]) for month in months]
+
+
+def iter_range_body(start: date, end: date, months: List[Tuple[date, MonthEntry]]) -> Iterator[bytes]:
+    """逐月生成响应体，首尾月份按请求范围截取"""
+    yield (
+        b'{"success":true,"data":{"start":"' + start.isoformat().encode() +
+        b'","end":"' + end.isoformat().encode() +
+        b'","fields":' + json.dumps(RANGE_FIELDS, separators=(",", ":")).encode() + b',"quotes":['
+    )
+
+    count = 0
+    first = True
+    for month, (encoded, month_count) in months:
+        first_index = (start - month).days if start > month else 0
+        last_index = (end - month).days if end <= month_end(month) else len(encoded) - 1
+        items = encoded[first_index:last_index + 1]
+        if first_index == 0 and last_index == len(encoded) - 1:
+            count += month_count
+        else:
+            count += sum(1 for item in items if item != _NULL)
+
+        chunk = b",".join(items)
+        yield chunk if first else b"," + chunk
+        first = False
+
+    yield b']},"count":' + str(count).encode() + ',"message":"获取成功"}'.encode("utf-8")
+
+
+# 创建全局月份缓存
+month_cache = MonthCache()
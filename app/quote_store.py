@@ -0,0 +1,322 @@
+"""
+内存列式语录存储（可选）
+
+读多写少的节点可以设置 QUOTE_STORE=memory，启动时把 daily_quotes 全部加载到内存，
+GET 接口直接从内存读取，不再创建ORM对象或访问数据库。
+
+每个频道一组按日期排序的列：
+- 日期存为序数（date.toordinal），放在 array('i') 中，按日期查找用二分
+- 语录正文以UTF-8编码追加到共享的 bytearray，每行只保存偏移和长度；
+  加载时相同正文（兜底语录复用的历史语录）只存一份
+- 作者名驻留为作者表下标
+- 时间戳存为微秒整数，布尔字段合并为一个字节的标志位
+
+新语录由 generate_daily_quote 提交后直接写入；多进程部署时各进程还会定期
+按主键增量拉取其他进程写入的语录。
+"""
+import os
+import sys
+import asyncio
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterator, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+_NULL_TIME = -(2 ** 63)
+_FLAG_AI_GENERATED = 1
+_FLAG_FALLBACK = 2
+
+
+def _to_micros(value: Optional[datetime]) -> int:
+    if value is None:
+        return _NULL_TIME
+    return (value.replace(tzinfo=None) - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> Optional[str]:
+    if value == _NULL_TIME:
+        return None
+    return (_EPOCH + timedelta(microseconds=value)).isoformat()
+
+
+class ChannelColumns:
+    """单个频道的列存储，所有列按日期升序对齐"""
+
+    COLUMNS = (
+        "dates", "ids", "offsets", "lengths", "author_ids",
+        "flags", "attempts", "created_at", "updated_at"
+    )
+    __slots__ = COLUMNS + ("_columns",)
+
+    def __init__(self):
+        self.dates = array("i")
+        self.ids = array("I")
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.author_ids = array("I")
+        self.flags = array("B")
+        self.attempts = array("B")
+        self.created_at = array("q")
+        self.updated_at = array("q")
+        self._columns = tuple(getattr(self, name) for name in self.COLUMNS)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def columns(self) -> Tuple[array, ...]:
+        return self._columns
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self.columns())
+
+    def find(self, ordinal: int) -> int:
+        """返回日期所在行号，不存在时返回-1"""
+        index = bisect_left(self.dates, ordinal)
+        if index < len(self.dates) and self.dates[index] == ordinal:
+            return index
+        return -1
+
+    def upsert(self, ordinal: int, values: Tuple[int, ...]):
+        """写入一行，日期已存在时覆盖；通常是追加到末尾"""
+        dates = self.dates
+        if not dates or ordinal > dates[-1]:
+            for column, value in zip(self.columns(), (ordinal, *values)):
+                column.append(value)
+            return
+
+        index = bisect_left(dates, ordinal)
+        if index < len(dates) and dates[index] == ordinal:
+            for column, value in zip(self.columns()[1:], values):
+                column[index] = value
+        else:
+            for column, value in zip(self.columns(), (ordinal, *values)):
+                column.insert(index, value)
+
+
+class QuoteStore:
+    """内存列式语录存储"""
+
+    def __init__(self):
+        self.enabled = os.getenv("QUOTE_STORE", "database").lower() == "memory"
+        self.refresh_interval = float(os.getenv("QUOTE_STORE_REFRESH_SECONDS", "60"))
+        self._channels: Dict[int, ChannelColumns] = {}
+        self._buffer = bytearray()
+        self._authors: List[str] = []
+        self._author_ids: Dict[str, int] = {}
+        self._max_id = 0
+        self._loaded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """是否可以从内存提供读取"""
+        return self.enabled and self._loaded
+
+    def _intern_author(self, author: Optional[str]) -> int:
+        author = author or ""
+        author_id = self._author_ids.get(author)
+        if author_id is None:
+            author_id = self._author_ids[author] = len(self._authors)
+            self._authors.append(sys.intern(author))
+        return author_id
+
+    def _append_text(self, content: str, interned: Optional[Dict[str, Tuple[int, int]]] = None) -> Tuple[int, int]:
+        """把正文追加到共享缓冲区，返回(偏移, 长度)"""
+        if interned is not None:
+            location = interned.get(content)
+            if location is not None:
+                return location
+        encoded = content.encode("utf-8")
+        location = (len(self._buffer), len(encoded))
+        self._buffer += encoded
+        if interned is not None:
+            interned[content] = location
+        return location
+
+    def _put(self, row, interned: Optional[Dict[str, Tuple[int, int]]] = None):
+        """row 依次为 id, channel_id, date, content, author, created_at, updated_at,
+        is_ai_generated, generation_attempts, is_fallback"""
+        (quote_id, channel_id, quote_date, content, author, created_at, updated_at,
+         is_ai_generated, generation_attempts, is_fallback) = row
+        offset, length = self._append_text(content, interned)
+        flags = (_FLAG_AI_GENERATED if is_ai_generated else 0) | (_FLAG_FALLBACK if is_fallback else 0)
+        columns = self._channels.get(channel_id)
+        if columns is None:
+            columns = self._channels[channel_id] = ChannelColumns()
+        columns.upsert(quote_date.toordinal(), (
+            quote_id, offset, length, self._intern_author(author), flags,
+            min(generation_attempts or 0, 255), _to_micros(created_at), _to_micros(updated_at)
+        ))
+        if quote_id > self._max_id:
+            self._max_id = quote_id
+
+    @staticmethod
+    def _select_columns():
+        from sqlalchemy import select
+        from app.models import DailyQuote
+
+        return select(
+            DailyQuote.id, DailyQuote.channel_id, DailyQuote.date, DailyQuote.content,
+            DailyQuote.author, DailyQuote.created_at, DailyQuote.updated_at,
+            DailyQuote.is_ai_generated, DailyQuote.generation_attempts, DailyQuote.is_fallback
+        )
+
+    async def load(self):
+        """从数据库全量加载（按频道和日期顺序读取，几乎都是追加写入）"""
+        from app.models import DailyQuote
+        from app.database import AsyncReadSessionLocal
+
+        self._channels = {}
+        self._buffer = bytearray()
+        self._authors = []
+        self._author_ids = {}
+        self._max_id = 0
+        # 仅在加载期间用于正文去重
+        interned: Dict[str, Tuple[int, int]] = {}
+
+        count = 0
+        async with AsyncReadSessionLocal() as db:
+            result = await db.stream(
+                self._select_columns().order_by(DailyQuote.channel_id, DailyQuote.date)
+            )
+            async for row in result:
+                self._put(row, interned)
+                count += 1
+
+        self._loaded = True
+        usage = self.memory_usage()
+        logger.info(
+            f"内存语录存储已加载 {count} 条语录，占用 {usage['total_bytes'] / 1024 / 1024:.1f} MB，"
+            f"平均每条 {usage['bytes_per_quote']} 字节"
+        )
+
+    async def refresh(self) -> int:
+        """增量拉取其他进程写入的语录"""
+        from app.models import DailyQuote
+        from app.database import AsyncReadSessionLocal
+
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                self._select_columns().where(DailyQuote.id > self._max_id).order_by(DailyQuote.id)
+            )
+            rows = result.all()
+        for row in rows:
+            self._put(row)
+        return len(rows)
+
+    async def start(self):
+        """加载数据并启动定期增量刷新"""
+        if not self.enabled:
+            return
+        await self.load()
+        if self.refresh_interval > 0:
+            self._refresh_task = asyncio.create_task(self._refresh_loop(), name="quote-store-refresh")
+
+    async def stop(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                added = await self.refresh()
+                if added:
+                    logger.info(f"内存语录存储增量加载 {added} 条语录")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"内存语录存储刷新失败: {e}")
+
+    def add(self, quote):
+        """提交后写入一条语录（DailyQuote 对象）"""
+        if not self.ready:
+            return
+        self._put((
+            quote.id, quote.channel_id, quote.date, quote.content, quote.author,
+            quote.created_at, quote.updated_at, quote.is_ai_generated,
+            quote.generation_attempts, quote.is_fallback
+        ))
+
+    def _row(self, columns: ChannelColumns, channel_id: int, index: int) -> Dict[str, Any]:
+        """按 DailyQuote.to_dict() 的格式组装一行"""
+        offset = columns.offsets[index]
+        flags = columns.flags[index]
+        return {
+            "id": columns.ids[index],
+            "channel_id": channel_id,
+            "content": self._buffer[offset:offset + columns.lengths[index]].decode("utf-8"),
+            "author": self._authors[columns.author_ids[index]],
+            "date": date.fromordinal(columns.dates[index]).isoformat(),
+            "created_at": _from_micros(columns.created_at[index]),
+            "updated_at": _from_micros(columns.updated_at[index]),
+            "is_ai_generated": bool(flags & _FLAG_AI_GENERATED),
+            "generation_attempts": columns.attempts[index],
+            "is_fallback": bool(flags & _FLAG_FALLBACK)
+        }
+
+    def get(self, channel_id: int, target_date: date) -> Optional[Dict[str, Any]]:
+        """获取指定日期的语录"""
+        columns = self._channels.get(channel_id)
+        if columns is None:
+            return None
+        index = columns.find(target_date.toordinal())
+        return self._row(columns, channel_id, index) if index >= 0 else None
+
+    def recent(self, channel_id: int, limit: int, since: Optional[date] = None) -> List[Dict[str, Any]]:
+        """按日期倒序获取最近的语录，指定 since 时只返回该日期之后的语录"""
+        columns = self._channels.get(channel_id)
+        if columns is None:
+            return []
+        first = bisect_right(columns.dates, since.toordinal()) if since else 0
+        last = len(columns) - 1
+        return [self._row(columns, channel_id, i) for i in range(last, max(last - limit, first - 1), -1)]
+
+    def range(self, channel_id: int, start: date, end: date) -> Iterator[Tuple[date, str, str]]:
+        """按日期顺序返回区间内的 (日期, 内容, 作者)"""
+        columns = self._channels.get(channel_id)
+        if columns is None:
+            return
+        index = bisect_left(columns.dates, start.toordinal())
+        last = end.toordinal()
+        while index < len(columns) and columns.dates[index] <= last:
+            offset = columns.offsets[index]
+            yield (
+                date.fromordinal(columns.dates[index]),
+                self._buffer[offset:offset + columns.lengths[index]].decode("utf-8"),
+                self._authors[columns.author_ids[index]]
+            )
+            index += 1
+
+    def memory_usage(self) -> Dict[str, Any]:
+        """估算内存占用（列数组 + 正文缓冲区 + 作者表）"""
+        quotes = sum(len(columns) for columns in self._channels.values())
+        column_bytes = sum(columns.nbytes() for columns in self._channels.values())
+        author_bytes = sum(sys.getsizeof(author) for author in self._authors) + sys.getsizeof(self._author_ids)
+        total = column_bytes + len(self._buffer) + author_bytes
+        return {
+            "quotes": quotes,
+            "authors": len(self._authors),
+            "column_bytes": column_bytes,
+            "text_bytes": len(self._buffer),
+            "author_bytes": author_bytes,
+            "total_bytes": total,
+            "bytes_per_quote": round(total / quotes, 1) if quotes else 0
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取存储状态"""
+        status = {"enabled": self.enabled, "loaded": self._loaded}
+        if self._loaded:
+            status.update(self.memory_usage())
+        return status
+
+
+# 创建全局内存语录存储
+quote_store = QuoteStore()
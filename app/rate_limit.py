@@ -0,0 +1,366 @@
+"""
+接口限流与LLM调用预算
+
+- RateLimiter: 按“客户端 + 路由规则”维护令牌桶，进程内存储，单次检查只有一次字典查找和几次浮点运算
+- GenerationBudget: 全局LLM调用预算（每分钟 / 每天调用次数、每天token数）和并发上限，防止提供商额度被耗尽
+- CircuitBreaker: 根据最近的LLM调用结果判断提供商是否可用，供兜底语录修复等后台任务参考
+"""
+import os
+import time
+import asyncio
+import ipaddress
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Dict, Tuple, Optional, Union
+from fastapi import HTTPException, Request
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 是否信任任意来源传递的 X-Real-IP / X-Forwarded-For（只应在后端不对外暴露时使用）
+TRUST_PROXY_HEADERS = os.getenv("TRUST_PROXY_HEADERS", "False").lower() == "true"
+
+
+def _parse_networks(value: str) -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    """解析逗号分隔的IP或CIDR列表，忽略无效项"""
+    networks = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            networks.append(ipaddress.ip_network(item, strict=False))
+        except ValueError:
+            logger.warning(f"TRUSTED_PROXIES 中的地址无效，已忽略: {item}")
+    return tuple(networks)
+
+
+# 受信任的反向代理（IP或CIDR，逗号分隔）：只有来自这些地址的请求才使用代理传递的真实IP
+TRUSTED_PROXIES = _parse_networks(os.getenv("TRUSTED_PROXIES", ""))
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    __slots__ = ("capacity", "refill_rate", "tokens", "updated_at")
+
+    def __init__(self, capacity: float, refill_rate: float, now: float):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.tokens = capacity
+        self.updated_at = now
+
+    def consume(self, now: float, cost: float = 1.0) -> float:
+        """
+        尝试消费令牌
+
+        Returns:
+            0 表示允许通过，否则为需要等待的秒数
+        """
+        tokens = self.tokens + (now - self.updated_at) * self.refill_rate
+        if tokens > self.capacity:
+            tokens = self.capacity
+        self.updated_at = now
+
+        if tokens >= cost:
+            self.tokens = tokens - cost
+            return 0.0
+
+        self.tokens = tokens
+        return (cost - tokens) / self.refill_rate
+
+
+class RateLimiter:
+    """按客户端和路由规则限流"""
+
+    def __init__(self, max_buckets: int = 100_000):
+        # 规则名 -> (桶容量, 每秒补充令牌数)
+        self.rules: Dict[str, Tuple[float, float]] = {}
+        self.max_buckets = max_buckets
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.rejected = 0
+
+    def add_rule(self, name: str, per_minute: float, burst: float):
+        """添加限流规则，per_minute 为0表示不限制"""
+        if per_minute <= 0:
+            self.rules.pop(name, None)
+            return
+        self.rules[name] = (max(burst, 1.0), per_minute / 60.0)
+
+    def check(self, client: str, rule: str) -> float:
+        """
+        检查客户端是否允许访问
+
+        Returns:
+            0 表示允许，否则为建议的重试等待秒数
+        """
+        config = self.rules.get(rule)
+        if config is None:
+            return 0.0
+
+        now = time.monotonic()
+        key = (client, rule)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._evict_idle(now)
+            bucket = self._buckets[key] = TokenBucket(config[0], config[1], now)
+
+        retry_after = bucket.consume(now)
+        if retry_after:
+            self.rejected += 1
+        return retry_after
+
+    def _evict_idle(self, now: float):
+        """清理已经回满的桶（长时间未访问的客户端）"""
+        idle = [
+            key for key, bucket in self._buckets.items()
+            if bucket.tokens + (now - bucket.updated_at) * bucket.refill_rate >= bucket.capacity
+        ]
+        for key in idle:
+            del self._buckets[key]
+        # 仍然超限时清空，避免内存无限增长
+        if len(self._buckets) >= self.max_buckets:
+            self._buckets.clear()
+
+    def get_status(self) -> Dict:
+        """获取限流器状态"""
+        return {
+            "rules": {
+                name: {"burst": capacity, "per_minute": round(rate * 60, 2)}
+                for name, (capacity, rate) in self.rules.items()
+            },
+            "active_buckets": len(self._buckets),
+            "rejected": self.rejected
+        }
+
+
+class LLMBudgetExceededError(RuntimeError):
+    """LLM调用预算已用尽"""
+
+
+class GenerationBudget:
+    """全局LLM调用预算"""
+
+    def __init__(self, per_minute: int, per_day: int, max_concurrency: int, tokens_per_day: int = 0):
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_concurrency = max_concurrency
+        self.tokens_per_day = tokens_per_day
+        self._minute_bucket = TokenBucket(per_minute, per_minute / 60.0, time.monotonic()) if per_minute > 0 else None
+        self._day = date.today()
+        self._day_count = 0
+        self._day_tokens = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+    def _roll_day(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._day_count = 0
+            self._day_tokens = 0
+
+    def remaining_today(self) -> int:
+        """今日剩余调用次数，-1 表示不限制"""
+        if self.per_day <= 0:
+            return -1
+        self._roll_day()
+        return max(self.per_day - self._day_count, 0)
+
+    def remaining_tokens_today(self) -> int:
+        """今日剩余token数，-1 表示不限制"""
+        if self.tokens_per_day <= 0:
+            return -1
+        self._roll_day()
+        return max(self.tokens_per_day - self._day_tokens, 0)
+
+    def record_tokens(self, tokens: int):
+        """记录一次调用消耗的token数（由用量账本调用）"""
+        self._roll_day()
+        self._day_tokens += tokens
+
+    def seed_today(self, calls: int, tokens: int):
+        """用账本中今日已有的用量初始化计数，进程重启后预算不会被重置"""
+        self._roll_day()
+        self._day_count = max(self._day_count, calls)
+        self._day_tokens = max(self._day_tokens, tokens)
+
+    def has_capacity(self) -> bool:
+        """是否还有可用预算（不消费）"""
+        if self.remaining_today() == 0 or self.remaining_tokens_today() == 0:
+            return False
+        if self._minute_bucket is not None:
+            bucket = self._minute_bucket
+            now = time.monotonic()
+            tokens = min(bucket.capacity, bucket.tokens + (now - bucket.updated_at) * bucket.refill_rate)
+            return tokens >= 1
+        return True
+
+    def acquire(self):
+        """消费一次调用预算，预算不足时抛出 LLMBudgetExceededError"""
+        if self.remaining_today() == 0:
+            raise LLMBudgetExceededError(f"今日LLM调用次数已达上限 {self.per_day}")
+        if self.remaining_tokens_today() == 0:
+            raise LLMBudgetExceededError(f"今日LLM token用量已达上限 {self.tokens_per_day}")
+        if self._minute_bucket is not None and self._minute_bucket.consume(time.monotonic()):
+            raise LLMBudgetExceededError(f"每分钟LLM调用次数已达上限 {self.per_minute}")
+        self._day_count += 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一次调用预算和一个并发名额"""
+        self.acquire()
+        if self._semaphore is None:
+            yield
+            return
+        async with self._semaphore:
+            yield
+
+    def get_status(self) -> Dict:
+        """获取预算状态"""
+        return {
+            "per_minute": self.per_minute,
+            "per_day": self.per_day,
+            "used_today": self._day_count,
+            "remaining_today": self.remaining_today(),
+            "tokens_per_day": self.tokens_per_day,
+            "tokens_today": self._day_tokens,
+            "remaining_tokens_today": self.remaining_tokens_today(),
+            "max_concurrency": self.max_concurrency
+        }
+
+
+class CircuitBreaker:
+    """
+    LLM提供商熔断状态
+
+    连续 failure_threshold 次调用失败（网络错误、超时、服务端错误）后打开，
+    reset_seconds 秒后进入半开状态，允许一次试探调用：成功则关闭，失败则重新打开。
+    模型输出不合格说明服务可用，按成功计。
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_seconds:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allows_background_work(self) -> bool:
+        """后台任务是否可以调用LLM（关闭或半开时允许，半开时的调用即为试探）"""
+        return self.state != self.OPEN
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("LLM调用恢复，熔断关闭")
+        self._failures = 0
+        self._opened_at = None
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN or (self._opened_at is None and self._failures >= self.failure_threshold):
+            if self._opened_at is None:
+                self.trips += 1
+                logger.warning(f"LLM连续 {self._failures} 次调用失败，熔断打开 {self.reset_seconds:.0f} 秒")
+            self._opened_at = time.monotonic()
+
+    def get_status(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_seconds": self.reset_seconds,
+            "trips": self.trips
+        }
+
+
+def _is_trusted_proxy(host: Optional[str]) -> bool:
+    """连接来源是否为受信任的反向代理"""
+    if TRUST_PROXY_HEADERS:
+        return True
+    if not host or not TRUSTED_PROXIES:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in TRUSTED_PROXIES)
+
+
+def _client_id(request: Request) -> str:
+    """获取客户端标识：通过API密钥认证的请求按租户计数，否则按IP；
+    请求来自受信任的反向代理时使用代理传递的真实IP"""
+    tenant = getattr(request.state, "api_tenant", None)
+    if tenant:
+        return f"tenant:{tenant}"
+    host = request.client.host if request.client else None
+    if _is_trusted_proxy(host):
+        real_ip = request.headers.get("x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            # 从右向左跳过受信任的代理，第一个不受信任的地址即为客户端（左侧的值可由客户端伪造）
+            hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+            for hop in reversed(hops):
+                if not _is_trusted_proxy(hop):
+                    return hop
+            if hops:
+                return hops[0]
+    return host or "unknown"
+
+
+def rate_limit(rule: str):
+    """生成FastAPI依赖：超出限制时返回429"""
+    async def dependency(request: Request):
+        retry_after = rate_limiter.check(_client_id(request), rule)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="请求过于频繁，请稍后重试",
+                headers={"Retry-After": str(int(retry_after) + 1)}
+            )
+    return dependency
+
+
+# 创建全局限流器
+rate_limiter = RateLimiter()
+rate_limiter.add_rule(
+    "read",
+    per_minute=float(os.getenv("RATE_LIMIT_READ_PER_MINUTE", "120")),
+    burst=float(os.getenv("RATE_LIMIT_READ_BURST", "30"))
+)
+rate_limiter.add_rule(
+    "generate",
+    per_minute=float(os.getenv("RATE_LIMIT_GENERATE_PER_MINUTE", "2")),
+    burst=float(os.getenv("RATE_LIMIT_GENERATE_BURST", "2"))
+)
+
+# 创建全局LLM调用预算
+llm_budget = GenerationBudget(
+    per_minute=int(os.getenv("LLM_CALLS_PER_MINUTE", "10")),
+    per_day=int(os.getenv("LLM_CALLS_PER_DAY", "200")),
+    max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "4")),
+    tokens_per_day=int(os.getenv("LLM_TOKENS_PER_DAY", "0"))
+)
+
+# 创建全局LLM熔断状态
+llm_circuit = CircuitBreaker(
+    failure_threshold=int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "5")),
+    reset_seconds=float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "300"))
+)
+
+limit_reads = rate_limit("read")
+limit_generation = rate_limit("generate")
@@ -0,0 +1,353 @@
+"""
+相似语录索引
+
+GET /api/quote/{date}/related 返回与指定语录最相似的历史语录，完全在本地计算：
+
+- 每条语录的正文（normalize_text 后）按字符一元组和二元组做特征哈希，
+  得到 RELATED_DIM 维的带符号向量并做L2归一化，不依赖任何外部模型
+- 所有向量存放在 RELATED_INDEX_DIR 下的 float32 矩阵文件中，以 numpy.memmap 映射，
+  同机多个进程共享操作系统页缓存，不会各自复制一份
+- 一次查询只做一次矩阵-向量乘法得到全部余弦相似度，再用 argpartition 取前k个
+- 负责生成的进程（worker / all）是唯一的写入者：启动时补齐数据库中尚未索引的语录，
+  之后每条语录提交时追加或覆盖对应的一行；只读进程在文件头变化后重新映射
+
+文件：
+    vectors.f32  容量 × RELATED_DIM 的向量矩阵
+    rows.i64     容量 × 3 的 (语录ID, 频道ID, 日期序数)
+    index.json   维度、已用行数等元信息，最后写入（先写临时文件再改名）
+"""
+import os
+import json
+import time
+import zlib
+import asyncio
+from datetime import date
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+import numpy as np
+from app.validation import normalize_text
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# 一元组的权重低于二元组，避免常用字主导相似度
+UNIGRAM_WEIGHT = 0.5
+# 启动补齐时每批处理的语录数
+CATCH_UP_BATCH = 2000
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    """字符n-gram特征哈希向量（L2归一化）"""
+    text = normalize_text(text)
+    vector = np.zeros(dim, dtype=np.float32)
+    grams = [(char, UNIGRAM_WEIGHT) for char in text]
+    grams.extend((text[i:i + 2], 1.0) for i in range(len(text) - 1))
+    for gram, weight in grams:
+        # crc32 在各进程中结果一致（内置hash会随进程随机化）
+        value = zlib.crc32(gram.encode("utf-8"))
+        vector[value % dim] += weight if value & 0x80000000 else -weight
+    norm = float(np.linalg.norm(vector))
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class RelatedIndex:
+    """基于内存映射矩阵的相似语录索引"""
+
+    def __init__(self):
+        self.directory = Path(os.getenv("RELATED_INDEX_DIR", "./related_index"))
+        self.dim = int(os.getenv("RELATED_DIM", "128"))
+        self.check_interval = float(os.getenv("RELATED_INDEX_CHECK_SECONDS", "5"))
+
+        self.writable = False
+        self._vectors: Optional[np.memmap] = None
+        self._rows: Optional[np.memmap] = None
+        self._capacity = 0
+        self._count = 0
+        self._max_id = 0
+        # 语录ID -> 行号（只有写入进程需要）
+        self._positions: Dict[int, int] = {}
+        # 频道和日期列的连续副本（过滤时比按行跨步读取快得多），索引变化后重新生成
+        self._filter_columns: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+        self._header_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._catch_up_task: Optional[asyncio.Task] = None
+        self._ready = False
+
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.added = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def _header_path(self) -> Path:
+        return self.directory / "index.json"
+
+    def _read_header(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._header_path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if header.get("version") != INDEX_VERSION or header.get("dim") != self.dim:
+            return None
+        return header
+
+    def _write_header(self):
+        """刷新映射并原子替换文件头，读进程据此看到新行"""
+        self._vectors.flush()
+        self._rows.flush()
+        temp = self.directory / f".index.json.{os.getpid()}.tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "dim": self.dim,
+                "count": self._count,
+                "max_id": self._max_id
+            }, f)
+        os.replace(temp, self._header_path)
+
+    def _map(self, capacity: int, mode: str):
+        self._vectors = np.memmap(self.directory / "vectors.f32", dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._rows = np.memmap(self.directory / "rows.i64", dtype=np.int64, mode=mode, shape=(capacity, 3))
+        self._capacity = capacity
+
+    def _file_capacity(self) -> int:
+        try:
+            return os.path.getsize(self.directory / "rows.i64") // (3 * 8)
+        except OSError:
+            return 0
+
+    def _resize(self, capacity: int):
+        """扩大文件（已有数据保持不变）并重新映射"""
+        self._vectors = self._rows = None
+        for name, row_bytes in (("vectors.f32", self.dim * 4), ("rows.i64", 3 * 8)):
+            with open(self.directory / name, "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self._map(capacity, "r+")
+
+    def _open_writer(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        header = self._read_header()
+        capacity = self._file_capacity()
+        if header is None or header["count"] > capacity:
+            # 首次建立或维度变化：从头重建
+            self._count = self._max_id = 0
+            self._resize(1024)
+            self._write_header()
+            return
+        self._count = header["count"]
+        self._max_id = header["max_id"]
+        self._map(capacity, "r+")
+        self._positions = {int(quote_id): row for row, quote_id in enumerate(self._rows[:self._count, 0])}
+
+    def _put(self, quote_id: int, channel_id: int, ordinal: int, vector: np.ndarray):
+        row = self._positions.get(quote_id)
+        if row is None:
+            if self._count >= self._capacity:
+                self._resize(self._capacity * 2)
+            row = self._count
+            self._count += 1
+            self._positions[quote_id] = row
+        self._vectors[row] = vector
+        self._rows[row] = (quote_id, channel_id, ordinal)
+        self._filter_columns = None
+        self._max_id = max(self._max_id, quote_id)
+
+    def update(self, quote):
+        """语录提交后调用（DailyQuote 对象）：写入进程更新对应的行，只读进程稍后重新映射"""
+        if not self.writable:
+            self._checked_at = 0.0
+            return
+        if self._vectors is None:
+            return
+        self._put(quote.id, quote.channel_id, quote.date.toordinal(), vectorize(quote.content, self.dim))
+        self._write_header()
+        self.added += 1
+
+    async def _catch_up(self):
+        """补齐数据库中尚未索引的语录（向量计算在线程中执行）"""
+        from sqlalchemy import select, func
+        from app.models import DailyQuote
+        from app.database import AsyncReadSessionLocal
+
+        async with AsyncReadSessionLocal() as db:
+            max_id = await db.scalar(select(func.max(DailyQuote.id))) or 0
+            if self._max_id > max_id:
+                # 数据库被替换过，索引中的ID已经对不上
+                logger.warning("相似语录索引与数据库不一致，重新建立")
+                self._count = self._max_id = 0
+                self._positions = {}
+
+            # 补齐期间提交的新语录会直接写入并推高 _max_id，这里使用独立的游标
+            cursor = self._max_id
+            total = 0
+            while True:
+                result = await db.execute(
+                    select(DailyQuote.id, DailyQuote.channel_id, DailyQuote.date, DailyQuote.content)
+                    .where(DailyQuote.id > cursor)
+                    .order_by(DailyQuote.id)
+                    .limit(CATCH_UP_BATCH)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                vectors = await asyncio.to_thread(
+                    lambda: [vectorize(row.content, self.dim) for row in rows]
+                )
+                for row, vector in zip(rows, vectors):
+                    self._put(row.id, row.channel_id, row.date.toordinal(), vector)
+                self._write_header()
+                cursor = rows[-1].id
+                total += len(rows)
+
+        self._ready = True
+        logger.info(f"相似语录索引就绪，共 {self._count} 条，本次补齐 {total} 条")
+
+    def _refresh_reader(self):
+        """文件头变化后重新读取行数，文件扩大后重新映射"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        try:
+            mtime = self._header_path.stat().st_mtime
+        except OSError:
+            return
+        if mtime == self._header_mtime:
+            return
+        header = self._read_header()
+        if header is None:
+            return
+        capacity = self._file_capacity()
+        if header["count"] > capacity:
+            return
+        if self._vectors is None or capacity != self._capacity:
+            self._map(capacity, "r")
+        self._count = header["count"]
+        self._max_id = header["max_id"]
+        self._filter_columns = None
+        self._header_mtime = mtime
+        self._ready = True
+
+    def query(
+        self,
+        channel_id: int,
+        content: str,
+        exclude_id: Optional[int] = None,
+        until: Optional[date] = None,
+        limit: int = 5
+    ) -> List[Tuple[int, date, float]]:
+        """
+        查找同一频道内最相似的语录
+
+        Args:
+            until: 只返回该日期（含）之前的语录，避免提前暴露已生成的未来语录
+
+        Returns:
+            [(语录ID, 日期, 相似度)]，按相似度降序
+        """
+        if not self.writable:
+            self._refresh_reader()
+        if not self._ready or self._count == 0:
+            return []
+
+        started = time.perf_counter()
+        count = self._count
+        scores = self._vectors[:count] @ vectorize(content, self.dim)
+        until_ordinal = until.toordinal() if until is not None else None
+
+        # 通常只需检查相似度最高的一小批；同频道的语录较少时再对全部行按频道和日期过滤
+        pool = min(count, limit * 8)
+        matches = self._collect(scores, np.argpartition(scores, count - pool)[count - pool:],
+                                channel_id, exclude_id, until_ordinal, limit)
+        if len(matches) < limit and pool < count:
+            ids, channels, ordinals = self._columns(count)
+            allowed = channels == channel_id
+            if exclude_id is not None:
+                allowed &= ids != exclude_id
+            if until_ordinal is not None:
+                allowed &= ordinals <= until_ordinal
+            candidates = np.flatnonzero(allowed)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(scores[candidates], len(candidates) - limit)[-limit:]]
+            matches = self._collect(scores, candidates, channel_id, exclude_id, until_ordinal, limit)
+
+        self.queries += 1
+        self.query_seconds += time.perf_counter() - started
+        return matches
+
+    def _columns(self, count: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._filter_columns is None or len(self._filter_columns[0]) != count:
+            rows = self._rows[:count]
+            self._filter_columns = (
+                np.ascontiguousarray(rows[:, 0]),
+                rows[:, 1].astype(np.int32),
+                rows[:, 2].astype(np.int32)
+            )
+        return self._filter_columns
+
+    def _collect(self, scores: np.ndarray, candidates: np.ndarray, channel_id: int,
+                 exclude_id: Optional[int], until_ordinal: Optional[int], limit: int) -> List[Tuple[int, date, float]]:
+        """按相似度降序检查候选行，返回符合条件的前 limit 条"""
+        matches = []
+        for i in candidates[np.argsort(scores[candidates])[::-1]]:
+            quote_id, quote_channel, ordinal = (int(value) for value in self._rows[i])
+            if quote_channel != channel_id or quote_id == exclude_id:
+                continue
+            if until_ordinal is not None and ordinal > until_ordinal:
+                continue
+            matches.append((quote_id, date.fromordinal(ordinal), round(float(scores[i]), 4)))
+            if len(matches) == limit:
+                break
+        return matches
+
+    async def start(self, writable: bool):
+        """写入进程打开（或建立）索引并在后台补齐，只读进程映射已有的文件"""
+        self.writable = writable
+        if not writable:
+            self._refresh_reader()
+            return
+        self._open_writer()
+        self._catch_up_task = asyncio.create_task(self._run_catch_up(), name="related-index-catch-up")
+
+    async def _run_catch_up(self):
+        try:
+            await self._catch_up()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"建立相似语录索引失败: {e}")
+
+    async def stop(self):
+        if self._catch_up_task is not None:
+            self._catch_up_task.cancel()
+            await asyncio.gather(self._catch_up_task, return_exceptions=True)
+            self._catch_up_task = None
+        if self.writable and self._vectors is not None:
+            self._write_header()
+        self._vectors = self._rows = None
+        self._ready = False
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "directory": str(self.directory),
+            "writable": self.writable,
+            "ready": self._ready,
+            "dim": self.dim,
+            "count": self._count,
+            "capacity": self._capacity,
+            "matrix_bytes": self._capacity * self.dim * 4,
+            "queries": self.queries,
+            "avg_query_ms": round(self.query_seconds / self.queries * 1000, 3) if self.queries else 0,
+            "added": self.added
+        }
+
+
+# 创建全局相似语录索引
+related_index = RelatedIndex()
@@ -0,0 +1,124 @@
+"""
+兜底语录修复
+
+LLM不可用时 _use_fallback_quote 会为目标日期写入一条历史语录（is_fallback=True）。
+对于尚未发布的日期（今天之后，通常是23:00预生成的次日语录），提供商恢复后由定时任务
+重新生成并替换：
+
+- 每 FALLBACK_REPAIR_INTERVAL_MINUTES 分钟执行一次，通过 (is_fallback, date) 索引查找今天之后的兜底语录
+- LLM熔断打开时跳过本轮；每轮最多处理 FALLBACK_REPAIR_BATCH 条，两条之间间隔
+  FALLBACK_REPAIR_DELAY_SECONDS 秒，全局LLM预算不足时提前结束
+- 替换是一条带条件的 UPDATE（仍为兜底语录且日期未到），不会覆盖并发写入的新内容
+- 替换后刷新各进程的缓存（cache_events），并重新绘制分享卡片
+- 今天及以前的日期已经对外展示过，保持不变
+"""
+import os
+import asyncio
+from datetime import date, datetime
+from typing import Optional, Dict, Any, List
+from sqlalchemy import select
+from app.ai_service import ai_service
+from app.channels import channel_registry
+from app.database import AsyncReadSessionLocal
+from app.models import DailyQuote
+from app.notifications import notifier
+from app.rate_limit import llm_budget, llm_circuit
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FallbackRepairer:
+    """未来日期兜底语录的后台修复"""
+
+    def __init__(self):
+        self.interval_minutes = float(os.getenv("FALLBACK_REPAIR_INTERVAL_MINUTES", "30"))
+        self.batch_size = int(os.getenv("FALLBACK_REPAIR_BATCH", "5"))
+        self.delay_seconds = float(os.getenv("FALLBACK_REPAIR_DELAY_SECONDS", "10"))
+
+        self._lock = asyncio.Lock()
+        self.runs = 0
+        self.repaired = 0
+        self.failed = 0
+        self.skipped_runs = 0
+        self.last_run: Optional[str] = None
+        self.last_pending = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_minutes > 0
+
+    async def pending(self, limit: int) -> List[int]:
+        """今天之后仍为兜底语录的ID（按日期升序）"""
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                select(DailyQuote.id)
+                .where(DailyQuote.is_fallback == True, DailyQuote.date > date.today())  # noqa: E712 走 (is_fallback, date) 索引
+                .order_by(DailyQuote.date)
+                .limit(limit)
+            )
+            return list(result.scalars().all())
+
+    async def run(self) -> int:
+        """
+        执行一轮修复
+
+        Returns:
+            本轮替换成功的条数
+        """
+        if self._lock.locked():
+            return 0
+        async with self._lock:
+            self.runs += 1
+            self.last_run = datetime.now().isoformat()
+            if not llm_circuit.allows_background_work():
+                self.skipped_runs += 1
+                logger.info("LLM熔断打开，跳过本轮兜底语录修复")
+                return 0
+
+            quote_ids = await self.pending(self.batch_size)
+            self.last_pending = len(quote_ids)
+            repaired = 0
+            for index, quote_id in enumerate(quote_ids):
+                if index:
+                    await asyncio.sleep(self.delay_seconds)
+                if not llm_circuit.allows_background_work() or not llm_budget.has_capacity():
+                    logger.info("LLM熔断打开或调用预算不足，提前结束本轮兜底语录修复")
+                    break
+
+                result = await ai_service.replace_fallback_quote(quote_id)
+                if not result["success"]:
+                    self.failed += 1
+                    logger.warning(f"修复兜底语录 {quote_id} 失败: {result['message']}")
+                    continue
+
+                repaired += 1
+                self.repaired += 1
+                quote = result["quote"]
+                channel = channel_registry.get_by_id(quote["channel_id"])
+                notifier.notify("generation.repaired", {
+                    "channel": channel.slug if channel else quote["channel_id"],
+                    "date": quote["date"],
+                    "content": quote["content"]
+                })
+
+            if quote_ids:
+                logger.info(f"兜底语录修复完成：待修复 {len(quote_ids)} 条，成功 {repaired} 条")
+            return repaired
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "interval_minutes": self.interval_minutes,
+            "batch_size": self.batch_size,
+            "runs": self.runs,
+            "skipped_runs": self.skipped_runs,
+            "repaired": self.repaired,
+            "failed": self.failed,
+            "last_run": self.last_run,
+            "last_pending": self.last_pending
+        }
+
+
+# 创建全局兜底语录修复器
+fallback_repairer = FallbackRepairer()
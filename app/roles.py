@@ -0,0 +1,30 @@
+"""
+进程角色
+
+通过环境变量 APP_ROLE 或命令行参数 --role 选择：
+- api: 只提供读接口，不启动定时生成和任务工作协程，也不创建OpenAI客户端；
+  缺失的语录以任务形式写入队列，由 worker 进程生成
+- worker: 运行定时任务和生成任务工作协程
+- all: 以上全部（默认，适合单进程部署）
+
+可以运行多个 api 进程，配合一个 worker 进程。
+"""
+import os
+
+ROLE_API = "api"
+ROLE_WORKER = "worker"
+ROLE_ALL = "all"
+ROLES = (ROLE_API, ROLE_WORKER, ROLE_ALL)
+
+
+def get_role() -> str:
+    """当前进程角色（每次读取环境变量，命令行参数可以在启动前覆盖）"""
+    role = os.getenv("APP_ROLE", ROLE_ALL).strip().lower()
+    if role not in ROLES:
+        raise ValueError(f"APP_ROLE 必须是 {'/'.join(ROLES)} 之一，当前为 {role}")
+    return role
+
+
+def runs_generation() -> bool:
+    """当前进程是否负责生成语录（定时任务和任务工作协程）"""
+    return get_role() in (ROLE_WORKER, ROLE_ALL)
@@ -0,0 +1,205 @@
+"""
+零点切换协调
+
+零点时所有客户端同时刷新，如果当天的语录还没有被读取到内存，会集中冲击数据库，
+甚至在语录缺失时同时触发生成。这里在零点前把 generate_next_day_quote 已经生成的
+次日语录预先读入每个工作进程的内存：
+
+- 预热：每天零点前 ROLLOVER_PREWARM_MINUTES 分钟读取各频道次日语录，零点后的今日语录直接从内存返回
+- 零点：检查各频道今日语录，缺失时通过任务队列生成（多进程之间由幂等键去重）
+- 长轮询：客户端可以提前挂起请求，新一天的语录就绪后按随机抖动分批返回
+"""
+import os
+import random
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RolloverCoordinator:
+    """零点切换协调器"""
+
+    def __init__(self):
+        # 零点前多少分钟预热次日语录（1 ~ 1439）
+        self.prewarm_minutes = min(max(int(os.getenv("ROLLOVER_PREWARM_MINUTES", "5")), 1), 24 * 60 - 1)
+        # 长轮询客户端释放时的最大随机延迟
+        self.jitter_seconds = float(os.getenv("ROLLOVER_JITTER_SECONDS", "10"))
+        # 长轮询最长挂起秒数
+        self.max_wait_seconds = float(os.getenv("ROLLOVER_MAX_WAIT_SECONDS", "900"))
+        # 等待期间检查数据库的间隔（其他进程生成的语录）
+        self.poll_interval = float(os.getenv("ROLLOVER_POLL_INTERVAL", "5"))
+
+        self._warm: Dict[Tuple[int, date], Dict[str, Any]] = {}
+        self._ready: Dict[Tuple[int, date], asyncio.Event] = {}
+        # 每个日期正在等待的客户端数，没有客户端等待时清理对应的事件
+        self._waiters: Dict[Tuple[int, date], int] = {}
+        self.waiting = 0
+        self.released = 0
+        self.last_prewarm: Optional[str] = None
+
+    @property
+    def prewarm_time(self) -> Tuple[int, int]:
+        """每天预热的时刻 (小时, 分钟)，调度任务和状态接口共用"""
+        minute_of_day = 24 * 60 - self.prewarm_minutes
+        return divmod(minute_of_day, 60)
+
+    def get(self, channel_id: int, target_date: date) -> Optional[Dict[str, Any]]:
+        """获取已预热的语录"""
+        return self._warm.get((channel_id, target_date))
+
+    def publish(self, quote: Dict[str, Any]):
+        """语录就绪：唤醒等待该日期的客户端，昨天到明天的语录同时写入内存"""
+        key = (quote["channel_id"], date.fromisoformat(quote["date"]))
+        if abs((key[1] - date.today()).days) <= 1:
+            self._warm[key] = quote
+        event = self._ready.pop(key, None)
+        if event is not None:
+            event.set()
+
+    async def _load(self, channel_id: int, target_date: date) -> Optional[Dict[str, Any]]:
+        """从内存存储或数据库读取语录（不会触发生成）"""
+        from sqlalchemy import select
+        from app.models import DailyQuote
+        from app.database import AsyncReadSessionLocal
+        from app.quote_store import quote_store
+
+        if quote_store.ready:
+            return quote_store.get(channel_id, target_date)
+
+        async with AsyncReadSessionLocal() as db:
+            result = await db.execute(
+                select(DailyQuote).where(
+                    DailyQuote.channel_id == channel_id,
+                    DailyQuote.date == target_date
+                )
+            )
+            quote = result.scalar_one_or_none()
+            return quote.to_dict() if quote else None
+
+    async def prewarm(self, target_date: Optional[date] = None) -> int:
+        """
+        把各频道指定日期（默认次日）的语录读入内存
+
+        Returns:
+            预热成功的频道数
+        """
+        from app.channels import channel_registry
+
+        target_date = target_date or date.today() + timedelta(days=1)
+        warmed = 0
+        for channel in await channel_registry.all():
+            quote = await self._load(channel.id, target_date)
+            if quote:
+                self.publish(quote)
+                warmed += 1
+            else:
+                logger.warning(f"频道 {channel.slug} {target_date} 的语录尚未生成，零点时将补生成")
+
+        self._evict(date.today() - timedelta(days=1))
+        self.last_prewarm = datetime.now().isoformat()
+        logger.info(f"已预热 {warmed} 个频道 {target_date} 的语录")
+        return warmed
+
+    async def on_midnight(self):
+        """零点：确保各频道今日语录已就绪"""
+        from app.channels import channel_registry
+        from app.ai_service import ai_service
+
+        today = date.today()
+        for channel in await channel_registry.all():
+            if self.get(channel.id, today) is not None:
+                continue
+            try:
+                quote = await ai_service.get_today_quote(channel.slug)
+                if quote:
+                    self.publish(quote)
+            except Exception as e:
+                logger.error(f"频道 {channel.slug} 零点补生成今日语录失败: {e}")
+        self._evict(today - timedelta(days=1))
+
+    def _evict(self, before: date):
+        """清理早于指定日期的预热数据"""
+        for key in [key for key in self._warm if key[1] < before]:
+            del self._warm[key]
+
+    @staticmethod
+    def seconds_until(target_date: date) -> float:
+        """距离目标日期零点的秒数，已经到达时为负数"""
+        return (datetime.combine(target_date, datetime.min.time()) - datetime.now()).total_seconds()
+
+    async def wait_for(self, channel_id: int, target_date: date, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待指定日期的语录就绪
+
+        只有今天和明天的语录需要等待：明天的语录先等到零点；语录就绪后再随机延迟一段时间返回，
+        避免挂起的客户端在同一时刻被同时释放。零点在超时之后时挂起到超时再返回，
+        避免客户端收到204后立即重试形成空转。更早的日期只查询一次，更晚的日期直接返回None。
+
+        Returns:
+            语录字典，超时或日期不在等待范围内时返回None
+        """
+        today = date.today()
+        key = (channel_id, target_date)
+        if target_date < today:
+            return self._warm.get(key) or await self._load(channel_id, target_date)
+        if target_date > today + timedelta(days=1):
+            return None
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(max(timeout, 0), self.max_wait_seconds)
+
+        self.waiting += 1
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            # 等到目标日期的零点
+            seconds_to_day = self.seconds_until(target_date)
+            if seconds_to_day > 0:
+                remaining = max(deadline - loop.time(), 0)
+                await asyncio.sleep(min(seconds_to_day, remaining))
+                if seconds_to_day > remaining:
+                    # 超时前等不到零点
+                    return None
+
+            while True:
+                quote = self._warm.get(key) or await self._load(channel_id, target_date)
+                if quote is not None:
+                    break
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None
+                event = self._ready.setdefault(key, asyncio.Event())
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(self.poll_interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+
+            # 分散释放
+            jitter = random.uniform(0, self.jitter_seconds)
+            await asyncio.sleep(min(jitter, max(deadline - loop.time(), 0)))
+        finally:
+            self.waiting -= 1
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                self._ready.pop(key, None)
+
+        self.released += 1
+        return quote
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取协调器状态"""
+        return {
+            "prewarm_time": "{:02d}:{:02d}".format(*self.prewarm_time),
+            "last_prewarm": self.last_prewarm,
+            "warm_quotes": sorted(f"{channel_id}:{day.isoformat()}" for channel_id, day in self._warm),
+            "waiting_clients": self.waiting,
+            "released_clients": self.released,
+            "jitter_seconds": self.jitter_seconds
+        }
+
+
+# 创建全局零点切换协调器
+rollover = RolloverCoordinator()
@@ -2,11 +2,21 @@
 定时任务调度器
 """
 import os
+import asyncio
 from datetime import datetime, date, timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from app.ai_service import ai_service
+from app.channels import channel_registry
 from app.database import create_tables_async
+from app.models import DEFAULT_CHANNEL_SLUG
+from app.notifications import notifier
+from app.rollover import rollover
+from app.repair import fallback_repairer
+from app.backup import database_backup
+from app.llm_http import llm_http
+from app.roles import get_role, runs_generation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,6 +32,10 @@ class QuoteScheduler:
         # 从环境变量获取定时任务配置
         self.generation_hour = int(os.getenv("QUOTE_GENERATION_HOUR", "23"))
         self.generation_minute = int(os.getenv("QUOTE_GENERATION_MINUTE", "0"))
+        # 同时生成的频道数上限
+        self.generation_concurrency = int(os.getenv("QUOTE_GENERATION_CONCURRENCY", "4"))
+        # 定时任务等待生成任务完成的最长秒数
+        self.job_wait_timeout = float(os.getenv("SCHEDULER_JOB_WAIT_TIMEOUT", "1800"))
     
     async def start(self):
         """启动调度器"""
@@ -33,29 +47,83 @@ class QuoteScheduler:
             # 确保数据库表已创建
             await create_tables_async()
             
-            # 添加定时任务：每日23:00生成下一日语录
+            if runs_generation():
+                # 添加定时任务：每日23:00生成下一日语录
+                self.scheduler.add_job(
+                    self.generate_next_day_quote,
+                    CronTrigger(hour=self.generation_hour, minute=self.generation_minute),
+                    id="daily_quote_generation",
+                    name="每日语录生成任务",
+                    replace_existing=True
+                )
+                
+                # 生成前预先建立到LLM接口的连接
+                if llm_http.prewarm_minutes > 0:
+                    prewarm_at = datetime.now().replace(
+                        hour=self.generation_hour, minute=self.generation_minute
+                    ) - timedelta(minutes=llm_http.prewarm_minutes)
+                    self.scheduler.add_job(
+                        llm_http.prewarm,
+                        CronTrigger(hour=prewarm_at.hour, minute=prewarm_at.minute),
+                        id="llm_connection_prewarm",
+                        name="预热LLM连接",
+                        replace_existing=True
+                    )
+                
+                # 添加启动时的初始化任务
+                self.scheduler.add_job(
+                    self.initialize_today_quote,
+                    "date",
+                    run_date=datetime.now(),
+                    id="initialize_today_quote",
+                    name="初始化今日语录"
+                )
+                
+                # 定期用新生成的语录替换未来日期的兜底语录
+                if fallback_repairer.enabled:
+                    self.scheduler.add_job(
+                        fallback_repairer.run,
+                        IntervalTrigger(minutes=fallback_repairer.interval_minutes),
+                        id="fallback_repair",
+                        name="兜底语录修复",
+                        replace_existing=True
+                    )
+                
+                # 每日在线备份SQLite数据库
+                if database_backup.enabled:
+                    self.scheduler.add_job(
+                        database_backup.run,
+                        CronTrigger(hour=database_backup.hour, minute=database_backup.minute),
+                        id="database_backup",
+                        name="数据库备份",
+                        replace_existing=True
+                    )
+            
+            # 零点前把次日语录预热到内存，零点时检查今日语录（只读任务，api 进程也需要）
+            prewarm_hour, prewarm_minute = rollover.prewarm_time
             self.scheduler.add_job(
-                self.generate_next_day_quote,
-                CronTrigger(hour=self.generation_hour, minute=self.generation_minute),
-                id="daily_quote_generation",
-                name="每日语录生成任务",
+                rollover.prewarm,
+                CronTrigger(hour=prewarm_hour, minute=prewarm_minute),
+                id="rollover_prewarm",
+                name="预热次日语录",
                 replace_existing=True
             )
-            
-            # 添加启动时的初始化任务
             self.scheduler.add_job(
-                self.initialize_today_quote,
-                "date",
-                run_date=datetime.now(),
-                id="initialize_today_quote",
-                name="初始化今日语录"
+                rollover.on_midnight,
+                CronTrigger(hour=0, minute=0),
+                id="rollover_midnight",
+                name="零点切换今日语录",
+                replace_existing=True
             )
             
             # 启动调度器
             self.scheduler.start()
             self.is_running = True
             
-            logger.info(f"定时任务调度器已启动，每日 {self.generation_hour:02d}:{self.generation_minute:02d} 生成下一日语录")
+            if runs_generation():
+                logger.info(f"定时任务调度器已启动，每日 {self.generation_hour:02d}:{self.generation_minute:02d} 生成下一日语录")
+            else:
+                logger.info("定时任务调度器已启动（api 角色，仅预热语录，不生成）")
             
         except Exception as e:
             logger.error(f"启动调度器失败: {e}")
@@ -85,83 +153,101 @@ class QuoteScheduler:
             today = date.today().strftime("%Y-%m-%d")
             logger.info(f"检查并初始化今日语录: {today}")
 
-            # 检查今日语录是否存在
-            today_quote = await ai_service.get_today_quote()
-
-            if today_quote:
-                logger.info(f"今日语录已存在: {today_quote['content'][:50]}...")
-            else:
-                logger.info("今日语录不存在，开始生成...")
-                result = await ai_service.generate_daily_quote(today)
-
-                if result["success"]:
-                    logger.info(f"成功生成今日语录: {result['quote']['content'][:50]}...")
-                else:
-                    logger.error(f"生成今日语录失败: {result.get('message', '未知错误')}")
+            # get_today_quote 在语录不存在时会立即生成
+            await self._run_for_all_channels(self._initialize_channel_today_quote)
 
         except Exception as e:
             logger.error(f"初始化今日语录失败: {e}")
+
+    async def _initialize_channel_today_quote(self, channel: str):
+        """初始化单个频道的今日语录"""
+        today_quote = await ai_service.get_today_quote(channel)
+
+        if today_quote:
+            logger.info(f"频道 {channel} 今日语录: {today_quote['content'][:50]}...")
+        else:
+            logger.error(f"频道 {channel} 生成今日语录失败")
+
+    async def _run_for_all_channels(self, func):
+        """对所有启用的频道并发执行任务，并发数受 QUOTE_GENERATION_CONCURRENCY 限制"""
+        # 每次执行前刷新频道配置，使新增频道无需重启即可生效
+        await channel_registry.load()
+        channels = await channel_registry.all()
+        semaphore = asyncio.Semaphore(max(1, self.generation_concurrency))
+
+        async def run(slug: str):
+            async with semaphore:
+                try:
+                    await func(slug)
+                except Exception as e:
+                    logger.error(f"频道 {slug} 任务执行失败: {e}")
+
+        await asyncio.gather(*(run(channel.slug) for channel in channels))
     
     async def generate_next_day_quote(self):
-        """生成下一日语录的定时任务"""
+        """生成下一日语录的定时任务（所有频道并发执行）"""
         try:
             # 计算下一日日期
             tomorrow = (date.today() + timedelta(days=1)).strftime("%Y-%m-%d")
             
             logger.info(f"开始生成下一日语录: {tomorrow}")
             
-            # 生成下一日语录
-            result = await ai_service.generate_daily_quote(tomorrow)
+            await self._run_for_all_channels(
+                lambda channel: self._generate_channel_quote(tomorrow, channel)
+            )
+
+            # 生成完成后立即预热，不必等到预热时间
+            await rollover.prewarm()
+                
+        except Exception as e:
+            logger.error(f"定时生成语录任务执行失败: {e}")
+            await self._notify_generation_failure("未知日期", str(e))
+
+    async def _generate_channel_quote(self, target_date: str, channel: str):
+        """生成单个频道指定日期的语录"""
+        try:
+            # 通过持久化任务队列执行，进程重启后任务不会丢失
+            result = await ai_service.generate_via_queue(target_date, channel, timeout=self.job_wait_timeout)
             
             if result["success"]:
                 quote_content = result["quote"]["content"]
-                logger.info(f"成功生成 {tomorrow} 的语录: {quote_content[:50]}...")
+                logger.info(f"成功生成频道 {channel} {target_date} 的语录: {quote_content[:50]}...")
                 
-                # 可以在这里添加通知逻辑，比如发送邮件、推送消息等
-                await self._notify_generation_success(tomorrow, quote_content)
+                await self._notify_generation_success(target_date, quote_content, channel)
                 
             else:
                 error_msg = result.get("message", "未知错误")
-                logger.error(f"生成 {tomorrow} 的语录失败: {error_msg}")
-                
-                # 可以在这里添加错误通知逻辑
-                await self._notify_generation_failure(tomorrow, error_msg)
+                logger.error(f"生成频道 {channel} {target_date} 的语录失败: {error_msg}")
                 
+                await self._notify_generation_failure(target_date, error_msg, channel)
+
         except Exception as e:
-            logger.error(f"定时生成语录任务执行失败: {e}")
-            await self._notify_generation_failure("未知日期", str(e))
+            logger.error(f"生成频道 {channel} 语录失败: {e}")
+            await self._notify_generation_failure(target_date, str(e), channel)
     
-    async def _notify_generation_success(self, date_str: str, content: str):
-        """通知语录生成成功"""
-        # 这里可以实现各种通知方式：邮件、短信、Webhook等
-        logger.info(f"语录生成成功通知 - 日期: {date_str}, 内容: {content[:30]}...")
-        
-        # 示例：可以添加Webhook通知
-        # await self._send_webhook_notification({
-        #     "type": "success",
-        #     "date": date_str,
-        #     "content": content,
-        #     "timestamp": datetime.now().isoformat()
-        # })
+    async def _notify_generation_success(self, date_str: str, content: str, channel: str = DEFAULT_CHANNEL_SLUG):
+        """通知语录生成成功（放入通知队列后立即返回）"""
+        logger.info(f"语录生成成功通知 - 频道: {channel}, 日期: {date_str}, 内容: {content[:30]}...")
+        notifier.notify("generation.succeeded", {
+            "channel": channel,
+            "date": date_str,
+            "content": content
+        })
     
-    async def _notify_generation_failure(self, date_str: str, error_msg: str):
-        """通知语录生成失败"""
-        # 这里可以实现各种通知方式：邮件、短信、Webhook等
-        logger.error(f"语录生成失败通知 - 日期: {date_str}, 错误: {error_msg}")
-        
-        # 示例：可以添加Webhook通知
-        # await self._send_webhook_notification({
-        #     "type": "error",
-        #     "date": date_str,
-        #     "error": error_msg,
-        #     "timestamp": datetime.now().isoformat()
-        # })
+    async def _notify_generation_failure(self, date_str: str, error_msg: str, channel: str = DEFAULT_CHANNEL_SLUG):
+        """通知语录生成失败（放入通知队列后立即返回）"""
+        logger.error(f"语录生成失败通知 - 频道: {channel}, 日期: {date_str}, 错误: {error_msg}")
+        notifier.notify("generation.failed", {
+            "channel": channel,
+            "date": date_str,
+            "error": error_msg
+        })
     
-    async def manual_generate_quote(self, target_date: str):
+    async def manual_generate_quote(self, target_date: str, channel: str = DEFAULT_CHANNEL_SLUG):
         """手动触发生成指定日期的语录"""
         try:
-            logger.info(f"手动触发生成语录: {target_date}")
-            result = await ai_service.generate_daily_quote(target_date)
+            logger.info(f"手动触发生成语录: {channel} {target_date}")
+            result = await ai_service.generate_via_queue(target_date, channel)
             
             if result["success"]:
                 logger.info(f"手动生成 {target_date} 的语录成功")
@@ -191,8 +277,13 @@ class QuoteScheduler:
         
         return {
             "is_running": self.is_running,
+            "role": get_role(),
             "jobs": jobs,
-            "generation_time": f"{self.generation_hour:02d}:{self.generation_minute:02d}"
+            "generation_time": f"{self.generation_hour:02d}:{self.generation_minute:02d}",
+            "generation_concurrency": self.generation_concurrency,
+            "rollover": rollover.get_status(),
+            "fallback_repair": fallback_repairer.get_status(),
+            "backup": database_backup.get_status()
         }
 
 
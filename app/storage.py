@@ -0,0 +1,173 @@
+"""
+存储后端配置
+
+根据 DATABASE_URL 的方言选择存储后端，统一生成同步/异步引擎的连接地址和
+连接池参数。新增数据库类型时只需实现一个 StorageBackend 子类并注册到
+BACKENDS 中。
+"""
+import os
+import itertools
+from typing import Any, Dict, List, Type
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+
+
+class StorageBackend:
+    """存储后端基类"""
+
+    name = "base"
+    sync_driver = ""
+    async_driver = ""
+
+    def __init__(self, url: str):
+        self.url = make_url(url)
+
+    def sync_url(self) -> URL:
+        """同步引擎连接地址"""
+        return self.url.set(drivername=f"{self.name}+{self.sync_driver}")
+
+    def async_url(self) -> URL:
+        """异步引擎连接地址"""
+        return self.url.set(drivername=f"{self.name}+{self.async_driver}")
+
+    def sync_engine_options(self) -> Dict[str, Any]:
+        """同步引擎参数"""
+        return {}
+
+    def async_engine_options(self) -> Dict[str, Any]:
+        """异步引擎参数"""
+        return {"echo": False}
+
+    def configure_engine(self, engine):
+        """引擎创建后的额外配置"""
+
+    def describe(self) -> Dict[str, Any]:
+        """返回不含密码的后端信息"""
+        return {
+            "backend": self.name,
+            "url": self.url.render_as_string(hide_password=True),
+        }
+
+
+class SQLiteBackend(StorageBackend):
+    """基于文件的SQLite后端"""
+
+    name = "sqlite"
+    sync_driver = "pysqlite"
+    async_driver = "aiosqlite"
+
+    def sync_engine_options(self) -> Dict[str, Any]:
+        return {"connect_args": {"check_same_thread": False}}
+
+    def configure_engine(self, engine):
+        busy_timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        # 设置为WAL时读操作不会被写事务阻塞，但会额外生成 -wal/-shm 文件，
+        # 仅挂载单个数据库文件的Docker部署请保持默认
+        journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "")
+
+        @event.listens_for(engine, "connect")
+        def _set_sqlite_pragma(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout}")
+            if journal_mode:
+                cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.close()
+
+
+class PostgresBackend(StorageBackend):
+    """带连接池的PostgreSQL后端（asyncpg驱动）"""
+
+    name = "postgresql"
+    sync_driver = "psycopg2"
+    async_driver = "asyncpg"
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.pool_timeout = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self.pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        self.statement_cache_size = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+        self.prepared_statement_cache_size = int(os.getenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "100"))
+
+    def async_url(self) -> URL:
+        # SQLAlchemy 在每个连接上缓存 asyncpg 预编译语句
+        return super().async_url().update_query_dict({
+            "prepared_statement_cache_size": str(self.prepared_statement_cache_size)
+        })
+
+    def _pool_options(self) -> Dict[str, Any]:
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": True,
+        }
+
+    def sync_engine_options(self) -> Dict[str, Any]:
+        return self._pool_options()
+
+    def async_engine_options(self) -> Dict[str, Any]:
+        options = super().async_engine_options()
+        options.update(self._pool_options())
+        # asyncpg 自身的语句缓存
+        options["connect_args"] = {"statement_cache_size": self.statement_cache_size}
+        return options
+
+    def describe(self) -> Dict[str, Any]:
+        info = super().describe()
+        info.update({
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "statement_cache_size": self.statement_cache_size,
+            "prepared_statement_cache_size": self.prepared_statement_cache_size,
+        })
+        return info
+
+
+BACKENDS: Dict[str, Type[StorageBackend]] = {
+    "sqlite": SQLiteBackend,
+    "postgresql": PostgresBackend,
+    "postgres": PostgresBackend,
+}
+
+
+def get_backend(url: str) -> StorageBackend:
+    """根据连接地址选择存储后端"""
+    backend_name = make_url(url).get_backend_name()
+    backend_class = BACKENDS.get(backend_name)
+    if backend_class is None:
+        raise ValueError(f"不支持的数据库类型: {backend_name}")
+    return backend_class(url)
+
+
+def create_backend_async_engine(backend: StorageBackend) -> AsyncEngine:
+    """为存储后端创建异步引擎"""
+    engine = create_async_engine(backend.async_url(), **backend.async_engine_options())
+    backend.configure_engine(engine.sync_engine)
+    return engine
+
+
+class ReadSessionFactory:
+    """
+    只读会话工厂
+
+    配置了只读副本时按轮询方式把会话分配到各个副本，
+    未配置时直接使用主库会话。
+    """
+
+    def __init__(self, primary_factory, replica_urls: List[str]):
+        self.primary_factory = primary_factory
+        self.backends = [get_backend(url) for url in replica_urls]
+        self.engines = [create_backend_async_engine(b) for b in self.backends]
+        self._cycle = itertools.cycle(self.engines) if self.engines else None
+
+    def __call__(self) -> AsyncSession:
+        if self._cycle is None:
+            return self.primary_factory()
+        return AsyncSession(next(self._cycle), expire_on_commit=False)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [backend.describe() for backend in self.backends]
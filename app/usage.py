@@ -0,0 +1,305 @@
+"""
+LLM用量账本
+
+每次调用模型（包括重试、兜底前的失败尝试、手动生成和兜底语录修复）记录一行：
+输入/输出/总token数、耗时、模型、服务商和按 LLM_PRICE_* 计算的费用。
+
+- record() 只在内存中追加一条记录并更新汇总，不访问数据库，对生成流程几乎没有开销
+- 记录由后台任务每 LLM_USAGE_FLUSH_SECONDS 秒（或积累 LLM_USAGE_BATCH_SIZE 条时）
+  批量插入 llm_usage 表，只追加不修改；写入失败时保留到下次
+- 内存中按调用日期和按语录（频道, 目标日期）汇总最近 LLM_USAGE_ROLLUP_DAYS 天，
+  启动时从数据库加载，并用今日用量初始化LLM调用预算（LLM_TOKENS_PER_DAY 等）
+- 不生成语录的 api 进程每 LLM_USAGE_REFRESH_SECONDS 秒按需从数据库重新汇总
+- 汇总结果通过 GET /api/stats/usage 查询
+
+流式模式下服务商通常不返回用量，这类调用只记录次数和耗时。
+"""
+import os
+import time
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple, Union
+from urllib.parse import urlparse
+from sqlalchemy import select, insert, func, case
+from app.database import AsyncSessionLocal, AsyncReadSessionLocal
+from app.models import LLMUsage, parse_date
+from app.rate_limit import llm_budget
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UsageTotals:
+    """一组调用的用量合计"""
+
+    __slots__ = ("calls", "failures", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms", "cost")
+
+    def __init__(self, calls=0, failures=0, prompt_tokens=0, completion_tokens=0, total_tokens=0, latency_ms=0, cost=0.0):
+        self.calls = calls
+        self.failures = failures
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+        self.total_tokens = total_tokens
+        self.latency_ms = latency_ms
+        self.cost = cost
+
+    def add(self, row: Dict[str, Any]):
+        self.calls += 1
+        self.failures += 0 if row["success"] else 1
+        self.prompt_tokens += row["prompt_tokens"]
+        self.completion_tokens += row["completion_tokens"]
+        self.total_tokens += row["total_tokens"]
+        self.latency_ms += row["latency_ms"] or 0
+        self.cost += row["cost"]
+
+    def merge(self, other: "UsageTotals"):
+        for name in self.__slots__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "avg_latency_ms": round(self.latency_ms / self.calls) if self.calls else None,
+            "cost": round(self.cost, 6)
+        }
+
+
+def _utcnow() -> datetime:
+    """当前UTC时间（不带时区，与数据库中的存储格式一致）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class UsageLedger:
+    """LLM用量账本"""
+
+    def __init__(self):
+        self.flush_interval = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "10"))
+        self.batch_size = max(int(os.getenv("LLM_USAGE_BATCH_SIZE", "100")), 1)
+        self.rollup_days = max(int(os.getenv("LLM_USAGE_ROLLUP_DAYS", "30")), 1)
+        self.refresh_interval = float(os.getenv("LLM_USAGE_REFRESH_SECONDS", "60"))
+        # 每千token价格（单位自定，如美元），用于计算费用
+        self.prompt_price = float(os.getenv("LLM_PRICE_PROMPT_PER_1K", "0"))
+        self.completion_price = float(os.getenv("LLM_PRICE_COMPLETION_PER_1K", "0"))
+        self.provider = urlparse(os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).hostname or "unknown"
+        # 写入失败时最多保留的记录数，超出后丢弃最早的记录
+        self.max_pending = self.batch_size * 100
+
+        self._pending: List[Dict[str, Any]] = []
+        self._by_day: Dict[date, UsageTotals] = {}
+        self._by_quote: Dict[Tuple[int, date], UsageTotals] = {}
+        self._writable = False
+        self._loaded_at: Optional[float] = None
+        self._load_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.without_usage = 0
+
+    def record(
+        self,
+        channel_id: Optional[int],
+        target_date: Optional[Union[str, date]],
+        model: str,
+        usage: Any,
+        latency_ms: Optional[int],
+        success: bool
+    ):
+        """
+        记录一次模型调用（只写内存）
+
+        Args:
+            usage: 响应中的 usage 对象，服务商未返回时为 None
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+        completion_tokens = getattr(usage, "completion_tokens", None) or 0
+        total_tokens = getattr(usage, "total_tokens", None) or prompt_tokens + completion_tokens
+        if usage is None:
+            self.without_usage += 1
+        target = parse_date(target_date) if target_date else None
+        row = {
+            "day": date.today(),
+            "created_at": _utcnow(),
+            "channel_id": channel_id,
+            "target_date": target,
+            "model": model,
+            "provider": self.provider,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": total_tokens,
+            "latency_ms": latency_ms,
+            "success": success,
+            "cost": (prompt_tokens * self.prompt_price + completion_tokens * self.completion_price) / 1000
+        }
+        self.recorded += 1
+        self._add_to_rollups(row)
+        llm_budget.record_tokens(total_tokens)
+
+        if self._flush_task is None:
+            return
+        self._pending.append(row)
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _add_to_rollups(self, row: Dict[str, Any]):
+        totals = self._by_day.get(row["day"])
+        if totals is None:
+            totals = self._by_day[row["day"]] = UsageTotals()
+        totals.add(row)
+        if row["target_date"] is not None and row["channel_id"] is not None:
+            key = (row["channel_id"], row["target_date"])
+            totals = self._by_quote.get(key)
+            if totals is None:
+                totals = self._by_quote[key] = UsageTotals()
+            totals.add(row)
+
+    def _prune(self):
+        """丢弃超出汇总天数的内存汇总"""
+        cutoff = date.today() - timedelta(days=self.rollup_days)
+        for day in [day for day in self._by_day if day < cutoff]:
+            del self._by_day[day]
+        for key in [key for key in self._by_quote if key[1] < cutoff]:
+            del self._by_quote[key]
+
+    async def load(self):
+        """从数据库汇总最近 rollup_days 天的用量"""
+        cutoff = date.today() - timedelta(days=self.rollup_days)
+        columns = [
+            func.count(),
+            func.sum(case((LLMUsage.success.is_(False), 1), else_=0)),
+            func.sum(LLMUsage.prompt_tokens),
+            func.sum(LLMUsage.completion_tokens),
+            func.sum(LLMUsage.total_tokens),
+            func.sum(func.coalesce(LLMUsage.latency_ms, 0)),
+            func.sum(LLMUsage.cost)
+        ]
+        async with self._load_lock:
+            async with AsyncReadSessionLocal() as db:
+                by_day = (await db.execute(
+                    select(LLMUsage.day, *columns).where(LLMUsage.day >= cutoff).group_by(LLMUsage.day)
+                )).all()
+                by_quote = (await db.execute(
+                    select(LLMUsage.channel_id, LLMUsage.target_date, *columns)
+                    .where(LLMUsage.target_date >= cutoff, LLMUsage.channel_id.isnot(None))
+                    .group_by(LLMUsage.channel_id, LLMUsage.target_date)
+                )).all()
+            self._by_day = {row[0]: UsageTotals(*row[1:]) for row in by_day}
+            self._by_quote = {(row[0], row[1]): UsageTotals(*row[2:]) for row in by_quote}
+            # 尚未写入数据库的记录
+            for row in self._pending:
+                self._add_to_rollups(row)
+            self._loaded_at = time.monotonic()
+
+    async def _ensure_fresh(self):
+        """只读进程的汇总过期时重新加载"""
+        if self._loaded_at is None or (
+            not self._writable and time.monotonic() - self._loaded_at >= self.refresh_interval
+        ):
+            await self.load()
+
+    async def flush(self) -> int:
+        """把缓冲的记录批量写入数据库"""
+        if not self._pending:
+            return 0
+        rows, self._pending = self._pending, []
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(LLMUsage), rows)
+                await db.commit()
+        except Exception:
+            # 写入失败时把记录放回，下次再写
+            self._pending[:0] = rows
+            raise
+        self.written += len(rows)
+        return len(rows)
+
+    async def start(self, writable: bool):
+        """
+        加载汇总；负责生成的进程同时启动批量写入，并用今日用量初始化调用预算
+        """
+        self._writable = writable
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"加载LLM用量汇总失败: {e}")
+        if not writable or self._flush_task is not None:
+            return
+        today = self._by_day.get(date.today())
+        if today is not None:
+            llm_budget.seed_today(today.calls, today.total_tokens)
+        self._wakeup = asyncio.Event()
+        self._flush_task = asyncio.create_task(self._flush_loop(), name="llm-usage-flush")
+
+    async def stop(self):
+        """停止批量写入并写入剩余的记录"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"写入LLM用量失败: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+                self._prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"写入LLM用量失败: {e}")
+
+    async def summary(self, days: int, channel_id: Optional[int] = None) -> Dict[str, Any]:
+        """
+        最近 days 天的用量汇总
+
+        Returns:
+            {"days": 按调用日期汇总, "quotes": 按语录（频道, 目标日期）汇总, "totals": 合计}
+        """
+        await self._ensure_fresh()
+        cutoff = date.today() - timedelta(days=min(days, self.rollup_days) - 1)
+        totals = UsageTotals()
+        day_rows = []
+        for day in sorted((day for day in self._by_day if day >= cutoff), reverse=True):
+            totals.merge(self._by_day[day])
+            day_rows.append({"date": day.isoformat(), **self._by_day[day].to_dict()})
+        quote_rows = [
+            {"channel_id": key[0], "date": key[1].isoformat(), **value.to_dict()}
+            for key, value in sorted(self._by_quote.items(), key=lambda item: (item[0][1], item[0][0]), reverse=True)
+            if key[1] >= cutoff and (channel_id is None or key[0] == channel_id)
+        ]
+        return {"days": day_rows, "quotes": quote_rows, "totals": totals.to_dict()}
+
+    def get_status(self) -> Dict[str, Any]:
+        today = self._by_day.get(date.today())
+        return {
+            "provider": self.provider,
+            "writable": self._writable,
+            "recorded": self.recorded,
+            "written": self.written,
+            "pending": len(self._pending),
+            "dropped": self.dropped,
+            "without_usage": self.without_usage,
+            "today": today.to_dict() if today else UsageTotals().to_dict()
+        }
+
+
+# 创建全局LLM用量账本
+usage_ledger = UsageLedger()
@@ -0,0 +1,453 @@
+"""
+语录内容校验
+
+- StreamingQuoteValidator: 流式输出的增量校验，尽早中止无效输出
+- QuoteValidator: 入库前的校验流水线，由若干预编译的检查项组成，
+  任一检查不通过即拒绝，并给出原因代码
+"""
+import os
+import re
+import time
+import hashlib
+from collections import deque
+from pathlib import Path
+from typing import Optional, Dict, List, Set, Tuple, Iterable, Mapping, TypeVar
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).parent / "data"
+
+# 语录正文最少字数
+MIN_QUOTE_LENGTH = 30
+# 没有出现分隔符时允许的最大字数，超过说明模型在自由发挥
+MAX_LENGTH_WITHOUT_SEPARATOR = 200
+# 判断开头是否为客套话前需要积累的字数
+PREAMBLE_CHECK_LENGTH = 6
+# 入库语录正文最大字数
+MAX_QUOTE_LENGTH = int(os.getenv("MAX_QUOTE_LENGTH", "300"))
+# 作者为空时 _extract_author_from_content 返回的占位值
+PLACEHOLDER_AUTHORS = {"哲学家", "佚名", "未知", "作者姓名", "unknown", "anonymous"}
+
+# 模型常见的开场白/客套话
+PREAMBLE_PATTERN = re.compile(
+    r"^\s*(好的|当然|以下是|下面是|这是一句|这里是|为你|为您|我为|我将|根据你|根据您|"
+    r"sure|certainly|here is|here's|okay|ok[,，])",
+    re.IGNORECASE
+)
+
+
+class InvalidCompletionError(ValueError):
+    """模型输出不符合要求"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class StreamingQuoteValidator:
+    """
+    流式输出的增量校验器
+
+    每收到一段输出就检查一次，一旦能确定输出无效就抛出 InvalidCompletionError，
+    调用方可以立即中止请求并重试；作者行结束后返回True，调用方可以提前结束读取。
+    """
+
+    def __init__(self, min_length: int = MIN_QUOTE_LENGTH):
+        self.min_length = min_length
+        self._parts = []
+        self._length = 0
+        self._preamble_checked = False
+        self._separator_index: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def feed(self, delta: str) -> bool:
+        """
+        处理一段新输出
+
+        Returns:
+            True 表示已经得到完整的“内容|作者”，可以停止读取
+        """
+        self._parts.append(delta)
+        self._length += len(delta)
+        text = self.text
+
+        if not self._preamble_checked and len(text.strip()) >= PREAMBLE_CHECK_LENGTH:
+            self._preamble_checked = True
+            if PREAMBLE_PATTERN.match(text):
+                raise InvalidCompletionError("preamble", f"输出包含开场白: {text.strip()[:20]}")
+
+        if self._separator_index is None:
+            index = text.find("|")
+            if index == -1:
+                if "\n\n" in text.strip():
+                    raise InvalidCompletionError("chatter", "输出包含多段文字且没有分隔符")
+                if self._length > MAX_LENGTH_WITHOUT_SEPARATOR:
+                    raise InvalidCompletionError("no_separator", "输出过长且没有分隔符")
+                return False
+
+            self._separator_index = index
+            quote_length = len(_strip_quote(text[:index]))
+            if quote_length < self.min_length:
+                raise InvalidCompletionError("too_short", f"语录内容过短: {quote_length} 字")
+
+        # 作者行已经结束
+        author_part = text[self._separator_index + 1:]
+        return "\n" in author_part and bool(author_part.split("\n", 1)[0].strip())
+
+    def finish(self) -> str:
+        """输出结束后的最终校验，返回截取到作者行为止的内容"""
+        text = self.text.strip()
+        if not self._preamble_checked and PREAMBLE_PATTERN.match(text):
+            raise InvalidCompletionError("preamble", f"输出包含开场白: {text[:20]}")
+
+        if self._separator_index is None:
+            raise InvalidCompletionError("no_separator", "输出缺少“内容|作者”分隔符")
+
+        quote, author = text.split("|", 1)
+        author = author.split("\n", 1)[0].strip()
+        if len(_strip_quote(quote)) < self.min_length:
+            raise InvalidCompletionError("too_short", "语录内容过短")
+        if not author:
+            raise InvalidCompletionError("no_author", "输出缺少作者")
+
+        return f"{quote.strip()}|{author}"
+
+
+def _strip_quote(text: str) -> str:
+    """去掉首尾空白和引号后的正文"""
+    return text.strip().strip('"').strip("'").strip("“”「」《》").strip()
+
+
+_NORMALIZE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+_AUTHOR_NORMALIZE_PATTERN = re.compile(r"[\s·•・.\-‐－_]+")
+_AUTHOR_SPLIT_PATTERN = re.compile(r"[\s·•・]+")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+T = TypeVar("T")
+
+
+def _collapse_whitespace(text: str) -> str:
+    """合并连续空白并转为小写"""
+    return _WHITESPACE_PATTERN.sub(" ", text).lower()
+
+
+class QuoteCandidate:
+    """待入库的语录"""
+
+    __slots__ = ("raw", "content", "author", "channel_id", "normalized")
+
+    def __init__(self, raw: str, content: str, author: str, channel_id: int):
+        self.raw = raw
+        self.content = content
+        self.author = author
+        self.channel_id = channel_id
+        self.normalized = normalize_text(content)
+
+
+def normalize_text(text: str) -> str:
+    """去掉空白和标点并转为小写，用于查重"""
+    return _NORMALIZE_PATTERN.sub("", text).lower()
+
+
+def normalize_author(name: str) -> str:
+    """作者名归一化：去掉间隔号、连字符和空白并转为小写"""
+    return _AUTHOR_NORMALIZE_PATTERN.sub("", name).lower()
+
+
+def match_author(aliases: Mapping[str, T], name: str) -> Optional[T]:
+    """
+    在归一化别名表（normalize_author 的结果 -> 作者）中查找作者
+
+    先整体匹配；没有命中时再按最后一段姓名匹配，例如“Friedrich Wilhelm Nietzsche”匹配到
+    “Friedrich Nietzsche”。按姓匹配只在没有歧义时使用：以这段姓名结尾的别名必须属于同一作者，
+    且第一段是该作者某个全名别名的开头，“詹姆斯·密尔”不会被归到“约翰·斯图尔特·密尔”。
+    """
+    value = aliases.get(normalize_author(name))
+    if value is not None:
+        return value
+
+    parts = [part for part in _AUTHOR_SPLIT_PATTERN.split(name.strip()) if part]
+    if len(parts) < 2:
+        return None
+    first, surname = normalize_author(parts[0]), normalize_author(parts[-1])
+    if not first or not surname:
+        return None
+
+    owners = {value for alias, value in aliases.items() if alias.endswith(surname)}
+    if len(owners) != 1:
+        return None
+    value = owners.pop()
+    full_names = [
+        alias for alias, owner in aliases.items()
+        if owner == value and len(alias) > len(surname) and alias.endswith(surname)
+    ]
+    return value if any(alias.startswith(first) for alias in full_names) else None
+
+
+def _read_lines(path: Path) -> List[str]:
+    """读取数据文件，忽略空行和 # 开头的注释"""
+    if not path.exists():
+        logger.warning(f"数据文件不存在: {path}")
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def load_known_authors(path: Optional[Path] = None) -> List[List[str]]:
+    """
+    读取已知作者列表
+
+    Returns:
+        每位作者一个列表，第一个元素为规范名称，其余为别名
+    """
+    path = path or Path(os.getenv("KNOWN_AUTHORS_FILE", DATA_DIR / "known_authors.txt"))
+    return [
+        [name.strip() for name in line.split("|") if name.strip()]
+        for line in _read_lines(path)
+    ]
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 多模式匹配自动机
+
+    构建时一次性生成转移表和失败指针，匹配时对文本只扫描一遍，
+    耗时与短语数量无关。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Optional[str]] = [None]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str):
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(None)
+            node = next_node
+        self._output[node] = pattern
+
+    def _build(self):
+        """按广度优先计算失败指针，并把后缀节点的输出合并到当前节点"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                if self._output[child] is None:
+                    self._output[child] = self._output[self._fail[child]]
+
+    def search(self, text: str) -> Optional[str]:
+        """返回文本中出现的第一个模式，没有匹配时返回None"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node] is not None:
+                return output[node]
+        return None
+
+
+class LengthCheck:
+    """正文长度检查"""
+
+    def __init__(self, min_length: int = MIN_QUOTE_LENGTH, max_length: int = MAX_QUOTE_LENGTH):
+        self.min_length = min_length
+        self.max_length = max_length
+
+    def __call__(self, candidate: QuoteCandidate) -> Optional[Tuple[str, str]]:
+        length = len(_strip_quote(candidate.content))
+        if length < self.min_length:
+            return "too_short", f"语录内容过短: {length} 字"
+        if length > self.max_length:
+            return "too_long", f"语录内容过长: {length} 字"
+        return None
+
+
+class SeparatorCheck:
+    """检查输出能否解析出“内容|作者”两部分"""
+
+    def __call__(self, candidate: QuoteCandidate) -> Optional[Tuple[str, str]]:
+        if "|" not in candidate.raw and "——" not in candidate.raw and " - " not in candidate.raw:
+            return "no_separator", "输出缺少“内容|作者”分隔符"
+        author = candidate.author.strip()
+        if not author or author in PLACEHOLDER_AUTHORS or author.lower() in PLACEHOLDER_AUTHORS:
+            return "no_author", "输出缺少作者"
+        if "\n" in author or len(author) > 50:
+            return "no_author", f"作者格式无效: {author[:20]}"
+        return None
+
+
+class AuthorWhitelistCheck:
+    """
+    已知作者白名单检查
+
+    只对配置了白名单的频道生效；作者名按 match_author 匹配，
+    例如“弗里德里希·威廉·尼采”可以匹配到“弗里德里希·尼采”。
+    """
+
+    def __init__(self, authors: Dict[int, Set[str]]):
+        self.authors = {channel_id: dict.fromkeys(names, True) for channel_id, names in authors.items()}
+
+    def __call__(self, candidate: QuoteCandidate) -> Optional[Tuple[str, str]]:
+        names = self.authors.get(candidate.channel_id)
+        if not names:
+            return None
+        author = candidate.author.strip()
+        if match_author(names, author):
+            return None
+        return "unknown_author", f"作者不在已知作者列表中: {author}"
+
+
+class BannedPhraseCheck:
+    """禁用短语检查（模型闲聊、提示词泄露等）"""
+
+    def __init__(self, phrases: Iterable[str]):
+        self.automaton = AhoCorasick({_collapse_whitespace(p) for p in phrases})
+
+    def __call__(self, candidate: QuoteCandidate) -> Optional[Tuple[str, str]]:
+        phrase = self.automaton.search(_collapse_whitespace(candidate.raw))
+        if phrase is not None:
+            return "banned_phrase", f"输出包含禁用短语: {phrase}"
+        return None
+
+
+class DuplicateCheck:
+    """
+    重复语录检查
+
+    每个频道维护一个已有语录的指纹集合（归一化正文的8字节摘要），
+    启动时从数据库加载，新语录入库后追加。
+    """
+
+    def __init__(self):
+        self._fingerprints: Dict[int, Set[int]] = {}
+
+    @staticmethod
+    def fingerprint(normalized: str) -> int:
+        return int.from_bytes(hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, channel_id: int, content: str):
+        self._fingerprints.setdefault(channel_id, set()).add(self.fingerprint(normalize_text(content)))
+
+    def replace(self, fingerprints: Dict[int, Set[int]]):
+        self._fingerprints = fingerprints
+
+    def __len__(self):
+        return sum(len(items) for items in self._fingerprints.values())
+
+    def __call__(self, candidate: QuoteCandidate) -> Optional[Tuple[str, str]]:
+        existing = self._fingerprints.get(candidate.channel_id)
+        if existing and self.fingerprint(candidate.normalized) in existing:
+            return "duplicate", "与本频道已有语录重复"
+        return None
+
+
+class QuoteValidator:
+    """
+    入库前的语录校验流水线
+
+    按顺序执行检查项，第一个不通过的检查项决定拒绝原因；
+    所有检查项都在启动时预编译，单次校验只做字符串扫描和集合查找。
+    """
+
+    def __init__(self):
+        self.duplicates = DuplicateCheck()
+        self.checks = [
+            LengthCheck(),
+            SeparatorCheck(),
+            BannedPhraseCheck(_read_lines(Path(os.getenv("BANNED_PHRASES_FILE", DATA_DIR / "banned_phrases.txt")))),
+            self.whitelist_check(),
+            self.duplicates,
+        ]
+        self._loaded = False
+        self.validated = 0
+        self.rejected: Dict[str, int] = {}
+        self.total_seconds = 0.0
+
+    @staticmethod
+    def whitelist_check() -> AuthorWhitelistCheck:
+        """AUTHOR_WHITELIST=True 时默认频道只接受已知作者列表（KNOWN_AUTHORS_FILE）中的作者，默认关闭"""
+        from app.models import DEFAULT_CHANNEL_ID
+
+        if os.getenv("AUTHOR_WHITELIST", "False").lower() != "true":
+            return AuthorWhitelistCheck({})
+        names = {normalize_author(name) for names in load_known_authors() for name in names}
+        return AuthorWhitelistCheck({DEFAULT_CHANNEL_ID: names} if names else {})
+
+    async def ensure_loaded(self):
+        """首次使用时从数据库加载已有语录的指纹"""
+        if self._loaded:
+            return
+        from sqlalchemy import select
+        from app.models import DailyQuote
+        from app.database import AsyncReadSessionLocal
+
+        fingerprints: Dict[int, Set[int]] = {}
+        async with AsyncReadSessionLocal() as db:
+            result = await db.stream(select(DailyQuote.channel_id, DailyQuote.content))
+            async for channel_id, content in result:
+                fingerprints.setdefault(channel_id, set()).add(
+                    DuplicateCheck.fingerprint(normalize_text(content))
+                )
+        self.duplicates.replace(fingerprints)
+        self._loaded = True
+        logger.info(f"已加载 {len(self.duplicates)} 条语录指纹用于查重")
+
+    def validate(self, raw: str, content: str, author: str, channel_id: int):
+        """
+        校验待入库的语录
+
+        Raises:
+            InvalidCompletionError: 任一检查不通过，reason 为拒绝原因代码
+        """
+        started = time.perf_counter()
+        candidate = QuoteCandidate(raw, content, author, channel_id)
+        try:
+            for check in self.checks:
+                rejection = check(candidate)
+                if rejection is not None:
+                    reason, message = rejection
+                    self.rejected[reason] = self.rejected.get(reason, 0) + 1
+                    raise InvalidCompletionError(reason, message)
+        finally:
+            self.validated += 1
+            self.total_seconds += time.perf_counter() - started
+
+    def remember(self, channel_id: int, content: str):
+        """语录入库后加入查重集合"""
+        self.duplicates.add(channel_id, content)
+
+    def get_status(self) -> Dict:
+        """获取校验统计"""
+        return {
+            "validated": self.validated,
+            "rejected": dict(self.rejected),
+            "avg_microseconds": round(self.total_seconds / self.validated * 1e6, 1) if self.validated else 0,
+            "fingerprints": len(self.duplicates)
+        }
+
+
+# 创建全局校验器实例
+quote_validator = QuoteValidator()
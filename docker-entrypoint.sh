@@ -11,5 +11,16 @@ if [ ! -f "/app/.env" ]; then
     echo "警告: .env 文件不存在，使用默认配置"
 fi
 
+# 进程角色: api / worker / all（默认）
+APP_ROLE="${APP_ROLE:-all}"
+export APP_ROLE
+echo "进程角色: $APP_ROLE"
+
+# 只有 api 角色可以开启多个进程（worker/all 角色会运行定时任务，只能有一个进程）
+WORKERS_ARG=""
+if [ "$APP_ROLE" = "api" ] && [ -n "$UVICORN_WORKERS" ]; then
+    WORKERS_ARG="--workers $UVICORN_WORKERS"
+fi
+
 # 启动应用
-exec uvicorn main:app --host 0.0.0.0 --port 8000
+exec uvicorn main:app --host 0.0.0.0 --port 8000 $WORKERS_ARG
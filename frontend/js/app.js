@@ -14,6 +14,11 @@ function getApiBaseUrl() {
 
 const API_BASE_URL = getApiBaseUrl();
 
+// 历史语录显示条数
+const HISTORY_LIMIT = 20;
+// 补齐本地缓存时每次请求的天数
+const RANGE_PAGE_DAYS = 92;
+
 // 全局变量
 let currentQuote = null;
 
@@ -38,11 +43,22 @@ const closeHistoryBtn = document.getElementById('closeHistoryBtn');
 document.addEventListener('DOMContentLoaded', function() {
     console.log('页面加载完成，开始初始化...');
     console.log('API_BASE_URL:', API_BASE_URL);
+    registerServiceWorker();
     loadTodayQuote();
     bindEvents();
     console.log('初始化完成');
 });
 
+// 注册 Service Worker（直接打开HTML文件时不可用）
+function registerServiceWorker() {
+    if (!('serviceWorker' in navigator) || window.location.protocol === 'file:') {
+        return;
+    }
+    navigator.serviceWorker.register('sw.js').catch(error => {
+        console.warn('Service Worker 注册失败:', error);
+    });
+}
+
 // 绑定事件
 function bindEvents() {
     historyBtn.addEventListener('click', showHistory);
@@ -59,31 +75,52 @@ function bindEvents() {
 }
 
 // 加载今日语录
+// 先显示本地缓存的今日语录，再向服务器确认；Service Worker 用ETag重新验证，未变化时服务器只返回304
 async function loadTodayQuote() {
-    showLoading();
+    const cached = await QuoteDB.getToday();
+    const cachedQuote = cached && cached.body.data;
+    if (cachedQuote && cachedQuote.date === localDateString()) {
+        currentQuote = cachedQuote;
+        displayQuote(currentQuote);
+    } else {
+        showLoading();
+    }
 
     try {
-        console.log('API_BASE_URL:', API_BASE_URL);
         console.log('请求URL:', `${API_BASE_URL}/api/quote`);
 
         const response = await fetch(`${API_BASE_URL}/api/quote`);
-        console.log('Response:', response);
-
         const result = await response.json();
-        console.log('Result:', result);
 
         if (result.success && result.data) {
-            currentQuote = result.data;
-            displayQuote(currentQuote);
-        } else {
+            const etag = response.headers.get('ETag');
+            if (!cached || cached.etag !== etag) {
+                currentQuote = result.data;
+                displayQuote(currentQuote);
+                if (etag) {
+                    await QuoteDB.putToday(etag, result);
+                }
+                await QuoteDB.putQuotes([result.data], result.data.date);
+            }
+        } else if (!currentQuote) {
             showError(result.message || '获取语录失败');
         }
     } catch (error) {
         console.error('获取语录失败:', error);
-        showError('网络连接失败，请检查网络后重试');
+        if (!currentQuote) {
+            showError('网络连接失败，请检查网络后重试');
+        }
     }
 }
 
+// 本地日期 YYYY-MM-DD
+function localDateString() {
+    const now = new Date();
+    const month = String(now.getMonth() + 1).padStart(2, '0');
+    const day = String(now.getDate()).padStart(2, '0');
+    return `${now.getFullYear()}-${month}-${day}`;
+}
+
 // 显示语录
 function displayQuote(quote) {
     quoteContent.textContent = quote.content;
@@ -164,21 +201,89 @@ function copyToClipboard(text) {
 }
 
 // 显示历史语录
+// 先显示本地缓存的历史语录，再补齐缓存中最新日期之后的语录
 async function showHistory() {
-    try {
-        const response = await fetch(`${API_BASE_URL}/api/quotes/recent?limit=20`);
-        const result = await response.json();
+    const cached = await QuoteDB.recentQuotes(HISTORY_LIMIT);
+    if (cached.length > 0) {
+        displayHistory(cached);
+        historyModal.classList.remove('hidden');
+    }
 
-        if (result.success && result.data) {
-            displayHistory(result.data);
-            historyModal.classList.remove('hidden');
-        } else {
-            showToast('获取历史语录失败');
-        }
+    // 今天以后的语录尚未发布，不写入本地缓存
+    const today = currentQuote ? currentQuote.date : localDateString();
+    try {
+        const fresh = cached.length > 0
+            ? await fetchQuotesAfter(cached[0].date, today)
+            : await fetchRecentQuotes(today);
+        displayHistory(mergeQuotes(fresh, cached));
+        historyModal.classList.remove('hidden');
     } catch (error) {
         console.error('获取历史语录失败:', error);
-        showToast('网络连接失败');
+        if (cached.length === 0) {
+            showToast(error instanceof TypeError ? '网络连接失败' : '获取历史语录失败');
+        }
+    }
+}
+
+// 本地没有缓存时获取最近的语录
+async function fetchRecentQuotes(today) {
+    const response = await fetch(`${API_BASE_URL}/api/quotes/recent?limit=${HISTORY_LIMIT}`);
+    const result = await response.json();
+    if (!result.success || !result.data) {
+        throw new Error(result.message || '获取历史语录失败');
+    }
+    await QuoteDB.putQuotes(result.data, today);
+    return result.data;
+}
+
+// 按日期范围分页获取 lastDate 之后到今天的全部语录
+// 每页写入本地缓存后再取下一页，离线多天或中途失败时缓存中都不会留下缺口
+async function fetchQuotesAfter(lastDate, today) {
+    const fresh = [];
+    let start = addDays(lastDate, 1);
+    while (start <= today) {
+        const pageEnd = addDays(start, RANGE_PAGE_DAYS - 1);
+        const end = pageEnd < today ? pageEnd : today;
+        const response = await fetch(`${API_BASE_URL}/api/quotes/range?start=${start}&end=${end}`);
+        const result = await response.json();
+        if (!result.success || !result.data) {
+            throw new Error(result.message || '获取历史语录失败');
+        }
+        const page = rangeToQuotes(result.data);
+        await QuoteDB.putQuotes(page, today);
+        fresh.push(...page);
+        start = addDays(end, 1);
     }
+    return fresh;
+}
+
+// 日期范围接口按天排列 [内容, 作者]，缺失的日期为null
+function rangeToQuotes(data) {
+    const contentIndex = data.fields.indexOf('content');
+    const authorIndex = data.fields.indexOf('author');
+    const quotes = [];
+    data.quotes.forEach((item, offset) => {
+        if (item) {
+            quotes.push({ date: addDays(data.start, offset), content: item[contentIndex], author: item[authorIndex] });
+        }
+    });
+    return quotes;
+}
+
+// YYYY-MM-DD 日期加减天数
+function addDays(dateString, days) {
+    const [year, month, day] = dateString.split('-').map(Number);
+    return new Date(Date.UTC(year, month - 1, day + days)).toISOString().slice(0, 10);
+}
+
+// 合并新获取的语录和本地缓存，按日期倒序
+function mergeQuotes(fresh, cached) {
+    const byDate = new Map();
+    cached.forEach(quote => byDate.set(quote.date, quote));
+    fresh.forEach(quote => byDate.set(quote.date, quote));
+    return Array.from(byDate.values())
+        .sort((a, b) => (a.date < b.date ? 1 : -1))
+        .slice(0, HISTORY_LIMIT);
 }
 
 // 显示历史语录列表
@@ -0,0 +1,98 @@
+// 本地语录缓存（IndexedDB），页面和 Service Worker 共用
+// - quotes: 今天及以前的语录，按日期保存（发布后内容不再变化）
+// - meta:   今日语录的响应和ETag，用于 If-None-Match 重新验证
+// 浏览器不支持或禁用 IndexedDB 时所有方法返回空结果，页面按无缓存处理
+const QuoteDB = (function () {
+    const DB_NAME = 'daily-quote';
+    const DB_VERSION = 1;
+    let dbPromise = null;
+
+    function open() {
+        if (typeof indexedDB === 'undefined') {
+            return Promise.reject(new Error('IndexedDB 不可用'));
+        }
+        if (!dbPromise) {
+            dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(DB_NAME, DB_VERSION);
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore('quotes', { keyPath: 'date' });
+                    db.createObjectStore('meta', { keyPath: 'key' });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+            dbPromise.catch(() => { dbPromise = null; });
+        }
+        return dbPromise;
+    }
+
+    // 在一个事务中执行 action，事务完成后返回 action 的结果
+    async function transaction(storeName, mode, action) {
+        const db = await open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(storeName, mode);
+            let result;
+            Promise.resolve(action(tx.objectStore(storeName))).then(value => { result = value; });
+            tx.oncomplete = () => resolve(result);
+            tx.onerror = () => reject(tx.error);
+            tx.onabort = () => reject(tx.error);
+        });
+    }
+
+    function requestResult(request) {
+        return new Promise((resolve, reject) => {
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+
+    async function safely(promise, fallback) {
+        try {
+            return await promise;
+        } catch (error) {
+            console.warn('本地缓存不可用:', error);
+            return fallback;
+        }
+    }
+
+    return {
+        // 今日语录的缓存响应 {key, etag, body}
+        getToday() {
+            return safely(transaction('meta', 'readonly', store => requestResult(store.get('today'))), null);
+        },
+
+        putToday(etag, body) {
+            return safely(transaction('meta', 'readwrite', store => { store.put({ key: 'today', etag, body }); }), null);
+        },
+
+        // 保存不晚于 today 的语录（更晚的日期尚未发布，可能被替换）
+        putQuotes(quotes, today) {
+            const finished = quotes.filter(quote => quote.date <= today);
+            if (finished.length === 0) {
+                return Promise.resolve(null);
+            }
+            return safely(transaction('quotes', 'readwrite', store => {
+                finished.forEach(quote => store.put({ date: quote.date, content: quote.content, author: quote.author }));
+            }), null);
+        },
+
+        // 按日期倒序取最近的 limit 条
+        recentQuotes(limit) {
+            return safely(transaction('quotes', 'readonly', store => new Promise((resolve, reject) => {
+                const quotes = [];
+                const request = store.openCursor(null, 'prev');
+                request.onsuccess = () => {
+                    const cursor = request.result;
+                    if (cursor && quotes.length < limit) {
+                        quotes.push(cursor.value);
+                        cursor.continue();
+                    } else {
+                        resolve(quotes);
+                    }
+                };
+                request.onerror = () => reject(request.error);
+            })), []);
+        }
+    };
+})();
@@ -0,0 +1,68 @@
+// Service Worker：今日语录用ETag重新验证，断网时使用本地缓存
+// 缓存由页面（js/app.js）写入 IndexedDB，这里只读取
+importScripts('js/quote-db.js');
+
+self.addEventListener('install', () => {
+    self.skipWaiting();
+});
+
+self.addEventListener('activate', event => {
+    event.waitUntil(self.clients.claim());
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.pathname === '/api/quote') {
+        event.respondWith(revalidateToday(request));
+    } else if (url.pathname === '/api/quotes/recent' && !url.searchParams.has('author')) {
+        event.respondWith(recentOrCached(request, url));
+    }
+});
+
+function jsonResponse(body, etag) {
+    const headers = { 'Content-Type': 'application/json' };
+    if (etag) {
+        headers['ETag'] = etag;
+    }
+    return new Response(JSON.stringify(body), { status: 200, headers });
+}
+
+// 带上缓存的ETag请求今日语录，未变化（304）或断网时返回缓存的响应
+async function revalidateToday(request) {
+    const cached = await QuoteDB.getToday();
+    const headers = new Headers(request.headers);
+    if (cached) {
+        headers.set('If-None-Match', cached.etag);
+    }
+
+    let response;
+    try {
+        response = await fetch(new Request(request, { headers, cache: 'no-store' }));
+    } catch (error) {
+        if (cached) {
+            return jsonResponse(cached.body, cached.etag);
+        }
+        throw error;
+    }
+
+    if (response.status === 304 && cached) {
+        return jsonResponse(cached.body, cached.etag);
+    }
+    return response;
+}
+
+// 断网时用本地缓存的语录响应历史列表请求
+async function recentOrCached(request, url) {
+    try {
+        return await fetch(request);
+    } catch (error) {
+        const limit = parseInt(url.searchParams.get('limit') || '10', 10);
+        const since = url.searchParams.get('since');
+        const quotes = (await QuoteDB.recentQuotes(limit)).filter(quote => !since || quote.date > since);
+        return jsonResponse({ success: true, data: quotes, count: quotes.length, message: '离线缓存' });
+    }
+}
@@ -2,31 +2,82 @@
 每日一言系统主应用
 """
 import os
+import hmac
+import logging
+import argparse
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Depends, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
 
 # 导入应用模块
 from app.api import router as api_router
-from app.database import create_tables_async
+from app.database import create_tables_async, dispose_engines, get_storage_status
 from app.scheduler import quote_scheduler
+from app.job_queue import job_queue
+from app.channels import channel_registry, ChannelCreate, create_channel
+from app.models import DEFAULT_CHANNEL_SLUG
+from app.rate_limit import rate_limiter, llm_budget, llm_circuit, limit_generation
+from app.validation import quote_validator
+from app.candidate_cache import candidate_cache
+from app.prompt_selection import prompt_selector
+from app.quote_store import quote_store
+from app.notifications import notifier
+from app.cache_events import cache_events
+from app.cards import card_renderer
+from app.related import related_index
+from app.llm_http import llm_http
+from app.usage import usage_ledger
+from app.roles import ROLES, get_role, runs_generation
+from app.api_keys import api_key_auth, ApiKeyMiddleware, ApiKeyCreate, create_api_key, revoke_api_key, list_api_keys
 
 # 加载环境变量
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时执行
-    print("🚀 启动每日一言系统...")
+    role = get_role()
+    print(f"🚀 启动每日一言系统（角色: {role}）...")
     
     # 创建数据库表
     await create_tables_async()
+    await channel_registry.load()
     print("✅ 数据库初始化完成")
+
+    # 内存语录存储（QUOTE_STORE=memory 时启用）
+    if quote_store.enabled:
+        await quote_store.start()
+        print("✅ 内存语录存储加载完成")
     
+    # 启动生成任务工作协程池（api 角色只提交任务，不执行）
+    if runs_generation():
+        await job_queue.start()
+        print("✅ 生成任务队列启动完成")
+
+    # 相似语录索引（负责生成的进程写入，其他进程只读映射）
+    await related_index.start(writable=runs_generation())
+
+    # LLM用量账本（负责生成的进程批量写入，其他进程只读汇总）
+    await usage_ledger.start(writable=runs_generation())
+
+    # 监听其他进程写入语录后的缓存失效事件
+    await cache_events.start(purge=runs_generation())
+
+    # API密钥用量定期写入（API_KEY_AUTH=True 时启用）
+    await api_key_auth.start()
+
+    # 启动通知分发器（未配置通知目标时不启动）
+    if runs_generation():
+        await notifier.start()
+
     # 启动定时任务调度器
     await quote_scheduler.start()
     print("✅ 定时任务调度器启动完成")
@@ -38,6 +89,16 @@ async def lifespan(app: FastAPI):
     # 关闭时执行
     print("🛑 正在关闭每日一言系统...")
     await quote_scheduler.stop()
+    await job_queue.stop()
+    await cache_events.stop()
+    await card_renderer.stop()
+    await related_index.stop()
+    await notifier.stop()
+    await api_key_auth.stop()
+    await quote_store.stop()
+    await usage_ledger.stop()
+    await llm_http.close()
+    await dispose_engines()
     print("✅ 系统关闭完成")
 
 
@@ -59,11 +120,18 @@ if debug_mode:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # 前端 Service Worker 需要读取 ETag 以便用 If-None-Match 重新验证今日语录
+        expose_headers=["ETag"],
     )
     print("🔓 开发模式：已启用CORS跨域支持")
 else:
     print("🔒 生产模式：CORS跨域支持已禁用")
 
+# API密钥认证（API_KEY_AUTH=True 时对 /api 接口生效）
+app.add_middleware(ApiKeyMiddleware)
+if api_key_auth.enabled:
+    print("🔑 已启用API密钥认证")
+
 # 注册API路由
 app.include_router(api_router, prefix="/api", tags=["API"])
 
@@ -84,7 +152,20 @@ async def api_info():
         "endpoints": {
             "获取今日语录": "GET /api/quote",
             "获取指定日期语录": "GET /api/quote/{date}",
+            "获取语录卡片图片": "GET /api/quote/{date}/card.png?theme=light",
+            "获取相似语录": "GET /api/quote/{date}/related?limit=5",
+            "等待下一天的语录": "GET /api/quote/next?after=&timeout=",
             "获取最近语录": "GET /api/quotes/recent",
+            "按日期范围获取语录": "GET /api/quotes/range?start=&end=",
+            "按作者获取语录": "GET /api/quotes/recent?author=康德",
+            "作者统计": "GET /api/authors",
+            "查询生成任务": "GET /api/jobs/{job_id}",
+            "LLM用量统计": "GET /api/stats/usage?days=7",
+            "获取频道列表": "GET /api/channels",
+            "获取频道今日语录": "GET /api/{channel}/quote",
+            "获取频道指定日期语录": "GET /api/{channel}/quote/{date}",
+            "获取频道最近语录": "GET /api/{channel}/quotes/recent",
+            "按日期范围获取频道语录": "GET /api/{channel}/quotes/range?start=&end=",
             "系统健康检查": "GET /health",
             "API文档": "GET /docs",
             "OpenAPI规范": "GET /openapi.json"
@@ -114,8 +195,13 @@ async def system_health():
         "status": "healthy",
         "service": "每日一言系统",
         "version": "1.0.0",
+        "role": get_role(),
         "scheduler": scheduler_status,
-        "database": "connected"
+        "job_queue": job_queue.get_status(),
+        "database": "connected",
+        "storage": get_storage_status(),
+        "quote_store": quote_store.get_status(),
+        "cache_events": cache_events.get_status()
     }
 
 
@@ -125,23 +211,194 @@ async def get_scheduler_status():
     return quote_scheduler.get_scheduler_status()
 
 
-@app.post("/admin/generate", summary="手动生成语录", description="手动触发生成指定日期的语录。注意：此接口可通过环境变量ENABLE_MANUAL_GENERATION控制是否启用。")
-async def manual_generate(target_date: str):
+@app.get("/admin/rate-limits", summary="限流状态", description="获取接口限流、LLM调用预算和LLM连接池状态")
+async def get_rate_limit_status():
+    """获取限流状态"""
+    return {
+        "rate_limiter": rate_limiter.get_status(),
+        "llm_budget": llm_budget.get_status(),
+        "llm_circuit": llm_circuit.get_status(),
+        "llm_http": llm_http.get_status(),
+        "llm_usage": usage_ledger.get_status()
+    }
+
+
+@app.get("/admin/notifications", summary="通知状态", description="获取各通知目标的投递次数、失败次数和延迟")
+async def get_notification_status():
+    """获取通知状态"""
+    return notifier.get_status()
+
+
+@app.get("/admin/validation", summary="校验统计", description="获取入库前语录校验的通过与拒绝统计")
+async def get_validation_status():
+    """获取校验统计"""
+    return quote_validator.get_status()
+
+
+@app.get("/admin/prompts", summary="提示词模板统计", description="获取各频道提示词模板的成功率、平均长度和模型调用耗时")
+async def get_prompt_status():
+    """获取提示词模板统计"""
+    # 模板文件有变化时立即重新加载，返回的模板列表与文件一致
+    prompt_selector.reload()
+    await prompt_selector.ensure_loaded()
+    return prompt_selector.get_status()
+
+
+@app.get("/admin/related", summary="相似语录索引状态", description="获取相似语录索引的条数、矩阵大小和平均查询耗时")
+async def get_related_status():
+    """获取相似语录索引状态"""
+    return related_index.get_status()
+
+
+@app.get("/admin/cards", summary="卡片缓存状态", description="获取语录卡片图片的绘制次数和缓存命中情况")
+async def get_card_status():
+    """获取卡片缓存状态"""
+    return card_renderer.get_status()
+
+
+@app.get("/admin/candidates", summary="候选缓存状态", description="获取LLM候选语录缓存的命中率和各频道缓存数量")
+async def get_candidate_cache_status():
+    """获取候选缓存状态"""
+    return {
+        **candidate_cache.get_status(),
+        "size": await candidate_cache.size()
+    }
+
+
+def admin_access(flag: str, feature: str):
+    """
+    生成管理接口的访问检查依赖
+
+    接口需要环境变量 flag=True 且配置了 ADMIN_TOKEN，请求头 X-Admin-Token 与之一致时才允许访问。
+    依赖的返回值为接口被禁用时的错误信息，允许访问时为None
+
+    Raises:
+        HTTPException: 管理令牌缺失或错误时返回401
+    """
+    def check(x_admin_token: Optional[str] = Header(None)):
+        if os.getenv(flag, "False").lower() != "true":
+            return {
+                "success": False,
+                "message": f"{feature}功能已被禁用。如需启用，请在.env文件中设置{flag}=True"
+            }
+        admin_token = os.getenv("ADMIN_TOKEN", "")
+        if not admin_token:
+            return {
+                "success": False,
+                "message": f"未配置管理令牌，{feature}功能不可用。请在.env文件中设置ADMIN_TOKEN"
+            }
+        if not x_admin_token or not hmac.compare_digest(x_admin_token.encode("utf-8"), admin_token.encode("utf-8")):
+            raise HTTPException(status_code=401, detail="缺少或无效的管理令牌")
+        return None
+
+    return check
+
+
+manual_generation_access = admin_access("ENABLE_MANUAL_GENERATION", "手动生成")
+channel_admin_access = admin_access("ENABLE_CHANNEL_ADMIN", "频道管理")
+api_key_admin_access = admin_access("ENABLE_API_KEY_ADMIN", "API密钥管理")
+
+
+@app.post(
+    "/admin/generate",
+    summary="手动生成语录",
+    description="手动触发生成指定日期的语录。注意：此接口可通过环境变量ENABLE_MANUAL_GENERATION控制是否启用，调用时需在请求头X-Admin-Token中携带ADMIN_TOKEN。",
+    dependencies=[Depends(limit_generation)]
+)
+async def manual_generate(
+    target_date: str,
+    channel: str = DEFAULT_CHANNEL_SLUG,
+    disabled: Optional[dict] = Depends(manual_generation_access)
+):
     """手动生成语录"""
-    # 检查是否启用手动生成功能
-    enable_manual_generation = os.getenv("ENABLE_MANUAL_GENERATION", "False").lower() == "true"
+    if disabled:
+        return disabled
+
+    result = await quote_scheduler.manual_generate_quote(target_date, channel)
+    return result
 
-    if not enable_manual_generation:
+
+@app.post("/admin/channels", summary="创建频道", description="创建新的语录频道。注意：此接口可通过环境变量ENABLE_CHANNEL_ADMIN控制是否启用，调用时需在请求头X-Admin-Token中携带ADMIN_TOKEN。")
+async def admin_create_channel(data: ChannelCreate, disabled: Optional[dict] = Depends(channel_admin_access)):
+    """创建频道"""
+    if disabled:
+        return disabled
+
+    try:
+        channel = await create_channel(data)
+    except IntegrityError:
         return {
             "success": False,
-            "message": "手动生成功能已被禁用。如需启用，请在.env文件中设置ENABLE_MANUAL_GENERATION=True"
+            "message": f"频道 {data.slug} 已存在"
+        }
+    except Exception as e:
+        logger.error(f"创建频道 {data.slug} 失败: {e}")
+        return {
+            "success": False,
+            "message": "创建频道失败，请查看服务日志"
         }
 
-    result = await quote_scheduler.manual_generate_quote(target_date)
-    return result
+    return {
+        "success": True,
+        "data": channel,
+        "message": "频道创建成功"
+    }
+
+
+@app.get("/admin/api-keys", summary="API密钥列表", description="列出所有API密钥及其用量。注意：此接口可通过环境变量ENABLE_API_KEY_ADMIN控制是否启用，调用时需在请求头X-Admin-Token中携带ADMIN_TOKEN。")
+async def admin_list_api_keys(disabled: Optional[dict] = Depends(api_key_admin_access)):
+    """列出API密钥"""
+    if disabled:
+        return disabled
+
+    return {
+        "success": True,
+        "data": await list_api_keys(),
+        "auth": api_key_auth.get_status(),
+        "message": "获取成功"
+    }
+
+
+@app.post("/admin/api-keys", summary="创建API密钥", description="为合作方创建API密钥，明文密钥只在响应中返回一次。注意：此接口可通过环境变量ENABLE_API_KEY_ADMIN控制是否启用，调用时需在请求头X-Admin-Token中携带ADMIN_TOKEN。")
+async def admin_create_api_key(data: ApiKeyCreate, disabled: Optional[dict] = Depends(api_key_admin_access)):
+    """创建API密钥"""
+    if disabled:
+        return disabled
+
+    return {
+        "success": True,
+        "data": await create_api_key(data),
+        "message": "API密钥创建成功，请妥善保存，密钥不会再次显示"
+    }
+
+
+@app.delete("/admin/api-keys/{key_id}", summary="吊销API密钥", description="吊销API密钥。注意：此接口可通过环境变量ENABLE_API_KEY_ADMIN控制是否启用，调用时需在请求头X-Admin-Token中携带ADMIN_TOKEN。")
+async def admin_revoke_api_key(key_id: int, disabled: Optional[dict] = Depends(api_key_admin_access)):
+    """吊销API密钥"""
+    if disabled:
+        return disabled
+
+    api_key = await revoke_api_key(key_id)
+    if api_key is None:
+        return {
+            "success": False,
+            "message": f"API密钥 {key_id} 不存在"
+        }
+
+    return {
+        "success": True,
+        "data": api_key,
+        "message": "API密钥已吊销"
+    }
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="每日一言系统")
+    parser.add_argument("--role", choices=ROLES, help="进程角色，默认读取环境变量 APP_ROLE（未设置时为 all）")
+    args = parser.parse_args()
+    if args.role:
+        os.environ["APP_ROLE"] = args.role
+
     # 从环境变量获取配置
     host = os.getenv("APP_HOST", "0.0.0.0")
     port = int(os.getenv("APP_PORT", "8000"))
@@ -173,8 +430,8 @@ if __name__ == "__main__":
 ╚══════════════════════════════════════════════════════════════╝
     """)
     
-    # 检查必要的环境变量
-    if not os.getenv("OPENAI_API_KEY"):
+    # 检查必要的环境变量（api 角色不调用模型）
+    if runs_generation() and not os.getenv("OPENAI_API_KEY"):
         print("⚠️  警告: 未设置 OPENAI_API_KEY 环境变量")
         print("   请在 .env 文件中配置您的 OpenAI API Key")
         print("   示例: OPENAI_API_KEY=your_api_key_here")
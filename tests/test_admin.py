@@ -0,0 +1,61 @@
+"""
+管理接口访问控制测试
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.rate_limit import rate_limiter
+
+client = TestClient(main.app)
+TOKEN = "s3cret-admin-token"
+CHANNEL = {"slug": "en", "name": "English", "language": "en"}
+
+
+@pytest.fixture(autouse=True)
+def fresh_buckets(monkeypatch):
+    """生成接口按客户端限流，每个测试使用新的令牌桶"""
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+
+
+@pytest.fixture
+def admin_env(monkeypatch, app_db):
+    monkeypatch.setenv("ENABLE_CHANNEL_ADMIN", "True")
+    monkeypatch.setenv("ENABLE_MANUAL_GENERATION", "True")
+    monkeypatch.setenv("ADMIN_TOKEN", TOKEN)
+
+
+def test_disabled_without_flag(monkeypatch):
+    monkeypatch.delenv("ENABLE_CHANNEL_ADMIN", raising=False)
+    monkeypatch.setenv("ADMIN_TOKEN", TOKEN)
+    body = client.post("/admin/channels", json=CHANNEL, headers={"X-Admin-Token": TOKEN}).json()
+    assert body["success"] is False
+    assert "ENABLE_CHANNEL_ADMIN" in body["message"]
+
+
+def test_unavailable_without_admin_token(monkeypatch):
+    monkeypatch.setenv("ENABLE_MANUAL_GENERATION", "True")
+    monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+    body = client.post("/admin/generate", params={"target_date": "2025-07-04"}).json()
+    assert body["success"] is False
+    assert "ADMIN_TOKEN" in body["message"]
+
+
+@pytest.mark.parametrize("path, kwargs", [
+    ("/admin/channels", {"json": CHANNEL}),
+    ("/admin/generate", {"params": {"target_date": "2025-07-04"}}),
+])
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}])
+def test_rejects_missing_or_wrong_token(admin_env, path, kwargs, headers):
+    response = client.post(path, headers=headers, **kwargs)
+    assert response.status_code == 401
+
+
+def test_create_channel_with_token(admin_env):
+    headers = {"X-Admin-Token": TOKEN}
+    created = client.post("/admin/channels", json=CHANNEL, headers=headers).json()
+    assert created["success"] is True
+    assert created["data"]["slug"] == "en"
+
+    duplicate = client.post("/admin/channels", json=CHANNEL, headers=headers).json()
+    assert duplicate == {"success": False, "message": "频道 en 已存在"}
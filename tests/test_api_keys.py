@@ -0,0 +1,158 @@
+"""
+API密钥认证测试：验证缓存、吊销、用量写入和中间件
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from conftest import run
+from app import api_keys
+from app.api_keys import ApiKeyAuth, ApiKeyCreate, ApiKeyMiddleware, create_api_key, list_api_keys, revoke_api_key
+
+
+@pytest.fixture
+def auth(monkeypatch, app_db):
+    """启用认证的新实例，并替换模块中的全局实例（创建和吊销密钥时会清除它的缓存）"""
+    monkeypatch.setenv("API_KEY_AUTH", "True")
+    instance = ApiKeyAuth()
+    monkeypatch.setattr(api_keys, "api_key_auth", instance)
+    return instance
+
+
+def test_hash_key_uses_pepper(monkeypatch):
+    plain = ApiKeyAuth()
+    monkeypatch.setenv("API_KEY_PEPPER", "pepper")
+    peppered = ApiKeyAuth()
+    assert plain.hash_key("dq_abc") == plain.hash_key("dq_abc")
+    assert len(plain.hash_key("dq_abc")) == 64
+    assert peppered.hash_key("dq_abc") != plain.hash_key("dq_abc")
+
+
+def test_verify_caches_valid_key(auth):
+    async def scenario():
+        created = await create_api_key(ApiKeyCreate(tenant="acme", name="test"))
+        first = await auth.verify(created["key"])
+        second = await auth.verify(created["key"])
+        return created, first, second
+
+    created, first, second = run(scenario())
+    assert created["key"].startswith("dq_")
+    assert "key_hash" not in created
+    assert first.tenant == second.tenant == "acme"
+    assert first.id == created["id"]
+    assert (auth.misses, auth.hits, auth.rejected) == (1, 1, 0)
+
+
+def test_invalid_key_is_negatively_cached(auth):
+    async def scenario():
+        return [await auth.verify("dq_unknown") for _ in range(3)]
+
+    assert run(scenario()) == [None, None, None]
+    assert auth.misses == 1
+    assert auth.hits == 2
+    assert auth.rejected == 3
+
+
+def test_missing_or_oversized_key_skips_lookup(auth):
+    async def scenario():
+        return await auth.verify(None), await auth.verify("dq_" + "x" * 200)
+
+    assert run(scenario()) == (None, None)
+    assert auth.misses == 0
+    assert auth.rejected == 2
+
+
+def test_concurrent_misses_share_one_lookup(auth, monkeypatch):
+    calls = []
+    lookup = auth._lookup
+
+    async def counting_lookup(key_hash):
+        calls.append(key_hash)
+        await asyncio.sleep(0.01)
+        return await lookup(key_hash)
+
+    monkeypatch.setattr(auth, "_lookup", counting_lookup)
+
+    async def scenario():
+        created = await create_api_key(ApiKeyCreate(tenant="acme"))
+        return await asyncio.gather(*(auth.verify(created["key"]) for _ in range(5)))
+
+    results = run(scenario())
+    assert len(calls) == 1
+    assert all(info is not None and info.tenant == "acme" for info in results)
+
+
+def test_revoke_invalidates_cached_key(auth):
+    async def scenario():
+        created = await create_api_key(ApiKeyCreate(tenant="acme"))
+        assert await auth.verify(created["key"]) is not None
+        revoked = await revoke_api_key(created["id"])
+        return revoked, await auth.verify(created["key"]), await revoke_api_key(created["id"] + 100)
+
+    revoked, after, missing = run(scenario())
+    assert revoked["is_active"] is False
+    assert after is None
+    assert missing is None
+
+
+def test_flush_writes_usage(auth):
+    async def scenario():
+        created = await create_api_key(ApiKeyCreate(tenant="acme"))
+        info = await auth.verify(created["key"])
+        for _ in range(3):
+            auth.record(info)
+        flushed = await auth.flush()
+        again = await auth.flush()
+        return flushed, again, await list_api_keys()
+
+    flushed, again, keys = run(scenario())
+    assert (flushed, again) == (1, 0)
+    assert keys[0]["request_count"] == 3
+    assert keys[0]["last_used_at"] is not None
+    status = auth.get_status()
+    assert status["pending_usage"] == 0
+    assert status["tenant_requests"] == {"acme": 3}
+
+
+def _client(auth: ApiKeyAuth) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/api/quote")
+    async def quote(request: Request):
+        return {"tenant": getattr(request.state, "api_tenant", None)}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    return TestClient(ApiKeyMiddleware(app, auth=auth))
+
+
+def test_middleware_rejects_and_accepts(auth):
+    created = run(create_api_key(ApiKeyCreate(tenant="acme")))
+    client = _client(auth)
+
+    response = client.get("/api/quote")
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+    assert client.get("/api/quote", headers={"X-API-Key": "dq_wrong"}).status_code == 401
+    assert client.get("/health").status_code == 200
+
+    response = client.get("/api/quote", headers={"X-API-Key": created["key"]})
+    assert response.status_code == 200
+    assert response.json() == {"tenant": "acme"}
+
+    response = client.get("/api/quote", headers={"Authorization": f"Bearer {created['key']}"})
+    assert response.json() == {"tenant": "acme"}
+    assert auth.get_status()["pending_usage"] == 2
+
+
+def test_middleware_passes_through_when_disabled(auth):
+    auth.enabled = False
+    client = _client(auth)
+    response = client.get("/api/quote")
+    assert response.status_code == 200
+    assert response.json() == {"tenant": None}
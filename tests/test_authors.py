@@ -0,0 +1,68 @@
+"""
+作者归一化测试：别名匹配和启动时回填语录作者
+"""
+from datetime import date
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, async_engine
+from app.models import Author, DailyQuote
+from app.authors import sync_authors
+from app.validation import match_author, normalize_author
+from conftest import run
+
+ALIASES = {
+    normalize_author(alias): author_id
+    for author_id, names in {
+        1: ["弗里德里希·尼采", "尼采", "Friedrich Nietzsche", "Nietzsche"],
+        2: ["约翰·斯图尔特·密尔", "密尔", "John Stuart Mill", "Mill"],
+        3: ["威廉·詹姆斯", "William James"],
+        4: ["亨利·詹姆斯", "Henry James"],
+    }.items()
+    for alias in names
+}
+
+
+def test_match_whole_name_and_alias():
+    assert match_author(ALIASES, "Friedrich Nietzsche") == 1
+    assert match_author(ALIASES, "弗里德里希 · 尼采") == 1
+    assert match_author(ALIASES, "mill") == 2
+    assert match_author(ALIASES, "康德") is None
+
+
+def test_match_surname_only_when_unambiguous():
+    # 名字开头与已知全名一致时按姓匹配
+    assert match_author(ALIASES, "Friedrich Wilhelm Nietzsche") == 1
+    assert match_author(ALIASES, "弗里德里希·威廉·尼采") == 1
+    assert match_author(ALIASES, "F. Nietzsche") == 1
+    # 同姓的另一个人
+    assert match_author(ALIASES, "詹姆斯·密尔") is None
+    assert match_author(ALIASES, "James Mill") is None
+    # 多位作者同姓
+    assert match_author(ALIASES, "William H. James") is None
+
+
+def test_sync_authors_backfills_quotes(app_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                DailyQuote(content="一", author="Friedrich Wilhelm Nietzsche", date=date(2025, 7, 1)),
+                DailyQuote(content="二", author="詹姆斯·密尔", date=date(2025, 7, 2)),
+                DailyQuote(content="三", author="佚名", date=date(2025, 7, 3)),
+            ])
+            await db.commit()
+        async with async_engine.begin() as conn:
+            await conn.run_sync(sync_authors)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(DailyQuote.author, Author.name)
+                .outerjoin(Author, Author.id == DailyQuote.author_id)
+                .order_by(DailyQuote.date)
+            )).all()
+        return [tuple(row) for row in rows]
+
+    assert run(main()) == [
+        ("弗里德里希·尼采", "弗里德里希·尼采"),
+        ("詹姆斯·密尔", "詹姆斯·密尔"),
+        ("佚名", None),
+    ]
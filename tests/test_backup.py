@@ -0,0 +1,86 @@
+"""
+SQLite在线备份测试：快照内容、分步复制、轮换和失败统计
+"""
+import gzip
+import sqlite3
+
+import pytest
+
+from app.backup import DatabaseBackup, BACKUP_SUFFIX
+from conftest import run
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "quotes.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE quotes (id INTEGER PRIMARY KEY, content TEXT)")
+        conn.executemany("INSERT INTO quotes (content) VALUES (?)", [(f"语录{i}" * 20,) for i in range(500)])
+    return path
+
+
+@pytest.fixture
+def backup(monkeypatch, tmp_path, source):
+    monkeypatch.setenv("BACKUP_DIR", str(tmp_path / "backups"))
+    monkeypatch.setenv("BACKUP_KEEP", "2")
+    monkeypatch.setenv("BACKUP_PAGES_PER_STEP", "4")
+    monkeypatch.setenv("BACKUP_STEP_SLEEP_MS", "0")
+    instance = DatabaseBackup()
+    instance.source = source
+    return instance
+
+
+def _restore(snapshot, tmp_path):
+    restored = tmp_path / "restored.db"
+    with gzip.open(snapshot, "rb") as f:
+        restored.write_bytes(f.read())
+    with sqlite3.connect(restored) as conn:
+        return conn.execute("SELECT count(*), max(id) FROM quotes").fetchone()
+
+
+def test_snapshot_matches_source(backup, source, tmp_path):
+    result = run(backup.run())
+    assert result["file"].endswith(BACKUP_SUFFIX)
+    assert result["size_bytes"] == source.stat().st_size
+    assert result["compressed_bytes"] < result["size_bytes"]
+    # 每步只复制少量页
+    assert result["steps"] >= result["pages"] // 4
+    assert _restore(result["file"], tmp_path) == (500, 500)
+
+    status = backup.get_status()
+    assert (status["runs"], status["failures"], status["snapshots"]) == (1, 0, 1)
+    assert status["last_file"] == result["file"]
+    # 不留下临时文件
+    assert [path.name for path in backup.backup_dir.iterdir()] == [backup.snapshots()[0].name]
+
+
+def test_rotation_keeps_newest(backup):
+    backup.backup_dir.mkdir()
+    for stamp in ("20240101-040000", "20240102-040000", "20240103-040000"):
+        (backup.backup_dir / f"quotes-{stamp}{BACKUP_SUFFIX}").write_bytes(b"old")
+    (backup.backup_dir / f"other-20240101-040000{BACKUP_SUFFIX}").write_bytes(b"other")
+
+    result = run(backup.run())
+    names = [path.name for path in backup.snapshots()]
+    assert names == [f"quotes-20240103-040000{BACKUP_SUFFIX}", result["file"].rsplit("/", 1)[-1]]
+    # 其他数据库的快照不受影响
+    assert (backup.backup_dir / f"other-20240101-040000{BACKUP_SUFFIX}").exists()
+
+
+def test_failure_is_recorded(backup, source):
+    source.write_bytes(b"not a database" * 100)
+    assert run(backup.run()) is None
+    status = backup.get_status()
+    assert status["failures"] == 1
+    assert status["last_error"]
+    assert backup.snapshots() == []
+
+
+def test_disabled_without_sqlite_source(monkeypatch, backup):
+    backup.source = None
+    assert not backup.enabled
+    assert run(backup.run()) is None
+    assert "snapshots" not in backup.get_status()
+
+    monkeypatch.setenv("BACKUP_ENABLED", "False")
+    assert not DatabaseBackup().enabled
@@ -0,0 +1,158 @@
+"""
+进程角色和跨进程缓存失效事件测试
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.cache_events import CacheEventBus, _utcnow
+from app.database import AsyncSessionLocal
+from app.models import CacheEvent, DailyQuote
+from app.roles import get_role, runs_generation
+from conftest import run
+
+DAY = date(2025, 7, 4)
+
+
+def test_roles(monkeypatch):
+    monkeypatch.delenv("APP_ROLE", raising=False)
+    assert get_role() == "all"
+    assert runs_generation()
+
+    monkeypatch.setenv("APP_ROLE", " API ")
+    assert get_role() == "api"
+    assert not runs_generation()
+
+    monkeypatch.setenv("APP_ROLE", "worker")
+    assert runs_generation()
+
+    monkeypatch.setenv("APP_ROLE", "scheduler")
+    with pytest.raises(ValueError):
+        get_role()
+
+
+def _bus(applied: list) -> CacheEventBus:
+    """不刷新全局缓存、只记录刷新了哪些语录的事件总线"""
+    bus = CacheEventBus()
+    bus.apply_local = lambda quote: applied.append((quote.channel_id, quote.date, quote.content))
+    return bus
+
+
+async def _add_quote(content: str = "知人者智，自知者明。", day: date = DAY) -> DailyQuote:
+    async with AsyncSessionLocal() as db:
+        quote = DailyQuote(channel_id=1, date=day, content=content, author="老子")
+        db.add(quote)
+        await db.commit()
+        await db.refresh(quote)
+        return quote
+
+
+@pytest.fixture
+def buses(app_db):
+    writer_applied, reader_applied = [], []
+    return _bus(writer_applied), writer_applied, _bus(reader_applied), reader_applied
+
+
+def test_other_process_applies_written_quote(buses):
+    writer, writer_applied, reader, reader_applied = buses
+
+    async def main():
+        quote = await _add_quote()
+        await writer.quote_written(quote)
+        return await reader.poll(), await reader.poll(), await writer.poll()
+
+    assert run(main()) == (1, 0, 0)
+    # 写入进程直接刷新自己的缓存，不再处理自己的事件
+    assert writer_applied == [(1, DAY, "知人者智，自知者明。")]
+    assert reader_applied == [(1, DAY, "知人者智，自知者明。")]
+    assert writer.published == 1
+    assert reader.applied == 1
+    assert reader.get_status()["last_event_id"] == 1
+
+
+def test_events_for_same_quote_are_applied_once(buses):
+    writer, _, reader, reader_applied = buses
+
+    async def main():
+        quote = await _add_quote()
+        await writer.quote_written(quote)
+        await writer.quote_written(quote)
+        return await reader.poll()
+
+    assert run(main()) == 1
+    assert len(reader_applied) == 1
+
+
+def _event(event_id: int, origin: str = "other", created_at: datetime = None) -> CacheEvent:
+    return CacheEvent(
+        id=event_id, channel_id=1, date=DAY, origin=origin, created_at=created_at or datetime(2025, 7, 4)
+    )
+
+
+async def _add_events(*events):
+    async with AsyncSessionLocal() as db:
+        db.add_all(events)
+        await db.commit()
+
+
+def test_late_committed_event_is_picked_up(buses):
+    _, _, reader, reader_applied = buses
+
+    async def main():
+        await _add_quote()
+        await _add_events(_event(5))
+        first = await reader.poll()
+        # ID较小的事件晚于ID 5 提交
+        await _add_events(_event(3))
+        return first, await reader.poll(), await reader.poll()
+
+    assert run(main()) == (1, 1, 0)
+    assert reader.late == 1
+    assert len(reader_applied) == 2
+
+
+def test_event_outside_lookback_is_skipped(buses):
+    _, _, reader, reader_applied = buses
+    reader.lookback = 2
+
+    async def main():
+        await _add_quote()
+        await _add_events(_event(10))
+        await reader.poll()
+        await _add_events(_event(7))
+        return await reader.poll()
+
+    assert run(main()) == 0
+    assert reader.get_status()["last_event_id"] == 10
+    assert len(reader_applied) == 1
+
+
+def test_start_skips_existing_events(buses):
+    _, _, reader, reader_applied = buses
+    reader.poll_interval = 3600
+
+    async def main():
+        await _add_quote()
+        await _add_events(_event(1), _event(2))
+        await reader.start()
+        listening = reader.get_status()["listening"]
+        await reader.stop()
+        return listening, await reader.poll()
+
+    assert run(main()) == (True, 0)
+    assert reader.get_status()["last_event_id"] == 2
+    assert reader_applied == []
+
+
+def test_purge_removes_expired_events(buses):
+    writer = buses[0]
+    now = _utcnow()
+
+    async def main():
+        await _add_events(_event(1, created_at=now - timedelta(days=2)), _event(2, created_at=now))
+        await writer.purge()
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(CacheEvent.id))).scalars().all()
+
+    assert run(main()) == [2]
@@ -0,0 +1,93 @@
+"""
+候选缓存测试：取用、过期和淘汰都按写入时间先进先出
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import candidate_cache as candidate_cache_module
+from app.candidate_cache import CandidateCache
+from conftest import run
+
+PROMPT = "prompt-a"
+
+
+@pytest.fixture
+def clock(monkeypatch, app_db):
+    """可手动推进的UTC时钟"""
+    now = [datetime(2025, 7, 4, 12, 0)]
+    monkeypatch.setattr(candidate_cache_module, "_utcnow", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setenv("CANDIDATE_CACHE_SIZE", "3")
+    monkeypatch.setenv("CANDIDATE_CACHE_TTL_DAYS", "1")
+    return CandidateCache()
+
+
+def _accept_all(content, author):
+    return True
+
+
+async def _drain(cache, channel_id=1, prompt_key=PROMPT):
+    taken = []
+    while (item := await cache.take(channel_id, prompt_key, _accept_all)) is not None:
+        taken.append(item[0])
+    return taken
+
+
+def test_take_in_write_order(cache, clock):
+    cache.max_size = 10
+
+    async def main():
+        await cache.put(1, PROMPT, [("甲", "老子"), ("乙", "庄子")])
+        clock[0] += timedelta(minutes=1)
+        await cache.put(1, PROMPT, [("丙", "孔子")])
+        # 其他提示词和频道的候选互不影响
+        await cache.put(1, "prompt-b", [("丁", "孟子")])
+        await cache.put(2, PROMPT, [("戊", "荀子")])
+        return await _drain(cache)
+
+    assert run(main()) == ["甲", "乙", "丙"]
+    assert cache.hits == 3
+
+
+def test_duplicate_does_not_refresh_order(cache, clock):
+    """再次生成已缓存的语录不会让它排到后面，超出容量时仍最先被淘汰"""
+    async def main():
+        await cache.put(1, PROMPT, [("甲", "老子")])
+        clock[0] += timedelta(minutes=1)
+        await cache.put(1, PROMPT, [("乙", "庄子"), ("丙", "孔子")])
+        clock[0] += timedelta(minutes=1)
+        added = await cache.put(1, PROMPT, [("甲", "老子"), ("丁", "孟子")])
+        return added, await _drain(cache)
+
+    added, taken = run(main())
+    assert added == 1
+    assert taken == ["乙", "丙", "丁"]
+    assert cache.evicted == 1
+
+
+def test_expired_candidates_are_skipped_and_removed(cache, clock):
+    async def main():
+        await cache.put(1, PROMPT, [("甲", "老子")])
+        clock[0] += timedelta(days=2)
+        expired = await cache.take(1, PROMPT, _accept_all)
+        await cache.put(1, PROMPT, [("乙", "庄子")])
+        return expired, await cache.size(), await _drain(cache)
+
+    expired, size, taken = run(main())
+    assert expired is None
+    assert size == {1: 1}
+    assert taken == ["乙"]
+
+
+def test_rejected_candidate_is_discarded(cache, clock):
+    async def main():
+        await cache.put(1, PROMPT, [("甲", "老子"), ("乙", "庄子")])
+        first = await cache.take(1, PROMPT, lambda content, author: content != "甲")
+        return first, await cache.size()
+
+    assert run(main()) == (("乙", "庄子"), {})
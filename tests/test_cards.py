@@ -0,0 +1,132 @@
+"""
+语录卡片测试：绘制、内存和磁盘缓存、ETag
+"""
+import io
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import main
+from app import cards
+from app.card_render import render_card, CARD_WIDTH, CARD_HEIGHT
+from app.cards import CardRenderer, CardUnavailableError, find_font
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from conftest import run
+
+QUOTE = {"content": "知人者智，自知者明。胜人者有力，自胜者强。", "author": "老子", "date": "2025-07-04"}
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """用线程池和假的绘制函数代替渲染进程池，记录每次绘制"""
+    calls = []
+    lock = threading.Lock()
+
+    def fake_render(content, author, date_str, theme, font_path):
+        with lock:
+            calls.append((date_str, theme))
+        return f"{theme}:{date_str}".encode("utf-8") * 10
+
+    monkeypatch.setattr(cards, "render_card", fake_render)
+    monkeypatch.setattr(CardRenderer, "_get_pool", lambda self: ThreadPoolExecutor(max_workers=2))
+    return calls
+
+
+@pytest.fixture
+def renderer(monkeypatch, tmp_path):
+    monkeypatch.setenv("CARD_CACHE_DIR", str(tmp_path / "cards"))
+    return _renderer()
+
+
+def _renderer() -> CardRenderer:
+    renderer = CardRenderer()
+    renderer.font_path = "test-font.ttf"
+    return renderer
+
+
+def test_concurrent_requests_render_once(renderer, renders):
+    async def main():
+        return await asyncio.gather(*(renderer.get_card(QUOTE, "light") for _ in range(5)))
+
+    images = run(main())
+    assert len(set(images)) == 1
+    assert renders == [("2025-07-04", "light")]
+
+
+def test_memory_then_disk_cache(renderer, renders):
+    first = run(renderer.get_card(QUOTE, "light"))
+    again = run(renderer.get_card(QUOTE, "light"))
+    assert again == first
+    assert renderer.memory_hits == 1
+
+    # 新进程：内存为空，从磁盘缓存读取
+    restarted = _renderer()
+    assert run(restarted.get_card(QUOTE, "light")) == first
+    assert restarted.disk_hits == 1
+
+    run(renderer.get_card(QUOTE, "dark"))
+    assert renders == [("2025-07-04", "light"), ("2025-07-04", "dark")]
+
+
+def test_memory_cache_evicts_least_recently_used(renderer, renders):
+    renderer.memory_limit = 350
+    for day in ("2025-07-01", "2025-07-02", "2025-07-01", "2025-07-03"):
+        run(renderer.get_card({**QUOTE, "date": day}, "light"))
+
+    cached = {key for key in renderer._memory}
+    expected = {renderer.cache_key(QUOTE["content"], QUOTE["author"], day, "light") for day in ("2025-07-01", "2025-07-03")}
+    assert cached == expected
+    assert renderer._memory_bytes <= renderer.memory_limit
+
+
+def test_missing_font_is_reported(renderer, monkeypatch):
+    monkeypatch.setenv("CARD_FONT_PATH", "/nonexistent/font.ttf")
+    assert find_font() is None
+    renderer.font_path = None
+    with pytest.raises(CardUnavailableError, match="CARD_FONT_PATH"):
+        run(renderer.get_card(QUOTE, "light"))
+
+
+def test_render_card_with_installed_font():
+    font_path = find_font()
+    if font_path is None:
+        pytest.skip("未找到中文字体")
+    image = Image.open(io.BytesIO(render_card(QUOTE["content"], QUOTE["author"], QUOTE["date"], "dark", font_path)))
+    assert image.format == "PNG"
+    assert image.size == (CARD_WIDTH, CARD_HEIGHT)
+
+
+def test_card_endpoint_etag(app_db, renders, monkeypatch, tmp_path):
+    monkeypatch.setattr(cards.card_renderer, "font_path", "test-font.ttf")
+    monkeypatch.setattr(cards.card_renderer, "cache_dir", tmp_path / "cards")
+    monkeypatch.setattr(cards.card_renderer, "_memory", type(cards.card_renderer._memory)())
+
+    async def add_quote():
+        async with AsyncSessionLocal() as db:
+            db.add(DailyQuote(content=QUOTE["content"], author=QUOTE["author"], date=date(2025, 7, 4)))
+            await db.commit()
+
+    run(add_quote())
+    client = TestClient(main.app)
+
+    response = client.get("/api/quote/2025-07-04/card.png")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    etag = response.headers["etag"]
+
+    cached = client.get("/api/quote/2025-07-04/card.png", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    # 不同主题是不同的图片
+    dark = client.get("/api/quote/2025-07-04/card.png", params={"theme": "dark"})
+    assert dark.headers["etag"] != etag
+    assert renders == [("2025-07-04", "light"), ("2025-07-04", "dark")]
+
+    monkeypatch.setattr(cards.card_renderer, "font_path", None)
+    assert client.get("/api/quote/2025-07-04/card.png", params={"theme": "dark"}).status_code == 503
@@ -0,0 +1,27 @@
+"""
+频道标识校验测试
+"""
+import pytest
+from pydantic import ValidationError
+
+from app.api import router
+from app.channels import ChannelCreate, RESERVED_SLUGS
+
+
+@pytest.mark.parametrize("slug", sorted(RESERVED_SLUGS))
+def test_reserved_slugs_are_rejected(slug):
+    with pytest.raises(ValidationError):
+        ChannelCreate(slug=slug, name="测试")
+
+
+def test_regular_slug_is_accepted():
+    assert ChannelCreate(slug="english-quotes", name="English").slug == "english-quotes"
+
+
+def test_reserved_slugs_cover_fixed_routes():
+    """新增固定路由时需要同步更新 RESERVED_SLUGS"""
+    first_segments = {
+        route.path.strip("/").split("/")[0] for route in router.routes
+    }
+    fixed = {segment for segment in first_segments if segment and not segment.startswith("{")}
+    assert fixed <= RESERVED_SLUGS
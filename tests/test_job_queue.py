@@ -0,0 +1,119 @@
+"""
+任务队列测试：幂等提交、领取、租约过期和失败重试
+"""
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app import job_queue as job_queue_module
+from app.ai_service import ai_service
+from app.database import AsyncSessionLocal
+from app.job_queue import JobQueue, JOB_PENDING, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+from app.models import GenerationJob
+from conftest import run
+
+TARGET_DATE = "2025-07-04"
+
+
+@pytest.fixture
+def queue(monkeypatch, app_db):
+    monkeypatch.setenv("JOB_MAX_ATTEMPTS", "2")
+    monkeypatch.setenv("JOB_RETRY_BASE_SECONDS", "60")
+    return JobQueue()
+
+
+def _second_worker() -> JobQueue:
+    """另一个进程中的任务队列"""
+    other = JobQueue()
+    other.worker_id = "other-worker"
+    return other
+
+
+async def _expire_lease(job_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(GenerationJob).where(GenerationJob.id == job_id)
+            .values(lease_expires_at=job_queue_module._utcnow() - timedelta(seconds=1))
+        )
+        await db.commit()
+
+
+def test_enqueue_is_idempotent(queue):
+    async def main():
+        first = await queue.enqueue(TARGET_DATE, "default")
+        second = await queue.enqueue(TARGET_DATE, "default")
+        other_day = await queue.enqueue("2025-07-05", "default")
+        return first, second, other_day
+
+    first, second, other_day = run(main())
+    assert first["id"] == second["id"]
+    assert first["status"] == JOB_PENDING
+    assert other_day["id"] != first["id"]
+
+
+def test_claim_is_exclusive(queue):
+    async def main():
+        await queue.enqueue(TARGET_DATE, "default")
+        claimed = await queue._claim()
+        return claimed, await _second_worker()._claim(), await queue._claim()
+
+    claimed, by_other, again = run(main())
+    assert claimed.status == JOB_RUNNING
+    assert claimed.lease_owner == queue.worker_id
+    assert claimed.attempts == 1
+    assert by_other is None and again is None
+
+
+def test_expired_lease_is_reclaimed_and_stale_result_dropped(queue):
+    """租约过期后任务被其他工作进程领取，原执行者的结果不再写入"""
+    other = _second_worker()
+
+    async def main():
+        await queue.enqueue(TARGET_DATE, "default")
+        stale = await queue._claim()
+        await _expire_lease(stale.id)
+        current = await other._claim()
+
+        stale_finished = await queue._finish(stale, JOB_FAILED, error="超时")
+        stale_retried = await queue._retry_later(stale, 0, "超时")
+        current_finished = await other._finish(current, JOB_SUCCEEDED, result={"success": True})
+        return current, stale_finished, stale_retried, current_finished, await queue.get(stale.id)
+
+    current, stale_finished, stale_retried, current_finished, job = run(main())
+    assert current.lease_owner == "other-worker"
+    assert current.attempts == 2
+    assert (stale_finished, stale_retried, current_finished) == (False, False, True)
+    assert job["status"] == JOB_SUCCEEDED
+    assert job["error"] is None
+
+
+def test_failed_run_is_retried_with_backoff_then_fails(queue, monkeypatch):
+    async def fail(target_date, channel):
+        return {"success": False, "message": "模型不可用"}
+
+    monkeypatch.setattr(ai_service, "generate_daily_quote", fail)
+
+    async def main():
+        queued = await queue.enqueue(TARGET_DATE, "default")
+        await queue._run(await queue._claim())
+        retrying = await queue.get(queued["id"])
+        # 退避期间不会被领取
+        not_yet = await queue._claim()
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(GenerationJob).where(GenerationJob.id == queued["id"])
+                .values(run_after=job_queue_module._utcnow())
+            )
+            await db.commit()
+        await queue._run(await queue._claim())
+        return retrying, not_yet, await queue.get(queued["id"])
+
+    retrying, not_yet, failed = run(main())
+    assert retrying["status"] == JOB_PENDING
+    assert retrying["error"] == "模型不可用"
+    assert not_yet is None
+    assert failed["status"] == JOB_FAILED
+    assert failed["attempts"] == 2
+    assert queue.failed == 1
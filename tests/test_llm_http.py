@@ -0,0 +1,119 @@
+"""
+LLM接口连接池测试：预热、连接复用统计和连接失败
+"""
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.llm_http import LLMConnectionPool, _RequestTrace
+from conftest import run
+
+
+class _ModelsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    paths = []
+
+    def do_GET(self):
+        self.paths.append((self.path, self.headers.get("Authorization")))
+        body = b'{"data": []}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _ModelsHandler.paths = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ModelsHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/v1"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def pool_env(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OPENAI_HTTP2", "False")
+    monkeypatch.setenv("OPENAI_CONNECT_TIMEOUT", "2")
+
+
+def test_prewarm_connection_is_reused(server, pool_env, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", server + "/")
+    pool = LLMConnectionPool()
+
+    async def main():
+        await pool.prewarm()
+        response = await pool.client.post(f"{pool.base_url}/chat/completions", content=b"{}")
+        await response.aclose()
+        await pool.close()
+
+    run(main())
+    assert _ModelsHandler.paths[0] == ("/v1/models", "Bearer sk-test")
+    status = pool.get_status()
+    assert status["base_url"] == server
+    assert status["prewarms"] == 1
+    assert status["requests"] == 2
+    # 预热建立的连接被生成请求复用
+    assert status["new_connections"] == 1
+    assert status["reused_connections"] == 1
+    assert status["avg_connect_ms"] is not None
+    assert status["avg_tls_ms"] is None
+    assert status["http_versions"] == {"HTTP/1.1": 2}
+
+
+def test_prewarm_skipped_without_api_key(monkeypatch, server):
+    monkeypatch.setenv("OPENAI_BASE_URL", server)
+    monkeypatch.setenv("OPENAI_API_KEY", "your_openai_api_key_here")
+    pool = LLMConnectionPool()
+    run(pool.prewarm())
+    assert pool.prewarms == 0
+    assert pool._client is None
+    assert _ModelsHandler.paths == []
+
+
+def test_prewarm_failure_is_counted(pool_env, monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{port}/v1")
+    pool = LLMConnectionPool()
+
+    async def main():
+        await pool.prewarm()
+        await pool.close()
+
+    run(main())
+    assert pool.prewarms == 0
+    assert pool.get_status()["connect_failures"] == 1
+
+
+def test_trace_records_tls_handshake():
+    pool = LLMConnectionPool()
+    trace = _RequestTrace(pool)
+
+    async def main():
+        for event in ("connection.connect_tcp.started", "connection.connect_tcp.complete",
+                      "connection.start_tls.started", "connection.start_tls.complete",
+                      "http11.send_request_headers.started"):
+            await trace(event, {})
+
+    run(main())
+    assert trace.connected
+    assert (pool.new_connections, pool.tls_handshakes) == (1, 1)
+    assert pool.get_status()["avg_tls_ms"] is not None
+
+
+def test_http2_requires_h2(monkeypatch):
+    monkeypatch.setattr("app.llm_http.HTTP2_AVAILABLE", False)
+    monkeypatch.setenv("OPENAI_HTTP2", "True")
+    pool = LLMConnectionPool()
+    assert pool.http2_requested and not pool.http2
@@ -0,0 +1,163 @@
+"""
+数据库迁移测试：新建数据库、旧版数据库升级和多进程并发执行
+"""
+import asyncio
+from datetime import date
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, Text, Boolean, DateTime, inspect, select, text, func
+)
+from sqlalchemy.sql import sqltypes
+
+from app.database import Base
+from app.migrations import MIGRATIONS, lock_schema, run_migrations
+from app.models import DailyQuote, QuoteGenerationLog, Channel, SchemaMigration, DEFAULT_CHANNEL_ID
+from conftest import run, backend_engine
+
+ALL_VERSIONS = sorted(m.version for m in MIGRATIONS)
+
+
+def _legacy_metadata() -> MetaData:
+    """最初版本的表结构：日期为字符串，date 唯一，没有频道"""
+    metadata = MetaData()
+    Table(
+        "daily_quotes", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("content", Text, nullable=False),
+        Column("author", String(100)),
+        Column("date", String(10), nullable=False, unique=True, index=True),
+        Column("created_at", DateTime),
+        Column("updated_at", DateTime),
+        Column("is_ai_generated", Boolean),
+        Column("generation_attempts", Integer),
+        Column("is_fallback", Boolean),
+    )
+    Table(
+        "quote_generation_logs", metadata,
+        Column("id", Integer, primary_key=True, index=True),
+        Column("date", String(10), nullable=False, index=True),
+        Column("attempt_number", Integer, nullable=False),
+        Column("success", Boolean, nullable=False),
+        Column("error_message", Text),
+        Column("generated_content", Text),
+        Column("created_at", DateTime),
+    )
+    return metadata
+
+
+def _upgrade(conn):
+    """与 create_tables_async 相同的启动流程"""
+    lock_schema(conn)
+    Base.metadata.create_all(conn)
+    return run_migrations(conn)
+
+
+def _schema(conn):
+    inspector = inspect(conn)
+    return {
+        table: {column["name"]: column["type"] for column in inspector.get_columns(table)}
+        for table in ("daily_quotes", "quote_generation_logs")
+    }
+
+
+def _index_names(conn, table: str):
+    return {index["name"] for index in inspect(conn).get_indexes(table)}
+
+
+def test_fresh_database_applies_all_migrations_once(database_url):
+    async def main():
+        async with backend_engine(database_url) as engine:
+            async with engine.begin() as conn:
+                first = await conn.run_sync(_upgrade)
+            async with engine.begin() as conn:
+                second = await conn.run_sync(_upgrade)
+                recorded = (await conn.execute(
+                    select(SchemaMigration.version).order_by(SchemaMigration.version)
+                )).scalars().all()
+                channels = (await conn.execute(select(Channel.id))).scalars().all()
+            return first, second, recorded, channels
+
+    first, second, recorded, channels = run(main())
+    assert first == ALL_VERSIONS
+    assert second == []
+    assert recorded == ALL_VERSIONS
+    assert channels == [DEFAULT_CHANNEL_ID]
+
+
+def test_legacy_database_is_upgraded(database_url):
+    legacy = _legacy_metadata()
+
+    async def main():
+        async with backend_engine(database_url) as engine:
+            async with engine.begin() as conn:
+                await conn.run_sync(legacy.create_all)
+                await conn.execute(legacy.tables["daily_quotes"].insert(), [
+                    {"content": "知人者智", "author": "老子", "date": "2025-07-03", "is_fallback": False},
+                    {"content": "自知者明", "author": "老子", "date": "2025-07-04", "is_fallback": True},
+                ])
+                await conn.execute(legacy.tables["quote_generation_logs"].insert(), [
+                    {"date": "2025-07-04", "attempt_number": 1, "success": False, "error_message": "超时"},
+                ])
+
+            async with engine.begin() as conn:
+                executed = await conn.run_sync(_upgrade)
+
+            async with engine.connect() as conn:
+                schema = await conn.run_sync(_schema)
+                quote_indexes = await conn.run_sync(_index_names, "daily_quotes")
+                quotes = (await conn.execute(
+                    select(DailyQuote.date, DailyQuote.channel_id, DailyQuote.content, DailyQuote.is_fallback)
+                    .order_by(DailyQuote.date)
+                )).all()
+                logs = (await conn.execute(
+                    select(QuoteGenerationLog.date, QuoteGenerationLog.channel_id, QuoteGenerationLog.reason_code)
+                )).all()
+                # 频道上线后同一日期可以有多个频道的语录
+                await conn.execute(Channel.__table__.insert().values(id=2, slug="en", name="English"))
+                await conn.execute(DailyQuote.__table__.insert().values(
+                    channel_id=2, content="Know thyself", author="Socrates", date=date(2025, 7, 4)
+                ))
+                same_day = (await conn.execute(
+                    select(func.count()).select_from(DailyQuote).where(DailyQuote.date == date(2025, 7, 4))
+                )).scalar_one()
+                await conn.rollback()
+            return executed, schema, quote_indexes, quotes, logs, same_day
+
+    executed, schema, quote_indexes, quotes, logs, same_day = run(main())
+    assert executed == ALL_VERSIONS
+
+    for table in ("daily_quotes", "quote_generation_logs"):
+        assert isinstance(schema[table]["date"], sqltypes.Date)
+        assert "channel_id" in schema[table]
+    assert {"reason_code", "prompt_template", "latency_ms"} <= set(schema["quote_generation_logs"])
+    assert "author_id" in schema["daily_quotes"]
+
+    assert "ix_daily_quotes_date" not in quote_indexes
+    assert {"ix_daily_quotes_channel_date", "ix_daily_quotes_fallback_date"} <= quote_indexes
+
+    assert quotes == [
+        (date(2025, 7, 3), DEFAULT_CHANNEL_ID, "知人者智", False),
+        (date(2025, 7, 4), DEFAULT_CHANNEL_ID, "自知者明", True),
+    ]
+    assert logs == [(date(2025, 7, 4), DEFAULT_CHANNEL_ID, None)]
+    assert same_day == 2
+
+
+def test_concurrent_startup_migrates_once(postgres_url):
+    """多个进程同时启动时由 advisory lock 串行执行，每个迁移只记录一次"""
+    async def main():
+        async with backend_engine(postgres_url) as engine:
+            async def upgrade():
+                async with engine.begin() as conn:
+                    return await conn.run_sync(_upgrade)
+
+            results = await asyncio.gather(*(upgrade() for _ in range(3)))
+            async with engine.connect() as conn:
+                counts = (await conn.execute(
+                    select(SchemaMigration.version, func.count()).group_by(SchemaMigration.version)
+                )).all()
+            return results, dict(counts)
+
+    results, counts = run(main())
+    assert sorted(results, key=len) == [[], [], ALL_VERSIONS]
+    assert counts == {version: 1 for version in ALL_VERSIONS}
@@ -0,0 +1,116 @@
+"""
+通知分发测试：Webhook 通过 httpx.MockTransport 对接本地模拟的接收方
+"""
+import hmac
+import json
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+
+from app.notifications import NotificationDispatcher, NotificationSink
+from conftest import run
+
+WEBHOOK_URL = "http://hooks.test/quotes"
+
+
+class Receiver:
+    """模拟的Webhook接收方：按预设状态码依次响应，记录收到的请求"""
+
+    def __init__(self, statuses=()):
+        self.statuses = list(statuses)
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        status = self.statuses.pop(0) if self.statuses else 200
+        return httpx.Response(status)
+
+    def batches(self):
+        return [json.loads(request.content)["events"] for request in self.requests]
+
+
+@pytest.fixture
+def notify_env(monkeypatch):
+    monkeypatch.setenv("NOTIFY_WEBHOOK_URLS", WEBHOOK_URL)
+    monkeypatch.delenv("NOTIFY_FILE_PATH", raising=False)
+    monkeypatch.setenv("NOTIFY_WEBHOOK_SECRET", "s3cret")
+    monkeypatch.setenv("NOTIFY_BATCH_SIZE", "3")
+    monkeypatch.setenv("NOTIFY_BATCH_WAIT_SECONDS", "0.05")
+    monkeypatch.setenv("NOTIFY_RETRY_BASE_SECONDS", "0.01")
+    monkeypatch.setenv("NOTIFY_MAX_RETRIES", "2")
+    monkeypatch.setenv("NOTIFY_DRAIN_SECONDS", "5")
+    return monkeypatch
+
+
+def _dispatch(receiver: Receiver, count: int, settle: float = 0.0):
+    """启动分发器，发布 count 个事件后停止（停止时会等待队列发送完毕）"""
+    async def main():
+        dispatcher = NotificationDispatcher(transport=httpx.MockTransport(receiver))
+        await dispatcher.start()
+        for i in range(count):
+            dispatcher.notify("generation.succeeded", {"seq": i})
+        await asyncio.sleep(settle)
+        await dispatcher.stop()
+        return dispatcher.sinks[0]
+
+    return run(main())
+
+
+def test_sink_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        NotificationSink("x")
+
+
+def test_webhook_batches_and_signs_events(notify_env):
+    receiver = Receiver()
+    sink = _dispatch(receiver, 5)
+
+    assert [len(batch) for batch in receiver.batches()] == [3, 2]
+    assert [event["seq"] for batch in receiver.batches() for event in batch] == list(range(5))
+    for request in receiver.requests:
+        assert str(request.url) == WEBHOOK_URL
+        expected = hmac.new(b"s3cret", request.content, hashlib.sha256).hexdigest()
+        assert request.headers["X-Signature-SHA256"] == expected
+    assert (sink.sent, sink.failed, sink.retries, sink.dropped) == (5, 0, 0, 0)
+
+
+def test_webhook_retries_with_backoff_until_success(notify_env):
+    receiver = Receiver(statuses=[500, 503])
+    sink = _dispatch(receiver, 2)
+
+    # 同一批事件投递了三次，最后一次成功
+    assert [len(batch) for batch in receiver.batches()] == [2, 2, 2]
+    assert (sink.sent, sink.failed, sink.retries) == (2, 0, 2)
+    assert "503" in sink.last_error
+
+
+def test_webhook_gives_up_after_max_retries(notify_env):
+    receiver = Receiver(statuses=[500] * 10)
+    sink = _dispatch(receiver, 1)
+
+    assert len(receiver.requests) == 3
+    assert (sink.sent, sink.failed, sink.retries) == (0, 1, 2)
+
+
+def test_full_queue_drops_new_events(notify_env):
+    notify_env.setenv("NOTIFY_QUEUE_SIZE", "2")
+    receiver = Receiver()
+    # 发布时投递协程尚未运行，队列只能容纳2个事件
+    sink = _dispatch(receiver, 5)
+
+    assert [event["seq"] for batch in receiver.batches() for event in batch] == [0, 1]
+    assert (sink.sent, sink.dropped) == (2, 3)
+
+
+def test_file_sink_appends_json_lines(notify_env, tmp_path):
+    path = tmp_path / "events.jsonl"
+    notify_env.delenv("NOTIFY_WEBHOOK_URLS")
+    notify_env.setenv("NOTIFY_FILE_PATH", str(path))
+    sink = _dispatch(Receiver(), 4)
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["seq"] for line in lines] == [0, 1, 2, 3]
+    assert all(line["type"] == "generation.succeeded" for line in lines)
+    assert sink.sent == 4
@@ -0,0 +1,120 @@
+"""
+前端离线缓存依赖的接口测试：今日语录的ETag重新验证，以及按日期范围分页补齐历史语录
+"""
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app import quote_range
+from app.ai_service import ai_service
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from app.quote_range import MonthCache
+from app.rate_limit import rate_limiter
+from conftest import run
+
+# 与 frontend/js/app.js 中的 RANGE_PAGE_DAYS 一致
+RANGE_PAGE_DAYS = 92
+
+
+@pytest.fixture
+def client(app_db, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+    monkeypatch.setattr(quote_range, "month_cache", MonthCache())
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def today_quote(monkeypatch):
+    quote = {"id": 1, "date": "2025-07-04", "content": "千里之行，始于足下。", "author": "老子"}
+
+    async def get_today_quote(channel):
+        return dict(quote)
+
+    monkeypatch.setattr(ai_service, "get_today_quote", get_today_quote)
+    return quote
+
+
+@pytest.mark.parametrize("path", ["/api/quote", "/api/default/quote"])
+def test_today_quote_revalidates_with_etag(client, today_quote, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.json()["data"]["content"] == today_quote["content"]
+    etag = response.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert response.headers["cache-control"] == "no-cache"
+
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    # 零点后同一地址返回新语录，旧的ETag不再匹配
+    today_quote.update(date="2025-07-05", content="知人者智，自知者明。")
+    response = client.get(path, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["data"]["date"] == "2025-07-05"
+
+
+def test_etag_ignores_fields_other_than_date_content_author(client, today_quote):
+    etag = client.get("/api/quote").headers["etag"]
+    today_quote["id"] = 99
+    assert client.get("/api/quote", headers={"If-None-Match": etag}).status_code == 304
+    today_quote["author"] = "庄子"
+    assert client.get("/api/quote", headers={"If-None-Match": etag}).status_code == 200
+
+
+def _add_days(day: date, days: int) -> date:
+    return day + timedelta(days=days)
+
+
+def _fetch_quotes_after(client: TestClient, last_date: date, today: date):
+    """按 fetchQuotesAfter 的方式分页请求，并像 rangeToQuotes 一样按偏移还原日期"""
+    fresh, requests = [], 0
+    start = _add_days(last_date, 1)
+    while start <= today:
+        end = min(_add_days(start, RANGE_PAGE_DAYS - 1), today)
+        result = client.get("/api/quotes/range", params={"start": start.isoformat(), "end": end.isoformat()}).json()
+        assert result["success"]
+        data = result["data"]
+        content, author = data["fields"].index("content"), data["fields"].index("author")
+        page_start = date.fromisoformat(data["start"])
+        fresh.extend(
+            (_add_days(page_start, offset), item[content], item[author])
+            for offset, item in enumerate(data["quotes"]) if item
+        )
+        requests += 1
+        start = _add_days(end, 1)
+    return fresh, requests
+
+
+def test_range_pages_cover_long_offline_gap(client):
+    last_cached = date(2025, 1, 10)
+    today = date(2025, 9, 1)
+    days = [_add_days(last_cached, offset) for offset in range(-3, (today - last_cached).days + 1)]
+    # 中间有几天没有语录
+    missing = {date(2025, 3, 1), date(2025, 6, 15)}
+
+    async def add():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                DailyQuote(date=day, content=f"{day.isoformat()} 的语录", author="老子")
+                for day in days if day not in missing
+            ])
+            await db.commit()
+
+    run(add())
+    fresh, requests = _fetch_quotes_after(client, last_cached, today)
+
+    expected = [day for day in days if last_cached < day <= today and day not in missing]
+    assert [day for day, _, _ in fresh] == expected
+    assert all(content == f"{day.isoformat()} 的语录" for day, content, _ in fresh)
+    assert requests == -(-(today - last_cached).days // RANGE_PAGE_DAYS)
+
+
+def test_range_catch_up_is_empty_when_cache_is_current(client):
+    fresh, requests = _fetch_quotes_after(client, date(2025, 9, 1), date(2025, 9, 1))
+    assert (fresh, requests) == ([], 0)
@@ -0,0 +1,64 @@
+"""
+提示词模板选择测试：模板文件重新加载和从生成日志汇总统计
+"""
+import json
+import os
+from datetime import date, timedelta
+
+from app.database import AsyncSessionLocal
+from app.models import QuoteGenerationLog
+from app.prompt_selection import PromptSelector, _utcnow
+from conftest import run
+
+
+def _write_templates(path, items):
+    path.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+
+
+def test_reload_picks_up_changes_and_keeps_last_good_file(tmp_path):
+    path = tmp_path / "templates.json"
+    _write_templates(path, [{"id": "a", "text": "模板A"}])
+    selector = PromptSelector(str(path))
+
+    assert selector.reload() is True
+    assert selector.reload() is False
+
+    _write_templates(path, [{"id": "a", "text": "模板A"}, {"id": "b", "text": "模板B"}])
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 1))
+    assert selector.reload() is True
+    assert selector.templates() == [("a", "模板A"), ("b", "模板B")]
+
+    path.write_text("[", encoding="utf-8")
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 1))
+    assert selector.reload() is False
+    assert [tid for tid, _ in selector.templates()] == ["a", "b"]
+
+
+def test_load_stats_from_recent_logs(app_db, monkeypatch):
+    monkeypatch.setenv("PROMPT_STATS_DAYS", "7")
+    selector = PromptSelector()
+    now = _utcnow()
+
+    def log(success, created_at, reason_code=None, content=None):
+        return QuoteGenerationLog(
+            channel_id=1, date=date(2025, 7, 4), attempt_number=1, success=success,
+            reason_code=reason_code, prompt_template="a", latency_ms=100,
+            generated_content=content, created_at=created_at
+        )
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                log(True, now - timedelta(hours=1), content="知人者智，自知者明"),
+                log(False, now - timedelta(hours=2), reason_code="too_short"),
+                # 与提示词无关的失败和统计窗口之外的结果不计入
+                log(False, now - timedelta(hours=3), reason_code="llm_error"),
+                log(False, now - timedelta(days=8), reason_code="too_short"),
+            ])
+            await db.commit()
+        await selector.ensure_loaded()
+        return selector.get_status()["stats"]
+
+    assert run(main()) == {
+        "1": {"a": {"attempts": 2, "success_rate": 0.5, "avg_length": 9.0, "avg_latency_ms": 100}}
+    }
@@ -0,0 +1,104 @@
+"""
+日期范围接口测试：按天排列的紧凑数组、月份缓存和流式输出
+"""
+import json
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app import quote_range
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from app.quote_range import MonthCache, iter_months, month_end, load_range
+from app.rate_limit import rate_limiter
+from conftest import run
+
+DAYS = {
+    date(2025, 1, 31): ("一月最后一天", "老子"),
+    date(2025, 2, 1): ("二月第一天", "庄子"),
+    date(2025, 2, 3): ("二月第三天", "孔子"),
+    date(2025, 5, 10): ("五月十日", "孟子"),
+}
+
+
+@pytest.fixture
+def quotes(app_db, monkeypatch):
+    monkeypatch.setattr(quote_range, "month_cache", MonthCache())
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+
+    async def add():
+        async with AsyncSessionLocal() as db:
+            db.add_all([DailyQuote(content=content, author=author, date=day) for day, (content, author) in DAYS.items()])
+            await db.commit()
+
+    run(add())
+    return TestClient(main.app)
+
+
+def test_month_helpers():
+    assert month_end(date(2024, 2, 10)) == date(2024, 2, 29)
+    assert month_end(date(2025, 12, 1)) == date(2025, 12, 31)
+    assert list(iter_months(date(2024, 11, 15), date(2025, 1, 2))) == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1)
+    ]
+
+
+def test_range_is_one_entry_per_day(quotes):
+    response = quotes.get("/api/quotes/range", params={"start": "2025-01-30", "end": "2025-02-03"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["count"] == 3
+    assert body["data"] == {
+        "start": "2025-01-30",
+        "end": "2025-02-03",
+        "fields": ["content", "author"],
+        "quotes": [None, ["一月最后一天", "老子"], ["二月第一天", "庄子"], None, ["二月第三天", "孔子"]],
+    }
+
+
+def test_long_range_is_streamed(quotes):
+    response = quotes.get("/api/quotes/range", params={"start": "2025-01-01", "end": "2025-06-30"})
+    assert response.headers.get("content-length") is None
+    body = json.loads(response.content)
+    assert len(body["data"]["quotes"]) == 181
+    assert body["count"] == 4
+    assert body["data"]["quotes"][(date(2025, 5, 10) - date(2025, 1, 1)).days] == ["五月十日", "孟子"]
+
+
+@pytest.mark.parametrize("params", [
+    {"start": "2025-02-03", "end": "2025-02-01"},
+    {"start": "2025-02-30", "end": "2025-03-01"},
+    {"start": "2000-01-01", "end": "2025-01-01"},
+])
+def test_invalid_ranges(quotes, params):
+    assert quotes.get("/api/quotes/range", params=params).status_code == 400
+
+
+def test_past_months_are_cached_until_invalidated(quotes):
+    cache = quote_range.month_cache
+
+    async def load():
+        months = await load_range(1, date(2025, 1, 1), date(2025, 2, 28))
+        return [count for _, (_, count) in months]
+
+    assert run(load()) == [1, 2]
+    assert cache.misses == 2 and cache.hits == 0
+    assert run(load()) == [1, 2]
+    assert cache.hits == 2
+
+    async def add_and_invalidate():
+        async with AsyncSessionLocal() as db:
+            db.add(DailyQuote(content="二月补充", author="荀子", date=date(2025, 2, 14)))
+            await db.commit()
+        cache.invalidate(1, date(2025, 2, 14))
+
+    run(add_and_invalidate())
+    assert run(load()) == [1, 3]
+    assert cache.hits == 3
+
+
+def test_current_month_is_not_cached():
+    assert MonthCache.is_immutable(date(2025, 6, 1), today=date(2025, 7, 4))
+    assert not MonthCache.is_immutable(date(2025, 7, 1), today=date(2025, 7, 4))
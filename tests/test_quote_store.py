@@ -0,0 +1,117 @@
+"""
+内存列式语录存储测试：与数据库读取结果一致、覆盖写入、范围查询和增量刷新
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from app.quote_store import QuoteStore
+from conftest import run
+
+SHARED = "知人者智，自知者明。胜人者有力，自胜者强。"
+
+
+def _quote(day: int, content: str = None, author: str = "老子", channel_id: int = 1, **kwargs) -> DailyQuote:
+    return DailyQuote(
+        channel_id=channel_id, date=date(2025, 7, day), content=content or f"第{day}天的语录",
+        author=author, **kwargs
+    )
+
+
+async def _add(*quotes):
+    async with AsyncSessionLocal() as db:
+        db.add_all(quotes)
+        await db.commit()
+        return [quote.id for quote in quotes]
+
+
+async def _db_rows():
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(DailyQuote).order_by(DailyQuote.channel_id, DailyQuote.date))
+        return [quote.to_dict() for quote in result.scalars().all()]
+
+
+@pytest.fixture
+def store(monkeypatch, app_db):
+    monkeypatch.setenv("QUOTE_STORE", "memory")
+    return QuoteStore()
+
+
+def test_loaded_rows_match_database(store):
+    async def main():
+        await _add(
+            _quote(3, is_fallback=True, is_ai_generated=False),
+            _quote(1, SHARED, generation_attempts=2),
+            _quote(2, SHARED, author="庄子"),
+            _quote(1, "另一个频道", channel_id=2),
+        )
+        await store.load()
+        return await _db_rows()
+
+    rows = run(main())
+    assert store.ready
+    for row in rows:
+        assert store.get(row["channel_id"], date.fromisoformat(row["date"])) == row
+    assert store.get(1, date(2025, 7, 9)) is None
+    assert store.get(3, date(2025, 7, 1)) is None
+    # 相同正文只保存一份
+    assert store.memory_usage()["text_bytes"] == len(SHARED.encode()) + len("第3天的语录".encode()) + len("另一个频道".encode())
+
+
+def test_add_overwrites_and_inserts_in_date_order(store):
+    async def main():
+        await _add(_quote(1), _quote(5))
+        await store.load()
+        quote = _quote(3)
+        await _add(quote)
+        store.add(quote)
+        async with AsyncSessionLocal() as db:
+            existing = (await db.execute(select(DailyQuote).where(DailyQuote.date == date(2025, 7, 5)))).scalar_one()
+            existing.content = "修复后的语录"
+            existing.is_fallback = False
+            await db.commit()
+            await db.refresh(existing)
+            store.add(existing)
+        return await _db_rows()
+
+    rows = run(main())
+    assert [quote["date"] for quote in store.recent(1, 10)] == ["2025-07-05", "2025-07-03", "2025-07-01"]
+    assert store.get(1, date(2025, 7, 5)) == rows[-1]
+    assert store.get(1, date(2025, 7, 5))["content"] == "修复后的语录"
+
+
+def test_recent_and_range(store):
+    async def main():
+        await _add(*(_quote(day) for day in range(1, 8)))
+        await store.load()
+
+    run(main())
+    assert [quote["date"][-2:] for quote in store.recent(1, 3)] == ["07", "06", "05"]
+    assert [quote["date"][-2:] for quote in store.recent(1, 10, since=date(2025, 7, 5))] == ["07", "06"]
+    assert [(day.day, content) for day, content, _ in store.range(1, date(2025, 7, 2), date(2025, 7, 4))] == [
+        (2, "第2天的语录"), (3, "第3天的语录"), (4, "第4天的语录")
+    ]
+    assert list(store.range(2, date(2025, 7, 1), date(2025, 7, 31))) == []
+
+
+def test_refresh_pulls_rows_written_by_other_processes(store):
+    async def main():
+        await _add(_quote(1))
+        await store.load()
+        await _add(_quote(2), _quote(3, channel_id=2))
+        return await store.refresh(), await store.refresh()
+
+    assert run(main()) == (2, 0)
+    assert store.get(1, date(2025, 7, 2))["content"] == "第2天的语录"
+    assert store.get(2, date(2025, 7, 3)) is not None
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("QUOTE_STORE", raising=False)
+    store = QuoteStore()
+    assert not store.ready
+    store.add(_quote(1))
+    assert store.get(1, date(2025, 7, 1)) is None
@@ -0,0 +1,126 @@
+"""
+限流测试：令牌桶、按客户端限流、LLM调用预算和代理后的客户端识别
+"""
+import ipaddress
+
+import pytest
+from fastapi import Depends, FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app import rate_limit
+from app.rate_limit import (
+    TokenBucket, RateLimiter, GenerationBudget, LLMBudgetExceededError, _client_id
+)
+
+
+def test_token_bucket_burst_and_refill():
+    bucket = TokenBucket(capacity=2, refill_rate=1.0, now=0.0)
+    assert bucket.consume(0.0) == 0
+    assert bucket.consume(0.0) == 0
+    assert bucket.consume(0.0) == pytest.approx(1.0)
+    # 半秒后补充了半个令牌，还需要等半秒
+    assert bucket.consume(0.5) == pytest.approx(0.5)
+    assert bucket.consume(1.0) == 0
+    # 补充不会超过容量
+    bucket.consume(100.0)
+    assert bucket.tokens == pytest.approx(1.0)
+
+
+def test_rate_limiter_is_per_client_and_rule():
+    limiter = RateLimiter()
+    limiter.add_rule("generate", per_minute=60, burst=1)
+    limiter.add_rule("read", per_minute=0, burst=10)
+
+    assert limiter.check("a", "generate") == 0
+    assert limiter.check("a", "generate") > 0
+    assert limiter.check("b", "generate") == 0
+    # 0 表示不限制
+    assert all(limiter.check("a", "read") == 0 for _ in range(100))
+    assert limiter.rejected == 1
+
+
+def test_rate_limiter_evicts_idle_buckets():
+    limiter = RateLimiter(max_buckets=2)
+    limiter.add_rule("read", per_minute=60, burst=5)
+    for client in ("a", "b", "c"):
+        limiter.check(client, "read")
+    assert len(limiter._buckets) <= 2
+
+
+def test_rate_limit_dependency_returns_429_with_retry_after(monkeypatch):
+    limiter = RateLimiter()
+    limiter.add_rule("generate", per_minute=1, burst=1)
+    monkeypatch.setattr(rate_limit, "rate_limiter", limiter)
+
+    app = FastAPI()
+
+    @app.get("/generate", dependencies=[Depends(rate_limit.rate_limit("generate"))])
+    async def generate():
+        return {"success": True}
+
+    client = TestClient(app)
+    assert client.get("/generate").status_code == 200
+    response = client.get("/generate")
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["retry-after"]) <= 61
+
+
+def test_budget_limits_calls_per_minute_and_day():
+    per_minute = GenerationBudget(per_minute=2, per_day=0, max_concurrency=0)
+    per_minute.acquire()
+    per_minute.acquire()
+    assert not per_minute.has_capacity()
+    with pytest.raises(LLMBudgetExceededError):
+        per_minute.acquire()
+
+    per_day = GenerationBudget(per_minute=0, per_day=2, max_concurrency=0)
+    per_day.seed_today(calls=1, tokens=0)
+    per_day.acquire()
+    assert per_day.remaining_today() == 0
+    with pytest.raises(LLMBudgetExceededError, match="今日LLM调用次数"):
+        per_day.acquire()
+
+
+def test_budget_limits_tokens_per_day():
+    budget = GenerationBudget(per_minute=0, per_day=0, max_concurrency=0, tokens_per_day=1000)
+    budget.acquire()
+    budget.record_tokens(600)
+    assert budget.remaining_tokens_today() == 400
+    budget.record_tokens(600)
+    assert not budget.has_capacity()
+    with pytest.raises(LLMBudgetExceededError, match="token"):
+        budget.acquire()
+
+
+def _request(host: str, headers=None) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/quote",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+        "client": (host, 12345),
+    })
+
+
+def test_client_id_ignores_proxy_headers_from_untrusted_hosts(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUST_PROXY_HEADERS", False)
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", ())
+    assert _client_id(_request("203.0.113.7", {"X-Real-IP": "1.2.3.4"})) == "203.0.113.7"
+
+
+def test_client_id_behind_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, "TRUST_PROXY_HEADERS", False)
+    monkeypatch.setattr(rate_limit, "TRUSTED_PROXIES", (ipaddress.ip_network("10.0.0.0/8"),))
+
+    assert _client_id(_request("10.0.0.2", {"X-Real-IP": "198.51.100.1"})) == "198.51.100.1"
+    # 跳过右侧受信任的代理，左侧由客户端伪造的地址不会被使用
+    forwarded = {"X-Forwarded-For": "1.1.1.1, 198.51.100.1, 10.0.0.3"}
+    assert _client_id(_request("10.0.0.2", forwarded)) == "198.51.100.1"
+    # 直连的客户端不能通过请求头冒充其他地址
+    assert _client_id(_request("203.0.113.7", forwarded)) == "203.0.113.7"
+
+
+def test_client_id_uses_api_tenant():
+    request = _request("203.0.113.7")
+    request.state.api_tenant = "acme"
+    assert _client_id(request) == "tenant:acme"
@@ -0,0 +1,148 @@
+"""
+相似语录索引测试：向量、查询过滤、补齐、扩容和只读进程重新映射
+"""
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from app.related import RelatedIndex, vectorize
+from conftest import run
+
+QUOTES = [
+    "知人者智，自知者明。胜人者有力，自胜者强。",
+    "知人者智，自知者明。",
+    "千里之行，始于足下。",
+    "天下难事，必作于易；天下大事，必作于细。",
+]
+
+
+@pytest.fixture
+def index_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv("RELATED_INDEX_DIR", str(tmp_path / "related"))
+    monkeypatch.setenv("RELATED_DIM", "64")
+    monkeypatch.setenv("RELATED_INDEX_CHECK_SECONDS", "0")
+    return tmp_path / "related"
+
+
+def _quote(quote_id: int, content: str, day: int = 1, channel_id: int = 1) -> DailyQuote:
+    return DailyQuote(id=quote_id, channel_id=channel_id, date=date(2025, 7, day), content=content)
+
+
+def _writer() -> RelatedIndex:
+    """没有待补齐语录的写入索引"""
+    index = RelatedIndex()
+    index.writable = True
+    index._open_writer()
+    index._ready = True
+    return index
+
+
+def test_vectorize_is_normalized_and_stable():
+    vector = vectorize(QUOTES[0], 64)
+    assert vector.dtype == np.float32
+    assert abs(float(np.linalg.norm(vector)) - 1.0) < 1e-6
+    assert np.array_equal(vector, vectorize(QUOTES[0], 64))
+    # 标点和空白不影响向量
+    assert np.allclose(vector, vectorize(" 知人者智 自知者明 胜人者有力 自胜者强 ", 64))
+    assert not vectorize("", 64).any()
+
+
+def test_query_ranks_and_filters(index_dir):
+    index = _writer()
+    for i, content in enumerate(QUOTES, start=1):
+        index.update(_quote(i, content, day=i))
+    index.update(_quote(9, QUOTES[1], day=9, channel_id=2))
+
+    matches = index.query(1, QUOTES[0], exclude_id=1, until=date(2025, 7, 4), limit=3)
+    assert sorted(quote_id for quote_id, _, _ in matches) == [2, 3, 4]
+    assert matches[0][0] == 2
+    assert matches[0][1] == date(2025, 7, 2)
+    assert [score for _, _, score in matches] == sorted((score for _, _, score in matches), reverse=True)
+    assert all(quote_id != 9 for quote_id, _, _ in matches)
+
+    # 不返回指定日期之后的语录
+    assert [quote_id for quote_id, _, _ in index.query(1, QUOTES[0], exclude_id=1, until=date(2025, 7, 1))] == []
+    assert index.query(2, QUOTES[0]) == [(9, date(2025, 7, 9), matches[0][2])]
+    assert index.get_status()["queries"] == 3
+
+
+def test_update_overwrites_existing_row(index_dir):
+    index = _writer()
+    index.update(_quote(1, QUOTES[2]))
+    index.update(_quote(1, QUOTES[0]))
+    assert index.get_status()["count"] == 1
+    assert index.query(1, QUOTES[0])[0][2] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_small_channel_falls_back_to_full_scan(index_dir):
+    index = _writer()
+    for i in range(1, 101):
+        index.update(_quote(i, QUOTES[0] + str(i), channel_id=2))
+    index.update(_quote(200, QUOTES[2]))
+    index.update(_quote(201, QUOTES[3]))
+    # 相似度最高的前 limit*8 行都属于其他频道
+    assert {quote_id for quote_id, _, _ in index.query(1, QUOTES[0], limit=2)} == {200, 201}
+
+
+def test_grows_past_initial_capacity(index_dir):
+    index = _writer()
+    capacity = index.get_status()["capacity"]
+    for i in range(1, capacity + 11):
+        index._put(i, 1, date(2025, 7, 1).toordinal(), vectorize(f"语录{i}", index.dim))
+    index._write_header()
+    assert index.get_status()["capacity"] == capacity * 2
+
+    reopened = _writer()
+    assert reopened.get_status()["count"] == capacity + 10
+    assert reopened._positions[capacity + 10] == capacity + 9
+
+
+def test_dimension_change_rebuilds(index_dir, monkeypatch):
+    index = _writer()
+    index.update(_quote(1, QUOTES[0]))
+    monkeypatch.setenv("RELATED_DIM", "32")
+    assert _writer().get_status()["count"] == 0
+
+
+def test_reader_remaps_after_writer_updates(index_dir):
+    writer = _writer()
+    writer.update(_quote(1, QUOTES[0]))
+
+    async def start_reader():
+        reader = RelatedIndex()
+        await reader.start(writable=False)
+        return reader
+
+    reader = run(start_reader())
+    assert [quote_id for quote_id, _, _ in reader.query(1, QUOTES[1])] == [1]
+
+    # 超过初始容量时文件扩大，只读进程重新映射
+    for i in range(2, writer.get_status()["capacity"] + 3):
+        writer._put(i, 1, date(2025, 7, 1).toordinal(), vectorize(f"语录{i}", writer.dim))
+    writer.update(_quote(5000, QUOTES[1]))
+    assert reader.query(1, QUOTES[1])[0][0] == 5000
+    assert reader.get_status()["capacity"] == writer.get_status()["capacity"]
+
+
+def test_catch_up_indexes_database_quotes(index_dir, app_db):
+    async def main():
+        async with AsyncSessionLocal() as db:
+            db.add_all([
+                DailyQuote(channel_id=1, date=date(2025, 7, i), content=content)
+                for i, content in enumerate(QUOTES, start=1)
+            ])
+            await db.commit()
+        index = RelatedIndex()
+        await index.start(writable=True)
+        await index._catch_up_task
+        matches = index.query(1, QUOTES[0], exclude_id=1)
+        await index.stop()
+        return index, matches
+
+    index, matches = run(main())
+    assert matches[0][0] == 2
+    assert index.get_status()["count"] == len(QUOTES)
+    assert not index.ready
@@ -0,0 +1,189 @@
+"""
+LLM熔断和兜底语录修复测试
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app import repair
+from app.ai_service import ai_service
+from app.database import AsyncSessionLocal
+from app.models import DailyQuote
+from app.rate_limit import CircuitBreaker
+from app.repair import FallbackRepairer
+from conftest import run
+
+QUOTE = "人的一生中最重要的不是所处的位置，而是所朝的方向；方向对了，路再远也终将抵达。"
+
+
+def test_circuit_opens_after_threshold():
+    circuit = CircuitBreaker(failure_threshold=3, reset_seconds=300)
+    circuit.record_failure()
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.CLOSED
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.OPEN
+    assert not circuit.allows_background_work()
+    assert circuit.get_status()["trips"] == 1
+
+    circuit.record_success()
+    assert circuit.state == CircuitBreaker.CLOSED
+    assert circuit.get_status()["consecutive_failures"] == 0
+
+
+def test_success_resets_consecutive_failures():
+    circuit = CircuitBreaker(failure_threshold=2, reset_seconds=300)
+    circuit.record_failure()
+    circuit.record_success()
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe():
+    circuit = CircuitBreaker(failure_threshold=1, reset_seconds=0)
+    circuit.record_failure()
+    # 到期后半开，允许一次试探；试探失败重新打开，不重复计入打开次数
+    assert circuit.state == CircuitBreaker.HALF_OPEN
+    assert circuit.allows_background_work()
+    circuit.reset_seconds = 300
+    circuit._opened_at -= 301
+    circuit.record_failure()
+    assert circuit.state == CircuitBreaker.OPEN
+    assert circuit.trips == 1
+
+
+def _day(offset: int) -> date:
+    return date.today() + timedelta(days=offset)
+
+
+async def _add(*quotes):
+    async with AsyncSessionLocal() as db:
+        db.add_all(quotes)
+        await db.commit()
+        return [quote.id for quote in quotes]
+
+
+@pytest.fixture
+def repairer(monkeypatch, app_db):
+    monkeypatch.setenv("FALLBACK_REPAIR_DELAY_SECONDS", "0")
+    monkeypatch.setenv("FALLBACK_REPAIR_BATCH", "5")
+    monkeypatch.setattr(repair, "llm_circuit", CircuitBreaker(failure_threshold=1, reset_seconds=300))
+    monkeypatch.setattr(repair.llm_budget, "has_capacity", lambda: True)
+    notified = []
+    monkeypatch.setattr(repair.notifier, "notify", lambda event, data: notified.append((event, data)))
+    instance = FallbackRepairer()
+    instance.notified = notified
+    return instance
+
+
+def _fake_replace(monkeypatch, fail=()):
+    """替换单条兜底语录的生成，记录被修复的ID"""
+    calls = []
+
+    async def replace(quote_id):
+        calls.append(quote_id)
+        if quote_id in fail:
+            return {"success": False, "message": "重新生成失败: timeout"}
+        return {"success": True, "quote": {"channel_id": 1, "date": "2099-01-01", "content": QUOTE}}
+
+    monkeypatch.setattr(ai_service, "replace_fallback_quote", replace)
+    return calls
+
+
+def test_pending_only_future_fallbacks(repairer):
+    async def main():
+        ids = await _add(
+            DailyQuote(date=_day(3), content="c", is_fallback=True),
+            DailyQuote(date=_day(0), content="a", is_fallback=True),
+            DailyQuote(date=_day(1), content="b", is_fallback=True),
+            DailyQuote(date=_day(2), content="d", is_fallback=False),
+            DailyQuote(date=_day(-1), content="e", is_fallback=True),
+        )
+        return ids, await repairer.pending(10), await repairer.pending(1)
+
+    ids, pending, first = run(main())
+    assert pending == [ids[2], ids[0]]
+    assert first == [ids[2]]
+
+
+def test_run_repairs_and_counts_failures(repairer, monkeypatch):
+    async def main():
+        ids = await _add(
+            DailyQuote(date=_day(1), content="a", is_fallback=True),
+            DailyQuote(date=_day(2), content="b", is_fallback=True),
+        )
+        calls = _fake_replace(monkeypatch, fail={ids[1]})
+        return ids, calls, await repairer.run()
+
+    ids, calls, repaired = run(main())
+    assert repaired == 1
+    assert calls == ids
+    status = repairer.get_status()
+    assert (status["repaired"], status["failed"], status["last_pending"]) == (1, 1, 2)
+    assert [event for event, _ in repairer.notified] == ["generation.repaired"]
+    assert repairer.notified[0][1]["content"] == QUOTE
+
+
+def test_run_skipped_while_circuit_open(repairer, monkeypatch):
+    repair.llm_circuit.record_failure()
+
+    async def main():
+        await _add(DailyQuote(date=_day(1), content="a", is_fallback=True))
+        calls = _fake_replace(monkeypatch)
+        return calls, await repairer.run()
+
+    calls, repaired = run(main())
+    assert (calls, repaired) == ([], 0)
+    assert repairer.get_status()["skipped_runs"] == 1
+
+
+def test_run_stops_when_budget_exhausted(repairer, monkeypatch):
+    capacity = iter([True, False])
+    monkeypatch.setattr(repair.llm_budget, "has_capacity", lambda: next(capacity))
+
+    async def main():
+        await _add(*(DailyQuote(date=_day(i), content=str(i), is_fallback=True) for i in (1, 2, 3)))
+        calls = _fake_replace(monkeypatch)
+        return calls, await repairer.run()
+
+    calls, repaired = run(main())
+    assert len(calls) == repaired == 1
+
+
+def test_replace_fallback_quote_updates_future_row_only(app_db, monkeypatch):
+    async def generate(channel, prompt, target_date=None):
+        return [f"{QUOTE}|老子"], 10
+
+    async def committed(quote):
+        committed_ids.append(quote.id)
+
+    committed_ids = []
+    monkeypatch.setattr(ai_service, "_generate_candidates", generate)
+    monkeypatch.setattr(ai_service, "_quote_committed", committed)
+
+    async def main():
+        future_id, today_id = await _add(
+            DailyQuote(date=_day(1), content="兜底", author="佚名", is_fallback=True, is_ai_generated=False),
+            DailyQuote(date=_day(0), content="今天的兜底", author="佚名", is_fallback=True, is_ai_generated=False),
+        )
+        replaced = await ai_service.replace_fallback_quote(future_id)
+        kept = await ai_service.replace_fallback_quote(today_id)
+        again = await ai_service.replace_fallback_quote(future_id)
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(DailyQuote).order_by(DailyQuote.date))).scalars().all()
+            return future_id, replaced, kept, again, [row.to_dict() for row in rows]
+
+    future_id, replaced, kept, again, rows = run(main())
+    assert replaced["success"] is True
+    assert replaced["quote"]["content"] == QUOTE
+    assert kept["success"] is False
+    assert again["success"] is False
+    assert committed_ids == [future_id]
+
+    today, tomorrow = rows
+    assert today["content"] == "今天的兜底"
+    assert tomorrow["content"] == QUOTE
+    assert tomorrow["author"] == "老子"
+    assert tomorrow["is_fallback"] is False
+    assert tomorrow["generation_attempts"] == 2
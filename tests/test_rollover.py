@@ -0,0 +1,88 @@
+"""
+长轮询等待测试
+"""
+import time
+import asyncio
+from datetime import date, timedelta
+
+from app.rollover import RolloverCoordinator
+from conftest import run
+
+
+def test_wait_for_tomorrow_holds_until_timeout():
+    """零点在超时之后时挂起到超时再返回，客户端不会因立即收到204而空转"""
+    coordinator = RolloverCoordinator()
+    started = time.monotonic()
+    result = run(coordinator.wait_for(1, date.today() + timedelta(days=1), timeout=0.3))
+    elapsed = time.monotonic() - started
+
+    assert result is None
+    assert elapsed >= 0.28
+    assert coordinator.waiting == 0
+    assert coordinator._ready == {} and coordinator._waiters == {}
+
+
+def test_wait_for_later_day_returns_immediately():
+    coordinator = RolloverCoordinator()
+    started = time.monotonic()
+    result = run(coordinator.wait_for(1, date.today() + timedelta(days=2), timeout=5))
+
+    assert result is None
+    assert time.monotonic() - started < 0.5
+    assert coordinator._ready == {}
+
+
+def test_wait_for_past_day_does_not_poll():
+    """过去日期只查询一次，不挂起也不留下等待事件"""
+    coordinator = RolloverCoordinator()
+    loads = []
+
+    async def load(channel_id, target_date):
+        loads.append(target_date)
+        return None
+
+    coordinator._load = load
+    result = run(coordinator.wait_for(1, date(2001, 1, 2), timeout=5))
+
+    assert result is None
+    assert loads == [date(2001, 1, 2)]
+    assert coordinator._ready == {} and coordinator._waiters == {}
+
+
+def test_wait_for_today_releases_waiters_and_cleans_up():
+    coordinator = RolloverCoordinator()
+    coordinator.jitter_seconds = 0
+    coordinator.poll_interval = 5
+    today = date.today()
+    quote = {"channel_id": 1, "date": today.isoformat(), "content": "知人者智"}
+
+    async def load(channel_id, target_date):
+        return None
+
+    coordinator._load = load
+
+    async def main():
+        waiters = [asyncio.create_task(coordinator.wait_for(1, today, timeout=5)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        assert coordinator._waiters == {(1, today): 3}
+        coordinator.publish(quote)
+        return await asyncio.gather(*waiters)
+
+    assert run(main()) == [quote] * 3
+    assert coordinator.released == 3
+    assert coordinator._ready == {} and coordinator._waiters == {}
+
+
+def test_prewarm_time(monkeypatch):
+    monkeypatch.setenv("ROLLOVER_PREWARM_MINUTES", "90")
+    coordinator = RolloverCoordinator()
+    assert coordinator.prewarm_time == (22, 30)
+    assert coordinator.get_status()["prewarm_time"] == "22:30"
+
+    monkeypatch.setenv("ROLLOVER_PREWARM_MINUTES", "0")
+    assert RolloverCoordinator().prewarm_time == (23, 59)
+
+
+def test_seconds_until():
+    assert RolloverCoordinator.seconds_until(date.today() + timedelta(days=1)) > 0
+    assert RolloverCoordinator.seconds_until(date.today()) <= 0
@@ -0,0 +1,134 @@
+"""
+存储后端测试：连接地址、连接池参数、语句缓存和只读副本轮询
+"""
+import pytest
+from sqlalchemy import text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.storage import (
+    SQLiteBackend, PostgresBackend, ReadSessionFactory, get_backend, create_backend_async_engine
+)
+from conftest import run, backend_engine
+
+
+def test_get_backend_by_dialect():
+    assert isinstance(get_backend("sqlite:///./x.db"), SQLiteBackend)
+    assert isinstance(get_backend("postgresql://u:p@db/quotes"), PostgresBackend)
+    assert isinstance(get_backend("postgres://u:p@db/quotes"), PostgresBackend)
+    with pytest.raises(ValueError):
+        get_backend("mysql://u:p@db/quotes")
+
+
+def test_sqlite_urls():
+    backend = get_backend("sqlite:///./daily_quotes.db")
+    assert backend.sync_url().drivername == "sqlite+pysqlite"
+    assert backend.async_url().drivername == "sqlite+aiosqlite"
+    assert backend.async_url().database == "./daily_quotes.db"
+
+
+def test_postgres_pool_and_statement_cache_options(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "7")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "3")
+    monkeypatch.setenv("DB_POOL_TIMEOUT", "12")
+    monkeypatch.setenv("DB_POOL_RECYCLE", "600")
+    monkeypatch.setenv("DB_STATEMENT_CACHE_SIZE", "42")
+    monkeypatch.setenv("DB_PREPARED_STATEMENT_CACHE_SIZE", "24")
+    backend = get_backend("postgresql://daily_quote:secret@db:5432/quotes")
+
+    url = backend.async_url()
+    assert url.drivername == "postgresql+asyncpg"
+    assert url.query["prepared_statement_cache_size"] == "24"
+    assert backend.sync_url().drivername == "postgresql+psycopg2"
+
+    options = backend.async_engine_options()
+    assert options["pool_size"] == 7
+    assert options["max_overflow"] == 3
+    assert options["pool_timeout"] == 12
+    assert options["pool_recycle"] == 600
+    assert options["pool_pre_ping"] is True
+    assert options["connect_args"] == {"statement_cache_size": 42}
+    assert "connect_args" not in backend.sync_engine_options()
+
+    info = backend.describe()
+    assert "secret" not in info["url"]
+    assert info["pool_size"] == 7
+    assert info["statement_cache_size"] == 42
+
+
+def test_postgres_engine_uses_configured_pool(monkeypatch):
+    monkeypatch.setenv("DB_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_MAX_OVERFLOW", "2")
+
+    async def main():
+        # 创建引擎不会建立连接
+        engine = create_backend_async_engine(get_backend("postgresql://u:p@localhost:1/quotes"))
+        try:
+            pool = engine.sync_engine.pool
+            assert isinstance(pool, AsyncAdaptedQueuePool)
+            assert pool.size() == 3
+            assert pool._max_overflow == 2
+        finally:
+            await engine.dispose()
+
+    run(main())
+
+
+def test_sqlite_busy_timeout_pragma(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLITE_BUSY_TIMEOUT_MS", "1234")
+
+    async def main():
+        async with backend_engine(f"sqlite:///{tmp_path / 'busy.db'}") as engine:
+            async with engine.connect() as conn:
+                return (await conn.execute(text("PRAGMA busy_timeout"))).scalar_one()
+
+    assert run(main()) == 1234
+
+
+def test_read_sessions_use_primary_without_replicas():
+    sentinel = object()
+    factory = ReadSessionFactory(lambda: sentinel, [])
+    assert factory() is sentinel
+    assert factory.engines == []
+    assert factory.describe() == []
+
+
+def test_read_sessions_round_robin_across_replicas(tmp_path):
+    replica_urls = [f"sqlite:///{tmp_path / name}" for name in ("replica_a.db", "replica_b.db")]
+
+    async def main():
+        # 每个副本写入不同的标记，读取结果即可看出会话落在哪个副本上
+        for url, name in zip(replica_urls, ("a", "b")):
+            async with backend_engine(url) as engine:
+                async with engine.begin() as conn:
+                    await conn.execute(text("CREATE TABLE marker (name TEXT)"))
+                    await conn.execute(text("INSERT INTO marker VALUES (:name)"), {"name": name})
+
+        def primary():
+            raise AssertionError("配置了副本时不应使用主库")
+
+        factory = ReadSessionFactory(primary, replica_urls)
+        try:
+            names = []
+            for _ in range(4):
+                async with factory() as session:
+                    names.append((await session.execute(text("SELECT name FROM marker"))).scalar_one())
+            return names
+        finally:
+            for engine in factory.engines:
+                await engine.dispose()
+
+    assert run(main()) == ["a", "b", "a", "b"]
+
+
+def test_postgres_connection_statement_cache(postgres_url, monkeypatch):
+    monkeypatch.setenv("DB_STATEMENT_CACHE_SIZE", "17")
+
+    async def main():
+        async with backend_engine(postgres_url) as engine:
+            async with engine.connect() as conn:
+                for value in (1, 2):
+                    assert (await conn.execute(text("SELECT CAST(:v AS INTEGER)"), {"v": value})).scalar_one() == value
+                raw = await conn.get_raw_connection()
+                return raw.driver_connection._stmt_cache.get_max_size()
+
+    assert run(main()) == 17
@@ -0,0 +1,95 @@
+"""
+流式生成测试：增量校验和提前中止
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai_service import AIQuoteService
+from app.validation import StreamingQuoteValidator, InvalidCompletionError
+from conftest import run
+
+QUOTE = "人的一生中最重要的不是所处的位置，而是所朝的方向；方向对了，路再远也终将抵达。"
+
+
+def _feed(chunks):
+    validator = StreamingQuoteValidator()
+    done = False
+    for chunk in chunks:
+        done = validator.feed(chunk)
+    return validator, done
+
+
+@pytest.mark.parametrize("chunks, reason", [
+    (["好的，", "这是一句名言"], "preamble"),
+    (["Sure! ", "Here is a quote"], "preamble"),
+    (["第一段话。\n\n", "第二段话"], "chatter"),
+    (["很短的话", "|老子"], "too_short"),
+    (["长" * 201], "no_separator"),
+])
+def test_invalid_output_is_rejected_early(chunks, reason):
+    with pytest.raises(InvalidCompletionError) as error:
+        _feed(chunks)
+    assert error.value.reason == reason
+
+
+def test_complete_after_author_line():
+    validator, done = _feed([QUOTE[:10], QUOTE[10:], "|", "老子"])
+    assert done is False
+    assert validator.feed("\n以上语录出自《道德经》") is True
+    assert validator.finish() == f"{QUOTE}|老子"
+
+
+def test_finish_requires_author():
+    validator, _ = _feed([QUOTE, "| "])
+    with pytest.raises(InvalidCompletionError) as error:
+        validator.finish()
+    assert error.value.reason == "no_author"
+
+
+class FakeStream:
+    """模拟 openai 的流式响应，记录读取了多少段以及是否关闭"""
+
+    def __init__(self, deltas):
+        self.deltas = deltas
+        self.read = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.read >= len(self.deltas):
+            raise StopAsyncIteration
+        delta = self.deltas[self.read]
+        self.read += 1
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))], usage=None)
+
+    async def close(self):
+        self.closed = True
+
+
+def _service(stream: FakeStream) -> AIQuoteService:
+    async def create(**kwargs):
+        assert kwargs["stream"] is True
+        return stream
+
+    service = AIQuoteService()
+    service._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return service
+
+
+def test_streaming_stops_reading_after_author_line():
+    stream = FakeStream([QUOTE, "|老子\n", "这句话的意思是……", "更多解释"])
+    content, usage = run(_service(stream)._complete_streaming([]))
+    assert content == f"{QUOTE}|老子"
+    assert stream.read == 2
+    assert stream.closed
+
+
+def test_streaming_aborts_invalid_output():
+    stream = FakeStream(["好的，", "下面是一句名言：", QUOTE, "|老子\n"])
+    with pytest.raises(InvalidCompletionError):
+        run(_service(stream)._complete_streaming([]))
+    assert stream.read == 2
+    assert stream.closed
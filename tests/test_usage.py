@@ -0,0 +1,150 @@
+"""
+LLM用量账本测试：内存汇总、批量写入、重新加载和预算初始化
+"""
+import asyncio
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app import usage
+from app.rate_limit import GenerationBudget
+from app.usage import UsageLedger
+from conftest import run
+
+
+def _usage(prompt: int, completion: int) -> SimpleNamespace:
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion, total_tokens=prompt + completion)
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    instance = GenerationBudget(per_minute=0, per_day=100, max_concurrency=0, tokens_per_day=10000)
+    monkeypatch.setattr(usage, "llm_budget", instance)
+    return instance
+
+
+@pytest.fixture
+def ledger(monkeypatch, app_db, budget):
+    monkeypatch.setenv("LLM_PRICE_PROMPT_PER_1K", "0.5")
+    monkeypatch.setenv("LLM_PRICE_COMPLETION_PER_1K", "1.5")
+    monkeypatch.setenv("LLM_USAGE_FLUSH_SECONDS", "3600")
+    monkeypatch.setenv("LLM_USAGE_BATCH_SIZE", "3")
+    monkeypatch.setenv("OPENAI_BASE_URL", "https://llm.example.com/v1")
+    return UsageLedger()
+
+
+def test_record_updates_rollups_and_budget(ledger, budget):
+    ledger.record(1, "2025-07-04", "gpt", _usage(100, 50), 200, True)
+    ledger.record(1, date(2025, 7, 4), "gpt", None, 400, False)
+    ledger.record(None, None, "gpt", _usage(10, 0), None, True)
+
+    status = ledger.get_status()
+    assert status["provider"] == "llm.example.com"
+    assert (status["recorded"], status["without_usage"]) == (3, 1)
+    # 未启动写入任务时不缓冲记录
+    assert status["pending"] == 0
+    assert status["today"] == {
+        "calls": 3, "failures": 1, "prompt_tokens": 110, "completion_tokens": 50,
+        "total_tokens": 160, "avg_latency_ms": 200, "cost": 0.13
+    }
+    assert budget.get_status()["tokens_today"] == 160
+
+    quote = ledger._by_quote[(1, date(2025, 7, 4))].to_dict()
+    assert (quote["calls"], quote["failures"], quote["total_tokens"]) == (2, 1, 150)
+
+
+def test_flush_and_reload_from_database(ledger):
+    target = date.today() + timedelta(days=1)
+
+    async def main():
+        await ledger.start(writable=True)
+        ledger.record(1, target, "gpt", _usage(100, 50), 200, True)
+        ledger.record(2, target, "gpt", _usage(30, 20), 100, False)
+        pending = ledger.get_status()["pending"]
+        await ledger.stop()
+
+        reloaded = UsageLedger()
+        return pending, await reloaded.summary(7), await reloaded.summary(7, channel_id=2)
+
+    pending, summary, channel_summary = run(main())
+    assert pending == 2
+    assert ledger.get_status()["written"] == 2
+    assert summary["totals"]["calls"] == 2
+    assert summary["totals"]["total_tokens"] == 200
+    assert summary["days"][0]["date"] == date.today().isoformat()
+    assert [(row["channel_id"], row["date"]) for row in summary["quotes"]] == [
+        (2, target.isoformat()), (1, target.isoformat())
+    ]
+    assert [row["channel_id"] for row in channel_summary["quotes"]] == [2]
+    assert channel_summary["quotes"][0]["failures"] == 1
+
+
+def test_full_batch_wakes_flush(ledger):
+    async def main():
+        await ledger.start(writable=True)
+        for _ in range(3):
+            ledger.record(1, None, "gpt", _usage(1, 1), 10, True)
+        for _ in range(50):
+            if ledger.written:
+                break
+            await asyncio.sleep(0.01)
+        written = ledger.written
+        await ledger.stop()
+        return written
+
+    assert run(main()) == 3
+
+
+def test_failed_flush_keeps_rows(ledger, monkeypatch):
+    class BrokenSession:
+        async def __aenter__(self):
+            raise OSError("database is locked")
+
+        async def __aexit__(self, *exc):
+            return False
+
+    session_factory = usage.AsyncSessionLocal
+
+    async def main():
+        await ledger.start(writable=True)
+        ledger.record(1, None, "gpt", _usage(1, 1), 10, True)
+        monkeypatch.setattr(usage, "AsyncSessionLocal", BrokenSession)
+        with pytest.raises(OSError):
+            await ledger.flush()
+        pending = ledger.get_status()["pending"]
+        monkeypatch.setattr(usage, "AsyncSessionLocal", session_factory)
+        await ledger.stop()
+        return pending
+
+    assert run(main()) == 1
+    assert ledger.get_status()["written"] == 1
+
+
+def test_start_seeds_budget_with_today_usage(ledger, monkeypatch):
+    async def main():
+        await ledger.start(writable=True)
+        ledger.record(1, None, "gpt", _usage(300, 200), 10, True)
+        ledger.record(1, None, "gpt", _usage(100, 0), 10, True)
+        await ledger.stop()
+
+        # 进程重启：新的预算从账本恢复今日用量
+        restarted = GenerationBudget(per_minute=0, per_day=100, max_concurrency=0, tokens_per_day=10000)
+        monkeypatch.setattr(usage, "llm_budget", restarted)
+        fresh = UsageLedger()
+        await fresh.start(writable=True)
+        await fresh.stop()
+        return restarted.get_status()
+
+    status = run(main())
+    assert status["used_today"] == 2
+    assert status["tokens_today"] == 600
+
+
+def test_prune_drops_old_rollups(ledger):
+    ledger.rollup_days = 2
+    ledger.record(1, date.today() - timedelta(days=5), "gpt", _usage(1, 1), 10, True)
+    ledger._by_day[date.today() - timedelta(days=5)] = ledger._by_day[date.today()]
+    ledger._prune()
+    assert list(ledger._by_day) == [date.today()]
+    assert ledger._by_quote == {}
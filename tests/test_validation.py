@@ -0,0 +1,67 @@
+"""
+入库前校验测试
+"""
+import pytest
+
+from app.models import DEFAULT_CHANNEL_ID
+from app.validation import QuoteValidator, InvalidCompletionError, AhoCorasick
+
+CONTENT = "人的一生中最重要的不是所处的位置，而是所朝的方向；方向对了，路再远也终将抵达，方向错了，走得越快离目标越远。"
+
+
+def _validate(author: str):
+    QuoteValidator().validate(f"{CONTENT}|{author}", CONTENT, author, DEFAULT_CHANNEL_ID)
+
+
+def test_author_whitelist_is_off_by_default(monkeypatch):
+    monkeypatch.delenv("AUTHOR_WHITELIST", raising=False)
+    _validate("某位不知名的作者")
+
+
+def test_author_whitelist_rejects_unknown_authors_when_enabled(monkeypatch):
+    monkeypatch.setenv("AUTHOR_WHITELIST", "True")
+    _validate("康德")
+    with pytest.raises(InvalidCompletionError) as error:
+        _validate("某位不知名的作者")
+    assert error.value.reason == "unknown_author"
+
+
+def test_author_whitelist_accepts_longer_form_of_known_author(monkeypatch):
+    monkeypatch.setenv("AUTHOR_WHITELIST", "True")
+    _validate("弗里德里希·威廉·尼采")
+    with pytest.raises(InvalidCompletionError):
+        _validate("詹姆斯·密尔")
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick(["he", "she", "his", "hers", "作为ai"])
+    assert automaton.search("ushers") == "she"
+    assert automaton.search("ahishe") == "his"
+    assert automaton.search("我作为ai模型") == "作为ai"
+    assert automaton.search("nothing here") == "he"
+    assert automaton.search("abc") is None
+    assert AhoCorasick([]).search("任何文本") is None
+
+
+@pytest.mark.parametrize("raw, content, author, reason", [
+    ("短句|老子", "短句", "老子", "too_short"),
+    (CONTENT, CONTENT, "哲学家", "no_separator"),
+    (f"{CONTENT}|佚名", CONTENT, "佚名", "no_author"),
+    (f"{CONTENT}作为一个AI语言模型|老子", f"{CONTENT}作为一个AI语言模型", "老子", "banned_phrase"),
+])
+def test_validator_rejection_reasons(raw, content, author, reason):
+    validator = QuoteValidator()
+    with pytest.raises(InvalidCompletionError) as error:
+        validator.validate(raw, content, author, DEFAULT_CHANNEL_ID)
+    assert error.value.reason == reason
+    assert validator.get_status()["rejected"] == {reason: 1}
+
+
+def test_validator_rejects_duplicates_per_channel():
+    validator = QuoteValidator()
+    validator.remember(DEFAULT_CHANNEL_ID, f"“{CONTENT}”")
+    with pytest.raises(InvalidCompletionError) as error:
+        validator.validate(f"{CONTENT}|老子", CONTENT, "老子", DEFAULT_CHANNEL_ID)
+    assert error.value.reason == "duplicate"
+    # 其他频道不受影响
+    validator.validate(f"{CONTENT}|老子", CONTENT, "老子", DEFAULT_CHANNEL_ID + 1)